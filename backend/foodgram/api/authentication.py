@@ -0,0 +1,48 @@
+from django.utils.functional import LazyObject, empty
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+
+from core.models import User
+
+
+class ClaimsUser(LazyObject):
+    # The authenticated user of a JWT request. Its id comes from the
+    # token claims, which is all the read endpoints need; any other
+    # attribute (or passing it where a User instance is expected) loads
+    # the row once, on first use.
+    is_authenticated = True
+    is_anonymous = False
+
+    def __init__(self, token):
+        # LazyObject forwards attribute assignment to the wrapped user.
+        self.__dict__['token'] = token
+        super().__init__()
+
+    def __bool__(self):
+        return True
+
+    @property
+    def id(self):
+        return self.token[api_settings.USER_ID_CLAIM]
+
+    @property
+    def pk(self):
+        return self.id
+
+    def _setup(self):
+        user = User.objects.filter(pk=self.id, is_active=True).first()
+        if user is None:
+            raise AuthenticationFailed(
+                'Пользователь не найден или неактивен.',
+                code='user_not_found')
+        self._wrapped = user
+
+
+def get_user_instance(user):
+    # The User row behind request.user, for code that needs a real model
+    # instance (serializing the profile, assigning foreign keys).
+    if type(user) is ClaimsUser:
+        if user._wrapped is empty:
+            user._setup()
+        return user._wrapped
+    return user
@@ -0,0 +1,129 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework.response import Response
+
+VERSION_KEY = 'api-version:{}'
+RESPONSE_KEY = 'api-response:{}'
+
+
+def new_version():
+    # Time based, so a version evicted from the cache never comes back
+    # with a value that matches responses stored before the eviction.
+    return time.time_ns()
+
+
+def get_versions(models):
+    keys = [VERSION_KEY.format(model._meta.label_lower) for model in models]
+    versions = cache.get_many(keys)
+    missing = {key: new_version() for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, timeout=None)
+        versions.update(missing)
+    return [versions[key] for key in keys]
+
+
+def bump_version(model):
+    key = VERSION_KEY.format(model._meta.label_lower)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, new_version(), timeout=None)
+
+
+def response_cache_key(request, models):
+    versions = ':'.join(str(version) for version in get_versions(models))
+    uri = request.build_absolute_uri()
+    return hashlib.md5(f'{uri}:{versions}'.encode()).hexdigest()
+
+
+def make_etag(*parts):
+    fingerprint = ':'.join(str(part) for part in parts)
+    return '"{}"'.format(hashlib.md5(fingerprint.encode()).hexdigest())
+
+
+def set_validators(response, etag, last_modified=None):
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    return response
+
+
+def conditional_response(request, etag, last_modified=None):
+    # 304 (or 412 for a failed If-Match) when the client copy is still
+    # valid, otherwise None and the view renders as usual.
+    response = get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=(
+            int(last_modified.timestamp())
+            if last_modified is not None else None
+        )
+    )
+    if response is not None:
+        set_validators(response, etag, last_modified)
+    return response
+
+
+class VersionedCacheMixin:
+    # Serialized list/retrieve payloads keyed by URL and the versions of
+    # every model the response depends on. The same key doubles as the
+    # ETag, so unchanged resources get a 304 without touching the DB.
+    cache_models = ()
+    cache_anonymous_only = True
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        if self.cache_anonymous_only and request.user.is_authenticated:
+            return handler(request, *args, **kwargs)
+
+        key = response_cache_key(request, self.cache_models)
+        etag = make_etag(key)
+        not_modified = conditional_response(request, etag)
+        if not_modified is not None:
+            return not_modified
+
+        data = cache.get(RESPONSE_KEY.format(key))
+        if data is not None:
+            return set_validators(Response(data), etag)
+
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(
+                RESPONSE_KEY.format(key), response.data,
+                settings.RESPONSE_CACHE_TIMEOUT)
+            set_validators(response, etag)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            super().retrieve, request, *args, **kwargs)
+
+
+class ConditionalRetrieveMixin:
+    # Views define get_validators(instance) -> (etag, last_modified).
+    # Validators come from the model row alone, so a 304 costs the
+    # object lookup but never runs the serializer.
+    def conditional_retrieve(self, request, instance):
+        etag, last_modified = self.get_validators(instance)
+        not_modified = conditional_response(
+            request, etag,
+            # User specific flags are not covered by the timestamps, so
+            # If-Modified-Since is only trusted for anonymous requests.
+            None if request.user.is_authenticated else last_modified
+        )
+        if not_modified is not None:
+            return not_modified
+
+        serializer = self.get_serializer(instance)
+        return set_validators(
+            Response(serializer.data), etag, last_modified)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_retrieve(request, self.get_object())
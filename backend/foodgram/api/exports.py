@@ -0,0 +1,109 @@
+import csv
+import json
+
+from django.core.cache import cache
+from django.db.models import Count, F, Max, Sum
+
+from core.models import Ingredient, ShoppingCartTotal
+
+from .caching import get_versions, make_etag
+
+CHUNK_SIZE = 8192
+CONTENT_TYPES = {
+    'txt': 'text/plain; charset=utf-8',
+    'csv': 'text/csv; charset=utf-8',
+    'json': 'application/json',
+}
+
+
+class Echo:
+    def write(self, value):
+        return value
+
+
+def shopping_list(user):
+    return (
+        ShoppingCartTotal.objects
+        .filter(user_id=user.id)
+        .values(name=F('ingredient__name'),
+                unit=F('ingredient__measurement_unit'),
+                amount=F('total_amount'))
+        .order_by('name')
+    )
+
+
+def shopping_list_etag(user, export_format):
+    state = ShoppingCartTotal.objects.filter(user_id=user.id).aggregate(
+        rows=Count('id'),
+        total=Sum('total_amount'),
+        recipes=Sum('recipe_count'),
+        updated=Max('updated')
+    )
+    # Names and units come from Ingredient: renaming one changes the body
+    # (and its cached length) without touching the totals.
+    return make_etag(
+        user.id, export_format, sorted(state.items()),
+        *get_versions([Ingredient]))
+
+
+def content_length_key(etag):
+    return f'shopping-list-length:{etag}'
+
+
+def txt_lines(ingredients):
+    yield 'Список покупок:'
+    empty = True
+    for ingred in ingredients:
+        empty = False
+        yield f'\n{ingred["name"]} - {ingred["amount"]} ({ingred["unit"]})'
+    if empty:
+        yield '\nПусто!'
+
+
+def csv_lines(ingredients):
+    writer = csv.writer(Echo())
+    yield writer.writerow(['name', 'amount', 'measurement_unit'])
+    for ingred in ingredients:
+        yield writer.writerow(
+            [ingred['name'], ingred['amount'], ingred['unit']])
+
+
+def json_lines(ingredients):
+    yield '['
+    separator = ''
+    for ingred in ingredients:
+        yield separator + json.dumps({
+            'name': ingred['name'],
+            'measurement_unit': ingred['unit'],
+            'amount': ingred['amount'],
+        }, ensure_ascii=False)
+        separator = ','
+    yield ']'
+
+
+WRITERS = {
+    'txt': txt_lines,
+    'csv': csv_lines,
+    'json': json_lines,
+}
+
+
+def stream_shopping_list(user, export_format, etag):
+    lines = WRITERS[export_format](shopping_list(user).iterator())
+    buffer = []
+    buffered = 0
+    length = 0
+    for line in lines:
+        chunk = line.encode()
+        buffer.append(chunk)
+        buffered += len(chunk)
+        if buffered >= CHUNK_SIZE:
+            length += buffered
+            yield b''.join(buffer)
+            buffer, buffered = [], 0
+    if buffer:
+        length += buffered
+        yield b''.join(buffer)
+    # Remember the size so the next download of an unchanged cart can
+    # announce it up front.
+    cache.set(content_length_key(etag), length)
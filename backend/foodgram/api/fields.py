@@ -0,0 +1,29 @@
+from rest_framework import serializers
+
+from core.images import IMAGE_FIELDS, ready_variants, variant_names
+
+
+class ImageVariantsField(serializers.Field):
+    # URLs of the resized variants; until the worker has built them every
+    # variant points at the original upload.
+    def __init__(self, image_field, **kwargs):
+        self.image_field = image_field
+        kwargs['source'] = '*'
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, instance):
+        image = getattr(instance, self.image_field)
+        if not image:
+            return None
+
+        _, _, sizes = IMAGE_FIELDS[type(instance)]
+        files = ready_variants(instance, self.image_field)
+        request = self.context.get('request')
+        urls = {}
+        for name in variant_names(sizes):
+            url = (
+                image.storage.url(files[name]) if name in files
+                else image.url)
+            urls[name] = request.build_absolute_uri(url) if request else url
+        return urls
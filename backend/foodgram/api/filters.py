@@ -6,6 +6,8 @@ from django_filters.filters import (
 
 from core.models import Ingredient, Recipe
 
+from .search import search_recipes
+
 
 class IngredientFilter(FilterSet):
     name = CharFilter(
@@ -30,23 +32,28 @@ class RecipeFilter(FilterSet):
         choices=STATUS_CHOICES, method='get_is_favorited')
     is_in_shopping_cart = ChoiceFilter(
         choices=STATUS_CHOICES, method='get_is_in_shopping_cart')
+    search = CharFilter(method='get_search')
 
     def get_is_favorited(self, queryset, name, value):
         user = self.request.user  # type: ignore
         if user.is_authenticated and value:
-            return Recipe.objects.filter(users_in_favorite__user=user)
+            return queryset.filter(users_in_favorite__user_id=user.id)
         return queryset
 
     def get_is_in_shopping_cart(self, queryset, name, value):
         user = self.request.user  # type: ignore
         if user.is_authenticated and value:
-            return Recipe.objects.filter(users_in_shopcart__user=user)
+            return queryset.filter(users_in_shopcart__user_id=user.id)
         return queryset
 
+    def get_search(self, queryset, name, value):
+        return search_recipes(queryset, value)
+
     class Meta:
         model = Recipe
         fields = [
             'author',
             'is_favorited',
-            'is_in_shopping_cart'
+            'is_in_shopping_cart',
+            'search'
         ]
@@ -0,0 +1,178 @@
+import hashlib
+import os
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import cache
+from PIL import Image
+
+from core.images import default_format, encode_image, open_image
+
+RESIZE_DIRS = ('recipes', 'users')
+FORMATS = {'jpeg': 'JPEG', 'jpg': 'JPEG', 'png': 'PNG', 'webp': 'WEBP'}
+IMAGE_CONTENT_TYPES = {
+    'JPEG': 'image/jpeg',
+    'PNG': 'image/png',
+    'WEBP': 'image/webp'
+}
+SOURCE_KEY = 'media-source:{}'
+SIZE_KEY = 'media-resize-size:{}'
+HASH_CHUNK_SIZE = 64 * 1024
+LOCK_TIMEOUT = 30
+LOCK_POLL_INTERVAL = 0.05
+EVICT_TO = 0.9
+
+
+def resolve_source(path):
+    # Only files inside the upload directories can be resized; anything
+    # else, including `..` tricks, resolves to None.
+    root = Path(settings.MEDIA_ROOT).resolve()
+    source = (root / path).resolve()
+    try:
+        parts = source.relative_to(root).parts
+    except ValueError:
+        return None
+    if len(parts) < 2 or parts[0] not in RESIZE_DIRS:
+        return None
+    return source if source.is_file() else None
+
+
+def source_info(source):
+    # Content hash and default output format of the source. Both are
+    # computed once per file version; later requests only stat() it.
+    stat = source.stat()
+    fingerprint = f'{source}:{stat.st_mtime_ns}:{stat.st_size}'
+    key = SOURCE_KEY.format(hashlib.md5(fingerprint.encode()).hexdigest())
+    info = cache.get(key)
+    if info is None:
+        sha256 = hashlib.sha256()
+        with open(source, 'rb') as file:
+            for chunk in iter(lambda: file.read(HASH_CHUNK_SIZE), b''):
+                sha256.update(chunk)
+            file.seek(0)
+            image_format = default_format(open_image(file))
+        info = (sha256.hexdigest(), image_format)
+        cache.set(key, info, timeout=None)
+    return info
+
+
+def resize_key(digest, size, image_format):
+    return hashlib.sha256(
+        f'{digest}:{size}:{image_format}'.encode()).hexdigest()
+
+
+def resize(source, width, height, image_format):
+    with open(source, 'rb') as file:
+        image = open_image(file)
+    image.thumbnail((width or image.width, height or image.height),
+                    Image.LANCZOS)
+    return encode_image(image, image_format)
+
+
+class ResizeCache:
+    # Resized images on disk, sharded by the first two characters of the
+    # key. Every hit refreshes the file mtime, so eviction by oldest mtime
+    # drops the least recently used entries first. The total size is kept
+    # in the shared cache and grown by every write; the directory is only
+    # scanned when that estimate is missing or goes over the budget.
+    def __init__(self, directory, max_size):
+        self.directory = Path(directory)
+        self.max_size = max_size
+
+    def path(self, key, ext):
+        return self.directory / key[:2] / f'{key}.{ext}'
+
+    def fetch(self, key, ext, render):
+        # Opens the cached file, rendering it first on a miss.
+        target = self.path(key, ext)
+        while True:
+            if not self.touch(target):
+                self.create(target, render)
+            try:
+                return open(target, 'rb')
+            except FileNotFoundError:
+                # Evicted by another process between touch and open.
+                continue
+
+    def create(self, target, render):
+        target.parent.mkdir(parents=True, exist_ok=True)
+        with self.lock(target):
+            # Another worker may have rendered it while we were waiting.
+            if not self.touch(target):
+                temp = target.with_name(f'{target.name}.{os.getpid()}.tmp')
+                size = temp.write_bytes(render())
+                os.replace(temp, target)
+                self.record(size)
+
+    def touch(self, path):
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return False
+        return True
+
+    @contextmanager
+    def lock(self, target):
+        # A lock file created with O_EXCL works across processes and on
+        # every platform; locks older than LOCK_TIMEOUT are abandoned.
+        lock_path = target.with_name(target.name + '.lock')
+        while True:
+            try:
+                descriptor = os.open(
+                    lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                break
+            except FileExistsError:
+                try:
+                    age = time.time() - lock_path.stat().st_mtime
+                except FileNotFoundError:
+                    continue
+                if age > LOCK_TIMEOUT:
+                    lock_path.unlink(missing_ok=True)
+                    continue
+                time.sleep(LOCK_POLL_INTERVAL)
+        try:
+            yield
+        finally:
+            os.close(descriptor)
+            lock_path.unlink(missing_ok=True)
+
+    def size_key(self):
+        return SIZE_KEY.format(
+            hashlib.md5(str(self.directory).encode()).hexdigest())
+
+    def record(self, size):
+        try:
+            total = cache.incr(self.size_key(), size)
+        except ValueError:
+            total = None
+        if total is None or total > self.max_size:
+            self.evict()
+
+    def evict(self):
+        entries, total = [], 0
+        for shard in os.scandir(self.directory):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.name.endswith(('.lock', '.tmp')):
+                    continue
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+        if total > self.max_size:
+            entries.sort()
+            for _, size, path in entries:
+                if total <= self.max_size * EVICT_TO:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+        cache.set(self.size_key(), total, timeout=None)
+
+
+resize_cache = ResizeCache(
+    settings.MEDIA_RESIZE_CACHE_DIR, settings.MEDIA_RESIZE_CACHE_SIZE)
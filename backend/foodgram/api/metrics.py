@@ -0,0 +1,120 @@
+import os
+import time
+
+from django.db import connection
+
+# prometheus_client picks its value storage on import: with
+# PROMETHEUS_MULTIPROC_DIR set, every process writes its samples to
+# mmap'd files in that directory and the scrape merges them.
+MULTIPROC_DIR = os.getenv('PROMETHEUS_MULTIPROC_DIR')
+if MULTIPROC_DIR:
+    os.makedirs(MULTIPROC_DIR, exist_ok=True)
+
+from prometheus_client import (  # noqa: E402
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Histogram,
+    generate_latest,
+    multiprocess
+)
+
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89, 144, float('inf'))
+UNRESOLVED = 'unresolved'
+
+REQUEST_LATENCY = Histogram(
+    'foodgram_request_duration_seconds',
+    'Время обработки запроса.',
+    ['endpoint', 'method', 'status']
+)
+REQUEST_QUERIES = Histogram(
+    'foodgram_request_sql_queries',
+    'Количество SQL-запросов за запрос.',
+    ['endpoint'],
+    buckets=QUERY_BUCKETS
+)
+REQUEST_SQL_TIME = Histogram(
+    'foodgram_request_sql_duration_seconds',
+    'Суммарное время SQL-запросов за запрос.',
+    ['endpoint']
+)
+
+
+def endpoint_name(request):
+    # "RecipeViewSet.list", "UserAccountViewSet.subscriptions": one label
+    # value per route and action, whatever the ids in the URL.
+    match = request.resolver_match
+    if match is None:
+        return UNRESOLVED
+    view = match.func
+    view_class = (
+        getattr(view, 'cls', None) or getattr(view, 'view_class', None))
+    if view_class is None:
+        return match.view_name or UNRESOLVED
+    method = request.method.lower()
+    actions = getattr(view, 'actions', None)
+    if actions is not None:
+        action = actions.get(method, method)
+    else:
+        action = method
+    return f'{view_class.__name__}.{action}'
+
+
+class QueryRecorder:
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+
+
+class MetricsMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = QueryRecorder()
+        started = time.perf_counter()
+        with connection.execute_wrapper(recorder):
+            response = self.get_response(request)
+
+        if response.streaming:
+            # Streamed bodies (the shopping list export) run their queries
+            # while the server consumes them: record once they are done.
+            response.streaming_content = self.stream(
+                response.streaming_content, request, response, recorder,
+                started)
+        else:
+            self.record(request, response, recorder, started)
+        return response
+
+    def stream(self, content, request, response, recorder, started):
+        try:
+            with connection.execute_wrapper(recorder):
+                yield from content
+        finally:
+            self.record(request, response, recorder, started)
+
+    def record(self, request, response, recorder, started):
+        elapsed = time.perf_counter() - started
+        endpoint = endpoint_name(request)
+        REQUEST_LATENCY.labels(
+            endpoint, request.method, response.status_code
+        ).observe(elapsed)
+        REQUEST_QUERIES.labels(endpoint).observe(recorder.count)
+        REQUEST_SQL_TIME.labels(endpoint).observe(recorder.duration)
+
+
+def render_metrics():
+    if MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry, path=MULTIPROC_DIR)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -1,6 +1,119 @@
-from rest_framework.pagination import PageNumberPagination
+from collections import OrderedDict
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import (
+    Cursor,
+    CursorPagination,
+    PageNumberPagination
+)
+from rest_framework.response import Response
 
 
 class LimitPagePagination(PageNumberPagination):
     page_size = 10
     page_size_query_param = 'limit'
+
+
+class RecipeCursorPagination(CursorPagination):
+    # Keyset pagination on (created, id): every page is an index range
+    # scan instead of OFFSET n, and `?count=false` also skips COUNT(*).
+    page_size = 10
+    page_size_query_param = 'limit'
+    max_page_size = 100
+    count_query_param = 'count'
+    ordering = ('-created', '-id')
+    invalid_cursor_message = 'Неверный курсор.'
+    ranked_message = (
+        'Курсор нельзя сочетать с поиском: результаты поиска упорядочены '
+        'по релевантности, используйте page.')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if 'search_rank' in queryset.query.annotations:
+            # Pages are keyed on (created, id): a rank order would be lost.
+            raise ValidationError({self.cursor_query_param: [
+                self.ranked_message]})
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.cursor = self.decode_cursor(request)
+
+        self.count = None
+        if self.with_count(request):
+            self.count = queryset.count()
+
+        position, reverse = None, False
+        if self.cursor is not None:
+            position = self.parse_position(self.cursor.position)
+            reverse = self.cursor.reverse
+
+        if reverse:
+            queryset = queryset.order_by('created', 'id')
+        else:
+            queryset = queryset.order_by(*self.ordering)
+
+        if position is not None:
+            created, pk = position
+            if reverse:
+                queryset = queryset.filter(
+                    Q(created__gt=created) | Q(created=created, id__gt=pk))
+            else:
+                queryset = queryset.filter(
+                    Q(created__lt=created) | Q(created=created, id__lt=pk))
+
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+
+        if reverse:
+            self.page.reverse()
+            self.has_next = position is not None
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = position is not None
+
+        return self.page
+
+    def with_count(self, request):
+        value = request.query_params.get(self.count_query_param, '')
+        return value.lower() not in ('0', 'false', 'no')
+
+    def parse_position(self, position):
+        if position is None:
+            return None
+        try:
+            created, pk = position.rsplit('_', 1)
+            created = parse_datetime(created)
+            pk = int(pk)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+        if created is None:
+            raise NotFound(self.invalid_cursor_message)
+        return created, pk
+
+    def make_position(self, instance):
+        return f'{instance.created.isoformat()}_{instance.id}'
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(Cursor(
+            offset=0, reverse=False,
+            position=self.make_position(self.page[-1])))
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(Cursor(
+            offset=0, reverse=True,
+            position=self.make_position(self.page[0])))
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('count', self.count),
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data)
+        ]))
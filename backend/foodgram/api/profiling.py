@@ -0,0 +1,174 @@
+import cProfile
+import json
+import os
+import random
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime
+
+from django.conf import settings
+from django.core import signing
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+
+from .metrics import endpoint_name
+
+HEADER_SALT = 'api.profiling'
+HEADER_MAX_AGE = 24 * 60 * 60
+
+
+def make_header_token():
+    return signing.TimestampSigner(salt=HEADER_SALT).sign(uuid.uuid4().hex)
+
+
+def valid_header_token(value):
+    try:
+        signing.TimestampSigner(salt=HEADER_SALT).unsign(
+            value, max_age=HEADER_MAX_AGE)
+    except signing.BadSignature:
+        return False
+    return True
+
+
+class QueryLog:
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            # Statements only: parameters may hold personal data.
+            self.queries.append((sql, time.perf_counter() - started))
+
+    def duplicates(self):
+        # Same statement with different parameters: the N+1 signature.
+        groups = defaultdict(list)
+        for sql, duration in self.queries:
+            groups[sql].append(duration)
+        return sorted(
+            (
+                {'sql': sql, 'count': len(durations),
+                 'duration': sum(durations)}
+                for sql, durations in groups.items() if len(durations) > 1
+            ),
+            key=lambda item: item['count'],
+            reverse=True
+        )
+
+
+def rotate(directory, max_files):
+    # Report names start with a timestamp, so the oldest sort first.
+    reports = sorted(
+        name for name in os.listdir(directory) if name.endswith('.json'))
+    for report in reports[:max(len(reports) - max_files, 0)]:
+        stem = report[:-len('.json')]
+        for name in (report, stem + '.prof'):
+            try:
+                os.remove(os.path.join(directory, name))
+            except FileNotFoundError:
+                pass
+
+
+class ProfilerMiddleware:
+    # Keeps the SQL of a request, and optionally a cProfile dump, when
+    # the request is sampled, slower than PROFILER_SLOW_MS or carries a
+    # signed PROFILER_HEADER. Reports go to PROFILER_DIR, the oldest are
+    # removed past PROFILER_MAX_FILES; see the profile_summary command.
+    def __init__(self, get_response):
+        if not settings.PROFILER_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.directory = settings.PROFILER_DIR
+        os.makedirs(self.directory, exist_ok=True)
+
+    def __call__(self, request):
+        reason = None
+        header = request.headers.get(settings.PROFILER_HEADER)
+        if header and valid_header_token(header):
+            reason = 'header'
+        elif random.random() < settings.PROFILER_SAMPLE_RATE:
+            reason = 'sampled'
+
+        profiler = None
+        if reason and settings.PROFILER_CPROFILE:
+            profiler = cProfile.Profile()
+
+        log = QueryLog()
+        started = time.perf_counter()
+        with connection.execute_wrapper(log):
+            if profiler is not None:
+                profiler.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                if profiler is not None:
+                    profiler.disable()
+
+        if response.streaming:
+            # Streamed bodies run their queries while being consumed: the
+            # report is written once the last chunk is sent.
+            response.streaming_content = self.stream(
+                response.streaming_content, request, response, reason,
+                started, log, profiler)
+        else:
+            self.finish(request, response, reason, started, log, profiler)
+        return response
+
+    def stream(self, content, request, response, reason, started, log,
+               profiler):
+        try:
+            with connection.execute_wrapper(log):
+                if profiler is not None:
+                    profiler.enable()
+                try:
+                    yield from content
+                finally:
+                    if profiler is not None:
+                        profiler.disable()
+        finally:
+            self.finish(request, response, reason, started, log, profiler)
+
+    def finish(self, request, response, reason, started, log, profiler):
+        elapsed = time.perf_counter() - started
+        if reason is None and elapsed * 1000 >= settings.PROFILER_SLOW_MS:
+            reason = 'slow'
+        if reason is not None:
+            try:
+                self.save(request, response, reason, elapsed, log, profiler)
+            except OSError:
+                # A full or read-only disk must not fail the request.
+                pass
+
+    def save(self, request, response, reason, elapsed, log, profiler):
+        endpoint = endpoint_name(request)
+        stem = '{}-{}-{}'.format(
+            datetime.now().strftime('%Y%m%d%H%M%S%f'), endpoint,
+            uuid.uuid4().hex[:8])
+
+        report = {
+            'endpoint': endpoint,
+            'method': request.method,
+            'path': request.get_full_path(),
+            'status': response.status_code,
+            'reason': reason,
+            'duration': elapsed,
+            'query_count': len(log.queries),
+            'sql_duration': sum(duration for _, duration in log.queries),
+            'queries': [
+                {'sql': sql, 'duration': duration}
+                for sql, duration in log.queries
+            ],
+            'duplicates': log.duplicates(),
+            'profile': None,
+        }
+        if profiler is not None:
+            report['profile'] = stem + '.prof'
+            profiler.dump_stats(os.path.join(self.directory, stem + '.prof'))
+
+        with open(os.path.join(self.directory, stem + '.json'), 'w',
+                  encoding='utf-8') as report_file:
+            json.dump(report, report_file, ensure_ascii=False)
+        rotate(self.directory, settings.PROFILER_MAX_FILES)
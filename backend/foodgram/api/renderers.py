@@ -0,0 +1,13 @@
+from rest_framework.renderers import JSONRenderer
+
+
+class PlainTextRenderer(JSONRenderer):
+    # Files are streamed by the view itself; this only picks the format
+    # and renders error payloads.
+    media_type = 'text/plain'
+    format = 'txt'
+
+
+class CSVRenderer(JSONRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
@@ -0,0 +1,106 @@
+import re
+import threading
+import time
+from bisect import bisect_left
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connection
+from django.db.models import F, Q
+from django.db.models.expressions import RawSQL
+
+from core.models import Ingredient
+from core.search import SEARCH_CONFIG
+
+
+class IngredientIndex:
+    # Case-folded, sorted in-process index over ingredient names: prefix
+    # lookups are a bisect, so autocomplete never hits the database.
+    def __init__(self, ttl=None):
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.state = None
+
+    def invalidate(self):
+        self.state = None
+
+    def get_state(self):
+        state = self.state
+        if state is not None and (
+            self.ttl is None or time.monotonic() - state[0] < self.ttl
+        ):
+            return state
+
+        with self.lock:
+            if self.state is not state:
+                return self.state
+            ingredients = [
+                Ingredient(id=pk, name=name, measurement_unit=unit)
+                for pk, name, unit in Ingredient.objects.values_list(
+                    'id', 'name', 'measurement_unit')
+            ]
+            ordered = sorted(
+                ingredients,
+                key=lambda ingredient: (ingredient.name.casefold(),
+                                        ingredient.id)
+            )
+            keys = [ingredient.name.casefold() for ingredient in ordered]
+            self.state = (time.monotonic(), ingredients, keys, ordered)
+            return self.state
+
+    def all(self):
+        return list(self.get_state()[1])
+
+    def search(self, query):
+        _, _, keys, ordered = self.get_state()
+        query = query.casefold()
+
+        start = bisect_left(keys, query)
+        end = start
+        while end < len(keys) and keys[end].startswith(query):
+            end += 1
+
+        substring = [
+            ordered[i] for i, key in enumerate(keys)
+            if query in key and not start <= i < end
+        ]
+        return ordered[start:end] + substring
+
+
+ingredient_index = IngredientIndex(ttl=settings.INGREDIENT_INDEX_TTL)
+
+
+def fts5_query(query):
+    terms = re.findall(r'\w+', query)
+    return ' '.join('"{}"*'.format(term) for term in terms)
+
+
+def search_recipes(queryset, query):
+    if connection.vendor == 'postgresql':
+        search_query = SearchQuery(
+            query, config=SEARCH_CONFIG, search_type='websearch')
+        return (
+            queryset
+            .filter(search_vector=search_query)
+            .annotate(search_rank=SearchRank(
+                F('search_vector'), search_query))
+            .order_by('-search_rank', '-created', '-id')
+        )
+
+    if connection.vendor == 'sqlite':
+        match = fts5_query(query)
+        if not match:
+            return queryset.none()
+        return (
+            queryset
+            .filter(id__in=RawSQL(
+                'SELECT rowid FROM core_recipe_fts '
+                'WHERE core_recipe_fts MATCH %s', (match,)))
+            .annotate(search_rank=RawSQL(
+                'SELECT -rank FROM core_recipe_fts '
+                'WHERE core_recipe_fts MATCH %s '
+                'AND rowid = core_recipe.id', (match,)))
+            .order_by('-search_rank', '-created', '-id')
+        )
+
+    return queryset.filter(Q(name__icontains=query) | Q(text__icontains=query))
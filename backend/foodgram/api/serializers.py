@@ -1,8 +1,12 @@
 from djoser.serializers import UserCreateSerializer, UserSerializer
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Manager, Prefetch, prefetch_related_objects
 from rest_framework import serializers
 
 from drf_extra_fields import fields as drfx_fields
 
+from core import shopping_cart as shopping_totals
 from core.models import (
     Favorite,
     Ingredient,
@@ -20,21 +24,37 @@ from core.const import (
     MAX_INGREDIENT_AMOUNT
 )
 
+from .fields import ImageVariantsField
+from .utils import get_subscription_resolver, parse_recipes_limit
+
+
+class UserListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        users = list(data.all() if isinstance(data, Manager) else data)
+        get_subscription_resolver(self.context['request']).load(
+            user.id for user in users)
+        return super().to_representation(users)
+
+
+class RecipeListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        recipes = list(data.all() if isinstance(data, Manager) else data)
+        get_subscription_resolver(self.context['request']).load(
+            recipe.author_id for recipe in recipes)
+        return super().to_representation(recipes)
+
 
 class UserAccountSerializer(UserSerializer):
     is_subscribed = serializers.SerializerMethodField('get_is_subscribed')
+    avatar_variants = ImageVariantsField('avatar')
 
     def get_is_subscribed(self, obj):
-        user = self.context['request'].user
-        if user:
-            return (
-                user.is_authenticated
-                and user.subscribers.filter(subscribed_to__exact=obj).exists()
-            )
-        return False
+        resolver = get_subscription_resolver(self.context['request'])
+        return resolver.is_subscribed(obj)
 
     class Meta:
         model = User
+        list_serializer_class = UserListSerializer
         fields = [
             'id',
             'email',
@@ -42,7 +62,8 @@ class UserAccountSerializer(UserSerializer):
             'first_name',
             'last_name',
             'is_subscribed',
-            'avatar'
+            'avatar',
+            'avatar_variants'
         ]
 
 
@@ -106,8 +127,9 @@ class IngredientInRecipeSerializer(serializers.ModelSerializer):
 
 
 class IngredientInRecipeCreateSerializer(serializers.ModelSerializer):
-    id = serializers.PrimaryKeyRelatedField(
-        source='ingredient', queryset=Ingredient.objects.all())
+    # Resolved for the whole list at once in
+    # RecipeCreateSerializer.validate_ingredients.
+    id = serializers.IntegerField()
     amount = serializers.IntegerField(
         min_value=MIN_INGREDIENT_AMOUNT, max_value=MAX_INGREDIENT_AMOUNT)
 
@@ -126,8 +148,12 @@ class RecipeSerializer(serializers.ModelSerializer):
     is_favorited = serializers.SerializerMethodField('get_is_favorited')
     is_in_shopping_cart = serializers.SerializerMethodField(
         method_name='get_is_in_shopping_cart')
+    image_variants = ImageVariantsField('image')
 
     def get_is_favorited(self, obj):
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
+
         user = self.context['request'].user
         if user:
             return (
@@ -137,6 +163,9 @@ class RecipeSerializer(serializers.ModelSerializer):
         return False
 
     def get_is_in_shopping_cart(self, obj):
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
+
         user = self.context['request'].user
         if user:
             return (
@@ -147,6 +176,7 @@ class RecipeSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Recipe
+        list_serializer_class = RecipeListSerializer
         fields = [
             'id',
             'author',
@@ -155,6 +185,7 @@ class RecipeSerializer(serializers.ModelSerializer):
             'is_in_shopping_cart',
             'name',
             'image',
+            'image_variants',
             'text',
             'cooking_time'
         ]
@@ -187,57 +218,114 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError(
                 'Ингредиенты является обязательным полем.')
 
-        ids = [ingredient['ingredient'].id for ingredient in ingredients]
+        ids = [ingredient['id'] for ingredient in ingredients]
         if len(ids) != len(set(ids)):
             raise serializers.ValidationError(
                 'Ингредиенты должны быть уникальны.')
 
-        return ingredients
+        found = Ingredient.objects.in_bulk(ids)
+        message = serializers.PrimaryKeyRelatedField.default_error_messages[
+            'does_not_exist']
+        errors = [
+            {} if pk in found else {'id': [message.format(pk_value=pk)]}
+            for pk in ids
+        ]
+        if any(errors):
+            raise serializers.ValidationError(errors)
 
-    def make_ingredients(self, recipe, ingredients):
-        return IngredientInRecipe.objects.bulk_create([
-            IngredientInRecipe(
-                recipe=recipe,
-                ingredient=ingredient['ingredient'],
-                amount=ingredient['amount']
-            )
+        return [
+            {'ingredient': found[ingredient['id']],
+             'amount': ingredient['amount']}
             for ingredient in ingredients
-        ])
+        ]
 
     def create(self, validated_data):
         ingredients = validated_data.pop('ingredients')
-        recipe = Recipe.objects.create(**validated_data)
-        self.make_ingredients(recipe, ingredients)
+        with transaction.atomic():
+            recipe = Recipe.objects.create(**validated_data)
+            IngredientInRecipe.objects.bulk_create([
+                IngredientInRecipe(
+                    recipe=recipe,
+                    ingredient=ingredient['ingredient'],
+                    amount=ingredient['amount']
+                )
+                for ingredient in ingredients
+            ])
         return recipe
 
     def update(self, instance, validated_data):
-        ingredients = self.validate_ingredients(
-            validated_data.pop('ingredients', None))
-        instance.ingredient_amounts.all().delete()
-        self.make_ingredients(instance, ingredients)
-        return super().update(instance, validated_data)
+        ingredients = validated_data.pop('ingredients', None)
+        if not ingredients:
+            raise serializers.ValidationError(
+                'Ингредиенты является обязательным полем.')
+        new_amounts = {
+            ingredient['ingredient'].id: ingredient['amount']
+            for ingredient in ingredients
+        }
+
+        with transaction.atomic():
+            old_amounts = {}
+            kept, changed, removed = {}, [], []
+            for row in instance.ingredient_amounts.all():
+                old_amounts[row.ingredient_id] = (
+                    old_amounts.get(row.ingredient_id, 0) + row.amount)
+                if row.ingredient_id not in new_amounts or (
+                        row.ingredient_id in kept):
+                    # Dropped ingredient or a duplicate row of one.
+                    removed.append(row.id)
+                    continue
+                kept[row.ingredient_id] = row
+                if row.amount != new_amounts[row.ingredient_id]:
+                    row.amount = new_amounts[row.ingredient_id]
+                    changed.append(row)
+
+            if removed:
+                IngredientInRecipe.objects.filter(id__in=removed).delete()
+            if changed:
+                IngredientInRecipe.objects.bulk_update(changed, ['amount'])
+            IngredientInRecipe.objects.bulk_create([
+                IngredientInRecipe(
+                    recipe=instance,
+                    ingredient=ingredient['ingredient'],
+                    amount=ingredient['amount']
+                )
+                for ingredient in ingredients
+                if ingredient['ingredient'].id not in kept
+            ])
+
+            shopping_totals.change_recipe(instance, old_amounts, new_amounts)
+            return super().update(instance, validated_data)
 
     def to_representation(self, instance):
+        # The view drops the prefetch cache after a write; reload the
+        # ingredients with one joined query instead of one per row.
+        prefetch_related_objects([instance], Prefetch(
+            'ingredient_amounts',
+            queryset=IngredientInRecipe.objects.select_related('ingredient')
+        ))
         return RecipeSerializer(instance, context=self.context).data
 
 
 class RecipeShortSerializer(serializers.ModelSerializer):
+    image_variants = ImageVariantsField('image')
+
     class Meta:
         model = Recipe
         fields = [
             'id',
             'name',
             'image',
+            'image_variants',
             'cooking_time'
         ]
 
 
 class UserWithRecipeSerializer(UserAccountSerializer):
     recipes = serializers.SerializerMethodField('get_recipes')
-    recipes_count = serializers.ReadOnlyField(source='recipes.count')
 
     class Meta:
         model = User
+        list_serializer_class = UserListSerializer
         fields = [
             'id',
             'email',
@@ -246,19 +334,21 @@ class UserWithRecipeSerializer(UserAccountSerializer):
             'last_name',
             'is_subscribed',
             'avatar',
+            'avatar_variants',
             'recipes',
             'recipes_count'
         ]
 
     def get_recipes(self, obj):
         request = self.context['request']
-        query_params = request.query_params
-
-        recipes = obj.recipes.all()
-        recipes_limit = query_params.get("recipes_limit")
 
-        if recipes_limit and recipes_limit.isdigit():
-            recipes = recipes[:int(recipes_limit)]
+        recipes = getattr(obj, 'recipe_preview', None)
+        if recipes is None:
+            recipes = obj.recipes.all()
+            recipes_limit = parse_recipes_limit(
+                request.query_params.get("recipes_limit"))
+            if recipes_limit is not None:
+                recipes = recipes[:recipes_limit]
 
         return RecipeShortSerializer(
             recipes, context={"request": request}, many=True).data
@@ -301,3 +391,15 @@ class ShoppingCartSerializer(serializers.ModelSerializer):
             'user',
             'recipe'
         ]
+
+
+class RecipeIdsSerializer(serializers.Serializer):
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.MAX_RECIPE_IDS
+    )
+
+    def validate_recipes(self, recipes):
+        # Duplicates are dropped, the order of first occurrences is kept.
+        return list(dict.fromkeys(recipes))
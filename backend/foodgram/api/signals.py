@@ -0,0 +1,24 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from core.models import Ingredient, IngredientInRecipe, Recipe, User
+from core.signals import bulk_changed
+
+from .caching import bump_version
+from .search import ingredient_index
+
+
+@receiver(bulk_changed, sender=Ingredient)
+@receiver([post_save, post_delete], sender=Ingredient)
+def invalidate_ingredient_index(sender, **kwargs):
+    ingredient_index.invalidate()
+
+
+@receiver([post_save, post_delete, bulk_changed], sender=Recipe)
+@receiver([post_save, post_delete, bulk_changed], sender=IngredientInRecipe)
+@receiver([post_save, post_delete, bulk_changed], sender=Ingredient)
+@receiver([post_save, post_delete, bulk_changed], sender=User)
+def bump_response_cache_version(sender, update_fields=None, **kwargs):
+    if update_fields is not None and set(update_fields) == {'last_login'}:
+        return
+    bump_version(sender)
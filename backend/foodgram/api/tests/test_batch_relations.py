@@ -0,0 +1,66 @@
+from core import shopping_cart as shopping_totals
+from core.models import Favorite, ShoppingCart
+
+from .utils import (APITestCase, create_ingredients, create_recipe,
+                    create_user, token_client)
+
+
+class BatchRelationsTest(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('cook')
+        ingredients = create_ingredients(2)
+        cls.recipes = [
+            create_recipe(cls.user, ingredients, amount=number + 1)
+            for number in range(3)
+        ]
+
+    def setUp(self):
+        super().setUp()
+        self.client = token_client(self.user)
+
+    def batch(self, method, relation, ids):
+        response = getattr(self.client, method)(
+            f'/api/recipes/{relation}/', {'recipes': ids}, format='json')
+        self.assertEqual(response.status_code, 200)
+        return {
+            item['id']: item['status'] for item in response.data['results']}
+
+    def test_statuses_per_id(self):
+        first, second, third = (recipe.id for recipe in self.recipes)
+        Favorite.objects.create(user=self.user, recipe_id=first)
+        self.assertEqual(
+            self.batch('post', 'favorite', [first, second, 999999]),
+            {first: 'exists', second: 'created', 999999: 'not_found'})
+        self.assertEqual(
+            self.batch('delete', 'favorite', [second, third]),
+            {second: 'deleted', third: 'absent'})
+        self.assertEqual(
+            set(Favorite.objects.values_list('recipe_id', flat=True)),
+            {first})
+
+    def test_shopping_totals_follow_batches(self):
+        ids = [recipe.id for recipe in self.recipes]
+        self.batch('post', 'shopping_cart', ids)
+        self.batch('delete', 'shopping_cart', ids[:1])
+        user_ids = [self.user.id]
+        stored = shopping_totals.stored_totals(user_ids)
+        self.assertEqual(stored, shopping_totals.expected_totals(user_ids))
+        self.assertEqual(
+            sorted(stored[self.user.id].values()), [(5, 2), (5, 2)])
+        self.assertEqual(ShoppingCart.objects.count(), 2)
+
+    def test_rejects_bad_payloads(self):
+        for payload in ({'recipes': []}, {'recipes': ['x']}, {}):
+            response = self.client.post(
+                '/api/recipes/favorite/', payload, format='json')
+            self.assertEqual(response.status_code, 400)
+
+    def test_single_endpoints_report_repeats(self):
+        url = f'/api/recipes/{self.recipes[0].id}/shopping_cart/'
+        self.assertEqual(self.client.post(url).status_code, 201)
+        self.assertEqual(self.client.post(url).status_code, 400)
+        self.assertEqual(self.client.delete(url).status_code, 204)
+        self.assertEqual(self.client.delete(url).status_code, 400)
+        self.assertEqual(
+            shopping_totals.stored_totals([self.user.id]), {})
@@ -0,0 +1,42 @@
+from core.models import Favorite
+
+from .utils import APITestCase, create_recipe, create_user, token_client
+
+
+class ConditionalRetrieveTest(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user('author')
+        cls.viewer = create_user('viewer')
+        cls.recipe = create_recipe(cls.author)
+
+    def setUp(self):
+        super().setUp()
+        self.client = token_client(self.viewer)
+        self.url = f'/api/recipes/{self.recipe.id}/'
+
+    def test_unchanged_recipe_is_not_modified(self):
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_user_flags_change_the_etag(self):
+        etag = self.client.get(self.url)['ETag']
+        Favorite.objects.create(user=self.viewer, recipe=self.recipe)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['is_favorited'])
+
+    def test_edited_recipe_is_sent_again(self):
+        etag = self.client.get(self.url)['ETag']
+        self.recipe.name = 'Новое название'
+        self.recipe.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['name'], 'Новое название')
+
+    def test_user_profile(self):
+        url = f'/api/users/{self.author.id}/'
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(
+            self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
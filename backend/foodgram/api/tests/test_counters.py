@@ -0,0 +1,66 @@
+from core.models import Recipe, User
+
+from .utils import (APITestCase, create_ingredients, create_recipe,
+                    create_user, token_client)
+
+
+class CountersTest(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user('author')
+        cls.reader = create_user('reader')
+        cls.recipe = create_recipe(cls.author, create_ingredients(2))
+
+    def setUp(self):
+        super().setUp()
+        self.client = token_client(self.reader)
+
+    def counters(self):
+        recipe = Recipe.objects.get(pk=self.recipe.pk)
+        author = User.objects.get(pk=self.author.pk)
+        return {
+            'favorites_count': recipe.favorites_count,
+            'cart_count': recipe.cart_count,
+            'recipes_count': author.recipes_count,
+            'followers_count': author.followers_count,
+        }
+
+    def test_counters_follow_api_changes(self):
+        self.assertEqual(self.counters(), {
+            'favorites_count': 0, 'cart_count': 0,
+            'recipes_count': 1, 'followers_count': 0})
+
+        recipe_url = f'/api/recipes/{self.recipe.id}/'
+        self.client.post(recipe_url + 'favorite/')
+        self.client.post(recipe_url + 'shopping_cart/')
+        self.client.post(f'/api/users/{self.author.id}/subscribe/')
+        self.assertEqual(self.counters(), {
+            'favorites_count': 1, 'cart_count': 1,
+            'recipes_count': 1, 'followers_count': 1})
+
+        self.client.delete(recipe_url + 'favorite/')
+        self.client.delete(f'/api/users/{self.author.id}/subscribe/')
+        self.assertEqual(self.counters(), {
+            'favorites_count': 0, 'cart_count': 1,
+            'recipes_count': 1, 'followers_count': 0})
+
+    def test_batch_and_repeated_requests_count_once(self):
+        self.client.post(
+            '/api/recipes/favorite/',
+            {'recipes': [self.recipe.id, self.recipe.id]}, format='json')
+        self.client.post(f'/api/recipes/{self.recipe.id}/favorite/')
+        self.assertEqual(self.counters()['favorites_count'], 1)
+
+    def test_recipe_delete_updates_author(self):
+        self.client.post(f'/api/recipes/{self.recipe.id}/favorite/')
+        response = token_client(self.author).delete(
+            f'/api/recipes/{self.recipe.id}/')
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(
+            User.objects.get(pk=self.author.pk).recipes_count, 0)
+
+    def test_subscriptions_show_the_counter(self):
+        create_recipe(self.author, name='Второй')
+        self.client.post(f'/api/users/{self.author.id}/subscribe/')
+        response = self.client.get('/api/users/subscriptions/')
+        self.assertEqual(response.data['results'][0]['recipes_count'], 2)
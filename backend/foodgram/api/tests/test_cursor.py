@@ -0,0 +1,62 @@
+from datetime import timedelta
+
+from django.utils import timezone
+
+from core.models import Recipe
+
+from .utils import APITestCase, create_recipe, create_user
+
+
+class RecipeCursorTest(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = create_user('author')
+        cls.recipes = [
+            create_recipe(author, name=f'Рецепт {number}')
+            for number in range(5)
+        ]
+        # Two recipes share a timestamp: the id breaks the tie.
+        now = timezone.now()
+        for number, recipe in enumerate(cls.recipes):
+            Recipe.objects.filter(pk=recipe.pk).update(
+                created=now - timedelta(minutes=min(number, 3)))
+        cls.expected = [recipe.id for recipe in cls.recipes]
+        cls.expected[3:] = sorted(cls.expected[3:], reverse=True)
+
+    def ids(self, response):
+        self.assertEqual(response.status_code, 200)
+        return [recipe['id'] for recipe in response.data['results']]
+
+    def test_next_and_previous_links(self):
+        first = self.client.get('/api/recipes/?cursor=&limit=2')
+        self.assertEqual(self.ids(first), self.expected[:2])
+        self.assertEqual(first.data['count'], 5)
+        self.assertIsNone(first.data['previous'])
+
+        pages = [self.ids(first)]
+        response = first
+        while response.data['next']:
+            response = self.client.get(response.data['next'])
+            pages.append(self.ids(response))
+        self.assertEqual(sum(pages, []), self.expected)
+        self.assertEqual(pages[-1], self.expected[4:])
+
+        previous = self.client.get(response.data['previous'])
+        self.assertEqual(self.ids(previous), self.expected[2:4])
+
+    def test_count_can_be_skipped(self):
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/recipes/?cursor=&count=false')
+        self.assertIsNone(response.data['count'])
+        self.assertEqual(self.ids(response), self.expected)
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/recipes/?cursor=garbage')
+        self.assertEqual(response.status_code, 404)
+
+    def test_search_rejects_the_cursor(self):
+        response = self.client.get('/api/recipes/?cursor=&search=Рецепт')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('cursor', response.data)
+        response = self.client.get('/api/recipes/?search=Рецепт')
+        self.assertEqual(response.data['count'], 5)
@@ -0,0 +1,93 @@
+import csv
+import io
+import json
+
+from core.models import Ingredient
+
+from .utils import (APITestCase, create_ingredients, create_recipe,
+                    create_user, token_client)
+
+URL = '/api/recipes/download_shopping_cart/'
+
+
+class ShoppingListExportTest(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('cook')
+        cls.ingredients = create_ingredients(2)
+        cls.recipes = [
+            create_recipe(cls.user, cls.ingredients, amount=amount)
+            for amount in (10, 5)
+        ]
+
+    def setUp(self):
+        super().setUp()
+        self.client = token_client(self.user)
+        for recipe in self.recipes:
+            self.client.post(f'/api/recipes/{recipe.id}/shopping_cart/')
+
+    def download(self, export_format='txt', **headers):
+        response = self.client.get(URL, {'format': export_format}, **headers)
+        body = (b''.join(response.streaming_content)
+                if response.streaming else response.content)
+        return response, body.decode()
+
+    def test_formats(self):
+        _, body = self.download('txt')
+        self.assertEqual(body, (
+            'Список покупок:\n'
+            'ingredient 0 - 15 (г)\n'
+            'ingredient 1 - 15 (г)'))
+
+        response, body = self.download('csv')
+        self.assertTrue(response['Content-Type'].startswith('text/csv'))
+        self.assertEqual(list(csv.reader(io.StringIO(body))), [
+            ['name', 'amount', 'measurement_unit'],
+            ['ingredient 0', '15', 'г'],
+            ['ingredient 1', '15', 'г'],
+        ])
+
+        _, body = self.download('json')
+        self.assertEqual(json.loads(body), [
+            {'name': 'ingredient 0', 'measurement_unit': 'г', 'amount': 15},
+            {'name': 'ingredient 1', 'measurement_unit': 'г', 'amount': 15},
+        ])
+
+    def test_empty_cart(self):
+        self.client.delete(f'/api/recipes/{self.recipes[0].id}/shopping_cart/')
+        self.client.delete(f'/api/recipes/{self.recipes[1].id}/shopping_cart/')
+        self.assertEqual(self.download('txt')[1], 'Список покупок:\nПусто!')
+        self.assertEqual(json.loads(self.download('json')[1]), [])
+
+    def test_etag_and_content_length(self):
+        first, body = self.download()
+        self.assertNotIn('Content-Length', first)
+        second, _ = self.download()
+        self.assertEqual(second['ETag'], first['ETag'])
+        self.assertEqual(int(second['Content-Length']), len(body.encode()))
+        self.assertNotEqual(self.download('csv')[0]['ETag'], first['ETag'])
+
+        response, _ = self.download(HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_cart_changes_change_the_etag(self):
+        etag = self.download()[0]['ETag']
+        self.client.delete(f'/api/recipes/{self.recipes[1].id}/shopping_cart/')
+        response, body = self.download(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('ingredient 0 - 10 (г)', body)
+
+    def test_ingredient_rename_changes_the_etag(self):
+        first, _ = self.download()
+        self.download()
+        ingredient = Ingredient.objects.get(pk=self.ingredients[0].pk)
+        ingredient.name = 'ingredient with a much longer name'
+        ingredient.save()
+
+        response, body = self.download(HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], first['ETag'])
+        self.assertIn('ingredient with a much longer name - 15 (г)', body)
+        if response.has_header('Content-Length'):
+            self.assertEqual(
+                int(response['Content-Length']), len(body.encode()))
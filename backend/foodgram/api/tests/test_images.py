@@ -0,0 +1,83 @@
+from io import StringIO
+
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+
+from core.const import AVATAR_SIZES
+from core.models import ImageJob, MediaFile
+
+from .utils import APITestCase, create_user, image_data_url, token_client
+
+
+class ImageVariantsTest(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = create_user('cook')
+        self.client = token_client(self.user)
+
+    def upload_avatar(self, color=(200, 100, 50)):
+        response = self.client.put(
+            '/api/users/me/avatar/', {'avatar': image_data_url(color)},
+            format='json')
+        self.assertEqual(response.status_code, 200)
+        self.user.refresh_from_db()
+
+    def process(self):
+        call_command('process_images', '--once', stdout=StringIO(),
+                     stderr=StringIO())
+        self.user.refresh_from_db()
+
+    def test_upload_queues_a_job(self):
+        self.upload_avatar()
+        job = ImageJob.objects.get()
+        self.assertEqual(job.status, ImageJob.PENDING)
+        self.assertEqual(job.source, self.user.avatar.name)
+        self.assertEqual(self.user.avatar_variants, {})
+
+    def test_worker_renders_variants(self):
+        self.upload_avatar()
+        self.process()
+        self.assertEqual(ImageJob.objects.get().status, ImageJob.DONE)
+        variants = self.user.avatar_variants
+        self.assertEqual(variants['source'], self.user.avatar.name)
+        self.assertTrue(set(AVATAR_SIZES) <= set(variants['files']))
+        for name in variants['files'].values():
+            self.assertTrue(default_storage.exists(name))
+
+    def test_new_upload_replaces_variants(self):
+        self.upload_avatar()
+        self.process()
+        self.upload_avatar(color=(10, 20, 30))
+        self.process()
+        self.assertEqual(
+            self.user.avatar_variants['source'], self.user.avatar.name)
+
+    def test_earlier_upload_is_rebuilt(self):
+        first = (200, 100, 50)
+        self.upload_avatar(first)
+        self.process()
+        self.upload_avatar(color=(10, 20, 30))
+        self.process()
+        self.upload_avatar(first)
+        job = ImageJob.objects.get(source=self.user.avatar.name)
+        self.assertEqual((job.status, job.attempts), (ImageJob.PENDING, 0))
+        self.process()
+        self.assertEqual(
+            self.user.avatar_variants['source'], self.user.avatar.name)
+
+    def test_delete_keeps_shared_files(self):
+        other = create_user('other')
+        self.upload_avatar()
+        token_client(other).put(
+            '/api/users/me/avatar/', {'avatar': image_data_url()},
+            format='json')
+        other.refresh_from_db()
+        self.assertEqual(other.avatar.name, self.user.avatar.name)
+
+        response = self.client.delete('/api/users/me/avatar/')
+        self.assertEqual(response.status_code, 204)
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.avatar)
+        self.assertTrue(default_storage.exists(other.avatar.name))
+        self.assertEqual(
+            MediaFile.objects.get(name=other.avatar.name).refcount, 1)
@@ -0,0 +1,61 @@
+from api.search import IngredientIndex, ingredient_index
+from core.models import Ingredient
+from core.signals import bulk_changed
+
+from .utils import APITestCase
+
+NAMES = ('Сахар', 'сахарная пудра', 'Тростниковый сахар', 'соль', 'Ёлка')
+
+
+class IngredientSearchTest(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Ingredient.objects.bulk_create(
+            Ingredient(name=name, measurement_unit='г') for name in NAMES)
+
+    def setUp(self):
+        super().setUp()
+        ingredient_index.invalidate()
+        self.addCleanup(ingredient_index.invalidate)
+
+    def names(self, query):
+        response = self.client.get('/api/ingredients/', {'name': query})
+        self.assertEqual(response.status_code, 200)
+        return [ingredient['name'] for ingredient in response.data]
+
+    def test_prefix_matches_come_first(self):
+        self.assertEqual(
+            self.names('сах'),
+            ['Сахар', 'сахарная пудра', 'Тростниковый сахар'])
+
+    def test_case_folding(self):
+        self.assertEqual(self.names('САХАРН'), ['сахарная пудра'])
+        self.assertEqual(self.names('ёл'), ['Ёлка'])
+
+    def test_lookups_skip_the_database(self):
+        self.names('сах')
+        with self.assertNumQueries(0):
+            self.assertEqual(ingredient_index.search('сол')[0].name, 'соль')
+
+    def test_save_and_delete_invalidate(self):
+        self.names('сах')
+        Ingredient.objects.create(name='Сахарин', measurement_unit='г')
+        self.assertIn('Сахарин', self.names('сах'))
+        Ingredient.objects.filter(name='Сахарин').get().delete()
+        self.assertNotIn('Сахарин', self.names('сах'))
+
+    def test_bulk_changes_invalidate(self):
+        self.names('сол')
+        Ingredient.objects.filter(name='соль').update(name='солод')
+        bulk_changed.send(sender=Ingredient)
+        self.assertEqual(self.names('сол'), ['солод'])
+
+
+class IngredientIndexTtlTest(APITestCase):
+    def test_ttl_reloads(self):
+        index = IngredientIndex(ttl=0)
+        self.assertEqual(index.search('мука'), [])
+        Ingredient.objects.bulk_create(
+            [Ingredient(name='Мука', measurement_unit='г')])
+        self.assertEqual([item.name for item in index.search('мука')],
+                         ['Мука'])
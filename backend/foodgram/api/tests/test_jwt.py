@@ -0,0 +1,97 @@
+from unittest import mock, skipUnless
+
+from django.conf import settings
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework_simplejwt.authentication import JWTTokenUserAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.tokens import AccessToken
+
+from api.authentication import ClaimsUser, get_user_instance
+from api.views import RecipeViewSet
+from core.models import Favorite
+
+from .utils import APITestCase, create_recipe, create_user
+
+
+def bearer_client(user):
+    client = APIClient()
+    client.credentials(
+        HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}')
+    return client
+
+
+class ClaimsUserTest(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('cook')
+
+    def authenticate(self, user):
+        request = APIRequestFactory().get(
+            '/', HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}')
+        return JWTTokenUserAuthentication().authenticate(request)[0]
+
+    def test_claims_answer_without_queries(self):
+        with self.assertNumQueries(0):
+            user = self.authenticate(self.user)
+            self.assertIsInstance(user, ClaimsUser)
+            self.assertEqual((user.id, user.pk), (self.user.id, self.user.id))
+            self.assertTrue(user.is_authenticated)
+
+    def test_user_row_is_loaded_once(self):
+        user = self.authenticate(self.user)
+        with self.assertNumQueries(1):
+            self.assertEqual(get_user_instance(user), self.user)
+            self.assertEqual(user.username, 'cook')
+        self.assertIs(get_user_instance(self.user), self.user)
+
+    def test_inactive_user_is_rejected_on_load(self):
+        user = self.authenticate(self.user)
+        type(self.user).objects.filter(pk=self.user.pk).update(
+            is_active=False)
+        with self.assertRaises(AuthenticationFailed):
+            get_user_instance(user)
+
+
+@mock.patch.object(
+    RecipeViewSet, 'authentication_classes',
+    [JWTTokenUserAuthentication, TokenAuthentication])
+class BearerRequestsTest(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('cook')
+        cls.recipes = [create_recipe(cls.user) for _ in range(2)]
+        Favorite.objects.create(user=cls.user, recipe=cls.recipes[0])
+
+    def setUp(self):
+        super().setUp()
+        self.client = bearer_client(self.user)
+
+    def test_reads_skip_the_auth_query(self):
+        self.client.get('/api/recipes/')
+        with self.assertNumQueries(4):
+            response = self.client.get('/api/recipes/?is_favorited=1')
+        self.assertEqual(
+            [recipe['id'] for recipe in response.data['results']],
+            [self.recipes[0].id])
+
+    def test_writes_use_the_claimed_user(self):
+        response = self.client.post(
+            f'/api/recipes/{self.recipes[1].id}/shopping_cart/')
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(self.user.shopping_cart.filter(
+            recipe=self.recipes[1]).exists())
+
+
+@skipUnless(settings.JWT_AUTH_ENABLED, 'JWT_AUTH_ENABLED выключен.')
+class JWTRoutesTest(APITestCase):
+    def test_create_and_refresh(self):
+        user = create_user('cook')
+        user.set_password('secret-password')
+        user.save()
+        response = self.client.post('/api/auth/jwt/create/', {
+            'email': user.email, 'password': 'secret-password'})
+        self.assertEqual(response.status_code, 200)
+        response = self.client.post(
+            '/api/auth/jwt/refresh/', {'refresh': response.data['refresh']})
+        self.assertEqual(response.status_code, 200)
@@ -0,0 +1,47 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from prometheus_client import REGISTRY
+
+from .utils import (APITestCase, create_ingredients, create_recipe,
+                    create_user, token_client)
+
+
+def sample(name, endpoint):
+    return REGISTRY.get_sample_value(name, {'endpoint': endpoint}) or 0
+
+
+class MetricsTest(APITestCase):
+    def test_streamed_queries_are_recorded(self):
+        user = create_user('cook')
+        recipe = create_recipe(user, create_ingredients(2))
+        client = token_client(user)
+        client.post(f'/api/recipes/{recipe.id}/shopping_cart/')
+        endpoint = 'RecipeViewSet.download_shopping_cart'
+        before = (
+            sample('foodgram_request_sql_queries_count', endpoint),
+            sample('foodgram_request_sql_queries_sum', endpoint))
+
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get('/api/recipes/download_shopping_cart/')
+            # Nothing is observed before the body is consumed.
+            self.assertEqual(
+                sample('foodgram_request_sql_queries_count', endpoint),
+                before[0])
+            content = b''.join(response.streaming_content)
+
+        self.assertIn('ingredient 0', content.decode())
+        self.assertEqual(
+            sample('foodgram_request_sql_queries_count', endpoint),
+            before[0] + 1)
+        self.assertEqual(
+            sample('foodgram_request_sql_queries_sum', endpoint) - before[1],
+            len(queries))
+
+    def test_scrape_endpoint(self):
+        self.client.get('/api/ingredients/')
+        response = self.client.get('/api/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        self.assertIn(
+            b'foodgram_request_duration_seconds_count{'
+            b'endpoint="IngredientViewSet.list"', response.content)
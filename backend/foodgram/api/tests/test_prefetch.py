@@ -0,0 +1,50 @@
+from core.models import Favorite, ShoppingCart, Subscription
+
+from .utils import (
+    APITestCase,
+    create_ingredients,
+    create_recipe,
+    create_user,
+    token_client
+)
+
+PAGE_SIZES = (2, 20)
+
+
+class PageQueryCountTest(APITestCase):
+    # The number of queries of a page must not grow with its size.
+    @classmethod
+    def setUpTestData(cls):
+        cls.viewer = create_user('viewer')
+        ingredients = create_ingredients(5)
+        for number in range(max(PAGE_SIZES)):
+            author = create_user(f'author{number}')
+            Subscription.objects.create(user=cls.viewer, subscribed_to=author)
+            for _ in range(3):
+                recipe = create_recipe(author, ingredients)
+                Favorite.objects.create(user=cls.viewer, recipe=recipe)
+                ShoppingCart.objects.create(user=cls.viewer, recipe=recipe)
+
+    def setUp(self):
+        super().setUp()
+        self.client = token_client(self.viewer)
+
+    def assert_page_queries(self, url, expected):
+        # The first request fills per-process caches (content types).
+        self.client.get(url.format(limit=1))
+        for limit in PAGE_SIZES:
+            with self.subTest(url=url, limit=limit):
+                with self.assertNumQueries(expected):
+                    response = self.client.get(url.format(limit=limit))
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.data['results']), limit)
+
+    def test_recipe_list(self):
+        self.assert_page_queries('/api/recipes/?limit={limit}', 5)
+        self.assert_page_queries(
+            '/api/recipes/?limit={limit}&is_favorited=1', 5)
+
+    def test_subscriptions(self):
+        self.assert_page_queries('/api/users/subscriptions/?limit={limit}', 5)
+        self.assert_page_queries(
+            '/api/users/subscriptions/?limit={limit}&recipes_limit=1', 5)
@@ -0,0 +1,115 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+
+from api.profiling import make_header_token, rotate, valid_header_token
+
+from .utils import (APITestCase, create_ingredients, create_recipe,
+                    create_user, token_client)
+
+
+class ProfilerTest(APITestCase):
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory(prefix='foodgram-profiles-')
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        settings = override_settings(
+            PROFILER_ENABLED=True, PROFILER_DIR=self.directory,
+            PROFILER_SAMPLE_RATE=0, PROFILER_SLOW_MS=60 * 1000,
+            PROFILER_CPROFILE=False, PROFILER_MAX_FILES=500)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.cook = create_user('cook')
+        self.recipe = create_recipe(self.cook, create_ingredients(2))
+
+    def reports(self):
+        reports = []
+        for name in sorted(os.listdir(self.directory)):
+            if name.endswith('.json'):
+                with open(os.path.join(self.directory, name),
+                          encoding='utf-8') as report:
+                    reports.append(json.load(report))
+        return reports
+
+    def test_only_marked_requests_are_kept(self):
+        self.client.get('/api/recipes/')
+        self.client.get('/api/recipes/', HTTP_X_PROFILE='forged')
+        self.assertEqual(self.reports(), [])
+
+        # Anonymous lists are cached: make the request reach the database.
+        cache.clear()
+        self.client.get('/api/recipes/', HTTP_X_PROFILE=make_header_token())
+        report, = self.reports()
+        self.assertEqual(
+            (report['endpoint'], report['reason'], report['status']),
+            ('RecipeViewSet.list', 'header', 200))
+        self.assertEqual(report['query_count'], len(report['queries']))
+        self.assertGreater(report['query_count'], 0)
+
+    @override_settings(PROFILER_SLOW_MS=0, PROFILER_CPROFILE=True)
+    def test_slow_requests_and_summary(self):
+        self.client.get('/api/recipes/')
+        report, = self.reports()
+        self.assertEqual(report['reason'], 'slow')
+        # cProfile only runs for sampled and header requests.
+        self.assertIsNone(report['profile'])
+
+        output = StringIO()
+        call_command('profile_summary', stdout=output)
+        self.assertIn('RecipeViewSet.list', output.getvalue())
+
+    @override_settings(PROFILER_SAMPLE_RATE=1, PROFILER_CPROFILE=True)
+    def test_sampled_requests_keep_a_profile(self):
+        self.client.get('/api/recipes/')
+        report, = self.reports()
+        self.assertEqual(report['reason'], 'sampled')
+        self.assertTrue(os.path.exists(
+            os.path.join(self.directory, report['profile'])))
+
+    def test_streamed_response_is_reported_after_the_body(self):
+        client = token_client(self.cook)
+        client.post(f'/api/recipes/{self.recipe.id}/shopping_cart/')
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(
+                '/api/recipes/download_shopping_cart/',
+                HTTP_X_PROFILE=make_header_token())
+            self.assertTrue(response.streaming)
+            self.assertEqual(self.reports(), [])
+            body = b''.join(response.streaming_content).decode()
+        self.assertIn('ingredient 0 - 10 (г)', body)
+
+        report, = self.reports()
+        self.assertEqual(
+            (report['endpoint'], report['reason']),
+            ('RecipeViewSet.download_shopping_cart', 'header'))
+        # The shopping list query runs while the body is streamed.
+        self.assertEqual(report['query_count'], len(queries))
+        self.assertTrue(any(
+            'core_shoppingcarttotal' in query['sql']
+            for query in report['queries']))
+
+
+class ProfilerHelpersTest(APITestCase):
+    def test_header_token_signature(self):
+        token = make_header_token()
+        self.assertTrue(valid_header_token(token))
+        self.assertFalse(valid_header_token(token + 'x'))
+        self.assertFalse(valid_header_token(''))
+
+    def test_rotate_keeps_the_newest_reports(self):
+        with tempfile.TemporaryDirectory() as directory:
+            for stem in ('20240101', '20240102', '20240103'):
+                for suffix in ('.json', '.prof'):
+                    open(os.path.join(directory, stem + suffix), 'w').close()
+            rotate(directory, 2)
+            self.assertEqual(sorted(os.listdir(directory)), [
+                '20240102.json', '20240102.prof',
+                '20240103.json', '20240103.prof'])
@@ -0,0 +1,16 @@
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+
+class QueryBudgetsTest(TestCase):
+    # Runs the check_query_budgets scenarios on small data: the counts do
+    # not depend on the size, so the recorded budgets apply unchanged.
+    def test_endpoints_stay_within_budgets(self):
+        output = StringIO()
+        try:
+            call_command(
+                'check_query_budgets', '--sizes', '2', '6', stdout=output)
+        except CommandError as error:
+            self.fail(f'{error}\n{output.getvalue()}')
@@ -0,0 +1,52 @@
+from django.conf import settings
+
+from core.models import Favorite
+
+from .utils import (APITestCase, create_ingredients, create_recipe,
+                    create_user, token_client)
+
+
+class RecipesByIdsTest(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('cook')
+        ingredients = create_ingredients(3)
+        cls.recipes = [
+            create_recipe(cls.user, ingredients, name=f'Рецепт {number}')
+            for number in range(4)
+        ]
+        Favorite.objects.create(user=cls.user, recipe=cls.recipes[2])
+
+    def get(self, ids, client=None):
+        return (client or self.client).get(
+            '/api/recipes/', {'ids': ','.join(map(str, ids))})
+
+    def test_request_order_without_unknown_ids(self):
+        first, second, third, _ = (recipe.id for recipe in self.recipes)
+        response = self.get([third, 999999, first, second, third])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [recipe['id'] for recipe in response.data],
+            [third, first, second])
+
+    def test_user_flags(self):
+        response = self.get(
+            [recipe.id for recipe in self.recipes], token_client(self.user))
+        self.assertEqual(
+            [recipe['is_favorited'] for recipe in response.data],
+            [False, False, True, False])
+
+    def test_query_count_does_not_grow(self):
+        client = token_client(self.user)
+        self.get([self.recipes[0].id], client)
+        ids = [recipe.id for recipe in self.recipes]
+        with self.assertNumQueries(4):
+            self.get(ids[:1], client)
+        with self.assertNumQueries(4):
+            self.get(ids, client)
+
+    def test_invalid_ids(self):
+        for ids in (['x'], [''], ['0'], range(1, settings.MAX_RECIPE_IDS + 2)):
+            response = self.get(ids)
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('ids', response.data)
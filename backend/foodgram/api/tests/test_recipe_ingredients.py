@@ -0,0 +1,82 @@
+from api.serializers import RecipeCreateSerializer
+from core import shopping_cart as shopping_totals
+from core.models import IngredientInRecipe
+
+from .utils import (APITestCase, create_ingredients, create_recipe,
+                    create_user, token_client)
+
+
+class RecipeIngredientsTest(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user('author')
+        cls.buyer = create_user('buyer')
+        cls.ingredients = create_ingredients(4)
+        cls.recipe = create_recipe(cls.author, cls.ingredients[:3])
+
+    def setUp(self):
+        super().setUp()
+        self.client = token_client(self.author)
+        self.url = f'/api/recipes/{self.recipe.id}/'
+
+    def patch(self, *amounts):
+        return self.client.patch(self.url, {'ingredients': [
+            {'id': ingredient.id, 'amount': amount}
+            for ingredient, amount in amounts
+        ]}, format='json')
+
+    def stored_amounts(self):
+        return dict(IngredientInRecipe.objects.filter(
+            recipe=self.recipe).values_list('ingredient_id', 'amount'))
+
+    def test_update_applies_the_diff(self):
+        first, second, _, fourth = self.ingredients
+        kept = IngredientInRecipe.objects.get(
+            recipe=self.recipe, ingredient=first)
+        response = self.patch((first, 10), (second, 25), (fourth, 7))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            self.stored_amounts(), {first.id: 10, second.id: 25, fourth.id: 7})
+        # Unchanged rows are kept rather than deleted and inserted again.
+        self.assertTrue(
+            IngredientInRecipe.objects.filter(id=kept.id).exists())
+        self.assertEqual(
+            sorted(item['amount'] for item in response.data['ingredients']),
+            [7, 10, 25])
+
+    def test_update_keeps_shopping_totals(self):
+        token_client(self.buyer).post(
+            f'/api/recipes/{self.recipe.id}/shopping_cart/')
+        first, second, _, fourth = self.ingredients
+        self.patch((first, 3), (fourth, 5))
+        user_ids = [self.buyer.id]
+        self.assertEqual(
+            shopping_totals.stored_totals(user_ids),
+            shopping_totals.expected_totals(user_ids))
+        self.assertEqual(
+            shopping_totals.stored_totals(user_ids)[self.buyer.id],
+            {first.id: (3, 1), fourth.id: (5, 1)})
+
+    def test_rejects_duplicates_and_unknown_ids(self):
+        first = self.ingredients[0]
+        response = self.patch((first, 1), (first, 2))
+        self.assertEqual(response.status_code, 400)
+        response = self.client.patch(self.url, {'ingredients': [
+            {'id': first.id, 'amount': 1}, {'id': 999999, 'amount': 1}
+        ]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['ingredients'][0], {})
+        self.assertIn('id', response.data['ingredients'][1])
+        self.assertEqual(
+            self.stored_amounts(),
+            {ingredient.id: 10 for ingredient in self.ingredients[:3]})
+
+    def test_ingredients_validated_in_one_query(self):
+        serializer = RecipeCreateSerializer()
+        with self.assertNumQueries(1):
+            validated = serializer.validate_ingredients([
+                {'id': ingredient.id, 'amount': 1}
+                for ingredient in self.ingredients
+            ])
+        self.assertEqual(
+            [item['ingredient'] for item in validated], self.ingredients)
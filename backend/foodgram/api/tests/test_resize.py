@@ -0,0 +1,99 @@
+import io
+import os
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from django.core.cache import cache as django_cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image
+
+from api.media import ResizeCache, resize_cache
+
+from .utils import APITestCase
+
+
+def png_bytes(size=(200, 100)):
+    content = io.BytesIO()
+    Image.new('RGB', size, (20, 120, 220)).save(content, 'PNG')
+    return content.getvalue()
+
+
+def cache_size(resize):
+    return django_cache.get(resize.size_key())
+
+
+class MediaResizeTest(APITestCase):
+    def setUp(self):
+        super().setUp()
+        cache_dir = tempfile.TemporaryDirectory(prefix='foodgram-resize-')
+        self.addCleanup(cache_dir.cleanup)
+        patcher = mock.patch.object(
+            resize_cache, 'directory', Path(cache_dir.name))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.name = default_storage.save(
+            'recipes/source.png', ContentFile(png_bytes()))
+
+    def get(self, query, **headers):
+        return self.client.get(
+            f'/api/media/resize/{self.name}?{query}', **headers)
+
+    def test_resizes_within_the_box(self):
+        response = self.get('w=96&h=96&fmt=webp')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/webp')
+        image = Image.open(io.BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual(image.size, (96, 48))
+        self.assertIn('immutable', response['Cache-Control'])
+
+    def test_etag_answers_not_modified(self):
+        etag = self.get('w=96&h=96')['ETag']
+        response = self.get('w=96&h=96', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_rejects_unlisted_size_and_format(self):
+        self.assertEqual(self.get('w=97&h=97').status_code, 400)
+        self.assertEqual(self.get('w=96&h=96&fmt=gif').status_code, 400)
+
+    def test_unknown_and_outside_files(self):
+        self.assertEqual(self.client.get(
+            '/api/media/resize/recipes/missing.png?w=96&h=96'
+        ).status_code, 404)
+        self.assertEqual(self.client.get(
+            '/api/media/resize/../manage.py?w=96&h=96'
+        ).status_code, 404)
+
+
+class ResizeCacheTest(APITestCase):
+    def test_evicts_least_recently_used(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cache = ResizeCache(directory, max_size=250)
+            for number, key in enumerate(('aa1', 'bb2', 'cc3')):
+                cache.fetch(key, 'png', lambda: b'x' * 100).close()
+                path = cache.path(key, 'png')
+                if path.exists():
+                    os.utime(path, (number, number))
+            self.assertFalse(cache.path('aa1', 'png').exists())
+            self.assertTrue(cache.path('cc3', 'png').exists())
+
+    def test_scans_only_past_the_budget(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cache = ResizeCache(directory, max_size=1000)
+            with mock.patch.object(
+                    cache, 'evict', wraps=cache.evict) as evict:
+                # The first write finds no size estimate and scans once.
+                for number in range(9):
+                    cache.fetch(f'{number:03}', 'png',
+                                lambda: b'x' * 100).close()
+                self.assertEqual(evict.call_count, 1)
+
+                cache.fetch('999', 'png', lambda: b'x' * 100).close()
+                cache.fetch('998', 'png', lambda: b'x' * 100).close()
+                self.assertEqual(evict.call_count, 2)
+
+            files = list(Path(directory).glob('*/*.png'))
+            self.assertEqual(len(files), 9)
+            # The scan resets the estimate to what is left on disk.
+            self.assertEqual(cache_size(cache), 900)
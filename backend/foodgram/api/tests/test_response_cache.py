@@ -0,0 +1,68 @@
+from core.models import Favorite, Recipe
+from core.signals import bulk_changed
+
+from .utils import APITestCase, create_recipe, create_user, token_client
+
+URL = '/api/recipes/'
+
+
+class VersionedCacheTest(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user('author')
+        cls.viewer = create_user('viewer')
+        cls.recipe = create_recipe(cls.author, name='Старое')
+
+    def names(self, client=None):
+        response = (client or self.client).get(URL)
+        self.assertEqual(response.status_code, 200)
+        return [recipe['name'] for recipe in response.data['results']]
+
+    def rename(self, name):
+        # A queryset update sends no signals: only the cache explains
+        # a response that still shows the old name.
+        Recipe.objects.filter(id=self.recipe.id).update(name=name)
+
+    def test_anonymous_hit(self):
+        first = self.client.get(URL)
+        with self.assertNumQueries(0):
+            second = self.client.get(URL)
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(second['ETag'], first['ETag'])
+
+        with self.assertNumQueries(0):
+            response = self.client.get(
+                URL, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_save_invalidates(self):
+        etag = self.client.get(URL)['ETag']
+        self.rename('Новое')
+        self.assertEqual(self.names(), ['Старое'])
+
+        self.recipe.refresh_from_db()
+        self.recipe.save()
+        response = self.client.get(URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.names(), ['Новое'])
+
+    def test_bulk_changed_invalidates(self):
+        self.names()
+        self.rename('Новое')
+        self.assertEqual(self.names(), ['Старое'])
+
+        bulk_changed.send(sender=Recipe)
+        self.assertEqual(self.names(), ['Новое'])
+
+    def test_authenticated_requests_bypass_the_cache(self):
+        client = token_client(self.viewer)
+        self.names()
+        self.names(client)
+        self.rename('Новое')
+        Favorite.objects.create(user=self.viewer, recipe=self.recipe)
+
+        self.assertEqual(self.names(), ['Старое'])
+        response = client.get(URL)
+        self.assertNotIn('ETag', response)
+        self.assertEqual(response.data['results'][0]['name'], 'Новое')
+        self.assertTrue(response.data['results'][0]['is_favorited'])
@@ -0,0 +1,44 @@
+from unittest import skipUnless
+
+from django.db import connection
+from django.db.models import F
+
+from core.models import Recipe
+
+from .utils import APITestCase, create_recipe, create_user
+
+
+class RecipeSearchTest(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = create_user('author')
+        cls.soup = create_recipe(author, name='Борщ украинский')
+        cls.salad = create_recipe(author, name='Салат оливье')
+
+    def search(self, query):
+        response = self.client.get('/api/recipes/', {'search': query})
+        self.assertEqual(response.status_code, 200)
+        return [recipe['id'] for recipe in response.data['results']]
+
+    def test_finds_by_name(self):
+        self.assertEqual(self.search('борщ'), [self.soup.id])
+
+    def test_renamed_recipe_is_reindexed(self):
+        self.salad.name = 'Борщ зелёный'
+        self.salad.save()
+        self.assertCountEqual(
+            self.search('борщ'), [self.soup.id, self.salad.id])
+
+    def test_counter_update_keeps_index(self):
+        Recipe.objects.filter(pk=self.soup.pk).update(
+            favorites_count=F('favorites_count') + 1)
+        self.assertEqual(self.search('борщ'), [self.soup.id])
+
+    @skipUnless(connection.vendor == 'sqlite', 'SQLite FTS5 trigger')
+    def test_update_trigger_is_limited_to_indexed_columns(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT sql FROM sqlite_master WHERE type = 'trigger' "
+                "AND name = 'core_recipe_fts_update'")
+            sql, = cursor.fetchone()
+        self.assertIn('UPDATE OF name, text', sql)
@@ -0,0 +1,106 @@
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+
+from core import shopping_cart as shopping_totals
+from core.models import IngredientInRecipe, Recipe, ShoppingCart, User
+
+from .utils import (APITestCase, create_ingredients, create_recipe,
+                    create_user, token_client)
+
+
+class CascadeDeleteTotalsTest(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='x')
+        cls.author = create_user('author')
+        cls.author.set_password('author-password')
+        cls.author.save()
+        cls.buyer = create_user('buyer')
+        cls.other = create_user('other')
+        cls.ingredients = create_ingredients(3)
+        cls.recipe = create_recipe(cls.author, cls.ingredients[:2])
+        cls.kept = create_recipe(cls.other, cls.ingredients[1:], amount=5)
+
+    def setUp(self):
+        super().setUp()
+        client = token_client(self.buyer)
+        for recipe in (self.recipe, self.kept):
+            client.post(f'/api/recipes/{recipe.id}/shopping_cart/')
+        self.assertTotals({
+            self.ingredients[0].id: (10, 1),
+            self.ingredients[1].id: (15, 2),
+            self.ingredients[2].id: (5, 1),
+        })
+
+    def assertTotals(self, expected):
+        user_ids = [self.buyer.id]
+        stored = shopping_totals.stored_totals(user_ids)
+        self.assertEqual(stored, shopping_totals.expected_totals(user_ids))
+        self.assertEqual(stored.get(self.buyer.id, {}), expected)
+
+    def assertOnlyKeptRecipe(self):
+        self.assertTotals({
+            self.ingredients[1].id: (5, 1),
+            self.ingredients[2].id: (5, 1),
+        })
+
+    def test_account_deletion(self):
+        response = token_client(self.author).delete(
+            f'/api/users/{self.author.id}/',
+            {'current_password': 'author-password'}, format='json')
+        self.assertEqual(response.status_code, 204)
+        self.assertOnlyKeptRecipe()
+
+    def test_admin_recipe_deletion(self):
+        self.client.force_login(self.admin)
+        response = self.client.post(
+            f'/admin/core/recipe/{self.recipe.id}/delete/', {'post': 'yes'})
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(Recipe.objects.filter(id=self.recipe.id).exists())
+        self.assertOnlyKeptRecipe()
+
+    def test_admin_user_deletion(self):
+        self.client.force_login(self.admin)
+        response = self.client.post('/admin/core/user/', {
+            'action': 'delete_selected',
+            '_selected_action': [self.author.id],
+            'post': 'yes',
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertOnlyKeptRecipe()
+
+    def test_admin_cart_deletion(self):
+        self.client.force_login(self.admin)
+        cart = ShoppingCart.objects.get(user=self.buyer, recipe=self.recipe)
+        response = self.client.post('/admin/core/shoppingcart/', {
+            'action': 'delete_selected',
+            '_selected_action': [cart.id],
+            'post': 'yes',
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertOnlyKeptRecipe()
+
+    def test_admin_recipe_ingredient_edit(self):
+        self.client.force_login(self.admin)
+        row = IngredientInRecipe.objects.get(
+            recipe=self.recipe, ingredient=self.ingredients[0])
+        response = self.client.post(
+            f'/admin/core/ingredientinrecipe/{row.id}/change/', {
+                'recipe': self.kept.id,
+                'ingredient': self.ingredients[0].id,
+                'amount': 7,
+            })
+        self.assertEqual(response.status_code, 302)
+        self.assertTotals({
+            self.ingredients[0].id: (7, 1),
+            self.ingredients[1].id: (15, 2),
+            self.ingredients[2].id: (5, 1),
+        })
+
+    def test_verify_rejects_non_positive_batch_size(self):
+        with self.assertRaises(CommandError):
+            call_command(
+                'verify_shopping_totals', '--batch-size', '0',
+                stdout=StringIO())
@@ -0,0 +1,92 @@
+from types import SimpleNamespace
+
+from django.contrib.auth.models import AnonymousUser
+
+from api.utils import SubscriptionResolver
+from core.models import Subscription
+
+from .utils import APITestCase, create_recipe, create_user, token_client
+
+
+class IsSubscribedTest(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.viewer = create_user('viewer')
+        cls.followed = create_user('followed')
+        cls.other = create_user('other')
+        Subscription.objects.create(
+            user=cls.viewer, subscribed_to=cls.followed)
+        for author in (cls.viewer, cls.followed, cls.other):
+            create_recipe(author, name=f'Рецепт {author.username}')
+
+    def setUp(self):
+        super().setUp()
+        self.client = token_client(self.viewer)
+        self.expected = {
+            self.viewer.id: False,
+            self.followed.id: True,
+            self.other.id: False,
+        }
+
+    def test_user_list_and_profiles(self):
+        response = self.client.get('/api/users/')
+        self.assertEqual(
+            {user['id']: user['is_subscribed']
+             for user in response.data['results']},
+            self.expected)
+        for user_id, expected in self.expected.items():
+            response = self.client.get(f'/api/users/{user_id}/')
+            self.assertEqual(response.data['is_subscribed'], expected)
+        self.assertFalse(
+            self.client.get('/api/users/me/').data['is_subscribed'])
+
+    def test_recipe_authors(self):
+        response = self.client.get('/api/recipes/')
+        self.assertEqual(
+            {recipe['author']['id']: recipe['author']['is_subscribed']
+             for recipe in response.data['results']},
+            self.expected)
+
+    def test_subscriptions_and_subscribe(self):
+        response = self.client.get('/api/users/subscriptions/')
+        self.assertEqual(
+            [(user['id'], user['is_subscribed'])
+             for user in response.data['results']],
+            [(self.followed.id, True)])
+        response = self.client.post(f'/api/users/{self.other.id}/subscribe/')
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(response.data['is_subscribed'])
+
+    def test_anonymous_sees_no_subscriptions(self):
+        response = self.client_class().get('/api/recipes/')
+        self.assertFalse(any(
+            recipe['author']['is_subscribed']
+            for recipe in response.data['results']))
+
+
+class SubscriptionResolverTest(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.viewer = create_user('viewer')
+        cls.authors = [create_user(f'author{number}') for number in range(3)]
+        Subscription.objects.create(
+            user=cls.viewer, subscribed_to=cls.authors[0])
+
+    def test_loads_each_author_once(self):
+        resolver = SubscriptionResolver(self.viewer)
+        with self.assertNumQueries(1):
+            resolver.load(author.id for author in self.authors)
+            resolver.load([self.authors[0].id])
+            self.assertEqual(
+                [resolver.is_subscribed(author) for author in self.authors],
+                [True, False, False])
+        with self.assertNumQueries(1):
+            self.assertFalse(resolver.is_subscribed(
+                SimpleNamespace(id=self.viewer.id + 100)))
+
+    def test_self_and_anonymous(self):
+        with self.assertNumQueries(0):
+            self.assertFalse(
+                SubscriptionResolver(self.viewer).is_subscribed(self.viewer))
+            self.assertFalse(SubscriptionResolver(
+                AnonymousUser()).is_subscribed(self.authors[0]))
@@ -0,0 +1,72 @@
+import base64
+import io
+import shutil
+import tempfile
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from PIL import Image
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.models import Ingredient, IngredientInRecipe, Recipe, User
+
+
+def create_user(name, **fields):
+    return User.objects.create(
+        username=name, email=f'{name}@example.com',
+        first_name=name, last_name=name, **fields)
+
+
+def create_ingredients(count, prefix='ingredient'):
+    Ingredient.objects.bulk_create(
+        Ingredient(name=f'{prefix} {number}', measurement_unit='г')
+        for number in range(count))
+    return list(Ingredient.objects.filter(
+        name__startswith=f'{prefix} ').order_by('id'))
+
+
+def create_recipe(author, ingredients=(), amount=10, name='Рецепт'):
+    recipe = Recipe.objects.create(
+        author=author, name=name, text='Описание.',
+        image='recipes/test.png', cooking_time=10)
+    IngredientInRecipe.objects.bulk_create(
+        IngredientInRecipe(recipe=recipe, ingredient=ingredient,
+                           amount=amount)
+        for ingredient in ingredients)
+    return recipe
+
+
+def image_data_url(color=(200, 100, 50), image_format='PNG'):
+    image = Image.new('RGB', (40, 30), color)
+    content = io.BytesIO()
+    image.save(content, image_format)
+    encoded = base64.b64encode(content.getvalue()).decode()
+    return f'data:image/{image_format.lower()};base64,{encoded}'
+
+
+def token_client(user):
+    client = APIClient()
+    client.credentials(
+        HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=user).key}')
+    return client
+
+
+class APITestCase(TestCase):
+    # Uploads go to a temporary MEDIA_ROOT, cached responses do not leak
+    # from one test into another.
+    @classmethod
+    def setUpClass(cls):
+        cls.media_root = tempfile.mkdtemp(prefix='foodgram-media-')
+        cls.media_settings = override_settings(MEDIA_ROOT=cls.media_root)
+        cls.media_settings.enable()
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls.media_settings.disable()
+        shutil.rmtree(cls.media_root, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
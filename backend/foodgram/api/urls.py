@@ -1,9 +1,12 @@
+from django.conf import settings
 from django.urls import path, include
 
 from rest_framework.routers import SimpleRouter
 
 from .views import (
     IngredientViewSet,
+    MediaResizeView,
+    MetricsView,
     RecipeViewSet,
     UserAccountViewSet
 )
@@ -17,4 +20,10 @@ urlpatterns = [
     path('', include(router.urls)),
     path('', include('djoser.urls')),
     path('auth/', include('djoser.urls.authtoken')),
+    path('media/resize/<path:path>', MediaResizeView.as_view(),
+         name='media-resize'),
+    path('metrics', MetricsView.as_view(), name='metrics'),
 ]
+
+if settings.JWT_AUTH_ENABLED:
+    urlpatterns.append(path('auth/', include('djoser.urls.jwt')))
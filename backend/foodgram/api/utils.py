@@ -0,0 +1,87 @@
+from collections import defaultdict
+
+from django.db.models import F, Window
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import RowNumber
+
+from core.models import Recipe, Subscription
+
+RECIPE_PREVIEW_FIELDS = (
+    'id', 'author_id', 'name', 'image', 'image_variants', 'cooking_time')
+
+
+def parse_recipes_limit(value):
+    if value and value.isdigit():
+        return int(value)
+    return None
+
+
+def attach_recipe_preview(authors, recipes_limit=None):
+    authors = list(authors)
+    if not authors:
+        return authors
+
+    recipes = Recipe.objects.filter(author__in=authors)
+    if recipes_limit is not None:
+        # Django 3.2 can't filter on a window expression, so the ranked
+        # query is wrapped in a subquery that works on PostgreSQL and
+        # SQLite (3.25+) alike.
+        ranked = recipes.annotate(position=Window(
+            expression=RowNumber(),
+            partition_by=[F('author_id')],
+            order_by=[F('created').desc(), F('id').desc()]
+        )).values('id', 'position')
+        sql, params = ranked.query.sql_with_params()
+        recipes = Recipe.objects.filter(id__in=RawSQL(
+            f'SELECT ranked.id FROM ({sql}) ranked '
+            'WHERE ranked.position <= %s',
+            (*params, recipes_limit)
+        ))
+
+    previews = defaultdict(list)
+    for recipe in recipes.only(*RECIPE_PREVIEW_FIELDS):
+        previews[recipe.author_id].append(recipe)
+
+    for author in authors:
+        author.recipe_preview = previews[author.id]
+    return authors
+
+
+class SubscriptionResolver:
+    def __init__(self, user):
+        self.user = user
+        self.followed = set()
+        self.checked = set()
+        self.complete = False
+
+    def load(self, author_ids=None):
+        if self.complete or not self.user.is_authenticated:
+            return
+
+        queryset = Subscription.objects.filter(user_id=self.user.id)
+        if author_ids is None:
+            self.complete = True
+        else:
+            author_ids = set(author_ids) - self.checked
+            if not author_ids:
+                return
+            self.checked |= author_ids
+            queryset = queryset.filter(subscribed_to__in=author_ids)
+
+        self.followed.update(
+            queryset.values_list('subscribed_to_id', flat=True))
+
+    def is_subscribed(self, author):
+        if not self.user.is_authenticated or author.id == self.user.id:
+            return False
+        if not self.complete and author.id not in self.checked:
+            self.load([author.id])
+        return author.id in self.followed
+
+
+def get_subscription_resolver(request):
+    resolver = getattr(request, 'subscription_resolver', None)
+    if resolver is None or resolver.user is not request.user:
+        resolver = SubscriptionResolver(request.user)
+        request.subscription_resolver = resolver
+    return resolver
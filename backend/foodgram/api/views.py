@@ -1,67 +1,142 @@
+from django.conf import settings
 from django.views.generic.base import RedirectView
-from django.db.models import F, Sum
+from django.db.models import (
+    BooleanField,
+    Exists,
+    OuterRef,
+    Prefetch,
+    Value
+)
 from django.shortcuts import get_object_or_404
 from djoser.views import UserViewSet
-from django.http import FileResponse, Http404
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.http import (
+    FileResponse,
+    Http404,
+    HttpResponse,
+    StreamingHttpResponse
+)
 from django.urls import reverse
+from django.utils.cache import patch_cache_control
 
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
+from rest_framework.views import APIView
 from rest_framework.viewsets import ModelViewSet, ReadOnlyModelViewSet
 from rest_framework import permissions, status
 
 from django_filters.rest_framework import DjangoFilterBackend
 
+from core import shopping_cart as shopping_totals
+from core.counters import change_counters, deferred_counters
 from core.const import SHORT_LINK_ID_BASE
+from core.images import EXTENSIONS
 from core.models import (
     Favorite,
     Ingredient,
     IngredientInRecipe,
     Recipe,
     ShoppingCart,
+    Subscription,
     User
 )
 
-from .pagination import LimitPagePagination
+from .authentication import get_user_instance
+from .caching import (
+    ConditionalRetrieveMixin,
+    VersionedCacheMixin,
+    conditional_response,
+    get_versions,
+    make_etag
+)
+from .exports import (
+    CONTENT_TYPES,
+    content_length_key,
+    shopping_list_etag,
+    stream_shopping_list
+)
+from .media import (
+    FORMATS,
+    IMAGE_CONTENT_TYPES,
+    resize,
+    resize_cache,
+    resize_key,
+    resolve_source,
+    source_info
+)
+from .metrics import render_metrics
+from .pagination import LimitPagePagination, RecipeCursorPagination
 from .permissions import IsAuthorOrReadOnly
+from .renderers import CSVRenderer, PlainTextRenderer
 from .filters import IngredientFilter, RecipeFilter
 from .serializers import (
     AvatarUploadSerializer,
     IngredientSerializer,
     RecipeCreateSerializer,
+    RecipeIdsSerializer,
     RecipeSerializer,
     RecipeShortSerializer,
     UserAccountSerializer,
     UserWithRecipeSerializer,
     SubscribeSerializer
 )
+from .search import ingredient_index
+from .utils import (
+    RECIPE_PREVIEW_FIELDS,
+    attach_recipe_preview,
+    get_subscription_resolver,
+    parse_recipes_limit
+)
 
 
-class UserAccountViewSet(UserViewSet):
+class UserAccountViewSet(ConditionalRetrieveMixin, UserViewSet):
     queryset = User.objects.all()
     serializer_class = UserAccountSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
     pagination_class = LimitPagePagination
 
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        # Deleting an account cascades to its recipes and to other users'
+        # carts, favorites and subscriptions.
+        with deferred_counters(), shopping_totals.deferred_totals():
+            super().perform_destroy(instance)
+
     @action(methods=['get'], detail=False,
             permission_classes=[permissions.IsAuthenticated])
     def me(self, request):
-        serializer = self.get_serializer(request.user)
-        return Response(serializer.data)
+        return self.conditional_retrieve(
+            request, get_user_instance(request.user))
+
+    def get_validators(self, user):
+        resolver = get_subscription_resolver(self.request)
+        etag = make_etag(
+            user.id,
+            user.updated.isoformat(),
+            self.request.user.id,
+            resolver.is_subscribed(user)
+        )
+        return etag, user.updated
 
     @action(methods=['put', 'delete'], detail=True,
             permission_classes=[permissions.IsAuthenticated])
     def avatar(self, request, id):
+        user = get_user_instance(request.user)
         if request.method == 'PUT':
             serializer = AvatarUploadSerializer(
-                request.user, data=request.data, partial=True)
+                user, data=request.data, partial=True)
             serializer.is_valid(raise_exception=True)
             serializer.save()
             return Response(serializer.data, status=status.HTTP_200_OK)
 
-        if request.user.avatar:
-            request.user.avatar.delete()
-            request.user.save()
+        if user.avatar:
+            # Files are shared by content: the refcount signals release
+            # it and gc_media removes it once nothing points at it.
+            user.avatar = None
+            user.save()
             return Response(status=status.HTTP_204_NO_CONTENT)
 
         return Response(status=status.HTTP_400_BAD_REQUEST)
@@ -69,9 +144,16 @@ class UserAccountViewSet(UserViewSet):
     @action(methods=['get'], detail=False,
             permission_classes=[permissions.IsAuthenticated])
     def subscriptions(self, request):
-        queryset = User.objects.filter(subscribed__user=request.user)
+        queryset = (
+            User.objects
+            .filter(subscribed__user_id=request.user.id)
+            .order_by('id')
+        )
 
-        pages = self.paginate_queryset(queryset)
+        pages = attach_recipe_preview(
+            self.paginate_queryset(queryset),
+            parse_recipes_limit(request.query_params.get('recipes_limit'))
+        )
         serializer = UserWithRecipeSerializer(
             pages, many=True, context={'request': request})
 
@@ -85,7 +167,8 @@ class UserAccountViewSet(UserViewSet):
     def subscribe(self, request, id):
         subscriber = request.user
         user = self.get_object()
-        sub = subscriber.subscribers.filter(subscribed_to=user)
+        sub = Subscription.objects.filter(
+            user_id=subscriber.id, subscribed_to=user)
 
         if request.method == 'POST':
             subSerializer = SubscribeSerializer(
@@ -95,6 +178,10 @@ class UserAccountViewSet(UserViewSet):
             subSerializer.is_valid(raise_exception=True)
             subSerializer.save()
 
+            attach_recipe_preview(
+                [user],
+                parse_recipes_limit(request.query_params.get('recipes_limit'))
+            )
             serializer = UserWithRecipeSerializer(user, context={
                 'request': request,
                 'recipes_limit': request.query_params.get('recipes_limit')
@@ -109,7 +196,9 @@ class UserAccountViewSet(UserViewSet):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class RecipeViewSet(ModelViewSet):
+class RecipeViewSet(
+    VersionedCacheMixin, ConditionalRetrieveMixin, ModelViewSet
+):
     queryset = Recipe.objects.all()
     serializer_class = RecipeSerializer
     permission_classes = [
@@ -119,14 +208,96 @@ class RecipeViewSet(ModelViewSet):
     pagination_class = LimitPagePagination
     filter_backends = [DjangoFilterBackend]
     filterset_class = RecipeFilter
+    cache_models = (Recipe, IngredientInRecipe, Ingredient, User)
+
+    @property
+    def paginator(self):
+        if (
+            not hasattr(self, '_paginator')
+            and self.action == 'list'
+            and RecipeCursorPagination.cursor_query_param
+            in self.request.query_params
+        ):
+            self._paginator = RecipeCursorPagination()
+        return super().paginator
+
+    def get_queryset(self):
+        if self.action in ('shopping_cart', 'favorite'):
+            # Only RecipeShortSerializer fields are needed.
+            return Recipe.objects.only(*RECIPE_PREVIEW_FIELDS)
+
+        user = self.request.user
+        queryset = (
+            Recipe.objects
+            .select_related('author')
+            .prefetch_related(Prefetch(
+                'ingredient_amounts',
+                queryset=IngredientInRecipe.objects.select_related(
+                    'ingredient')
+            ))
+        )
+
+        if not user.is_authenticated:
+            false = Value(False, output_field=BooleanField())
+            return queryset.annotate(
+                is_favorited=false,
+                is_in_shopping_cart=false
+            )
+
+        return queryset.annotate(
+            is_favorited=Exists(Favorite.objects.filter(
+                user_id=user.id, recipe=OuterRef('pk'))),
+            is_in_shopping_cart=Exists(ShoppingCart.objects.filter(
+                user_id=user.id, recipe=OuterRef('pk')))
+        )
 
     def get_serializer_class(self):
         if self.action in ['create', 'update', 'partial_update']:
             return RecipeCreateSerializer
         return RecipeSerializer
 
+    def list(self, request, *args, **kwargs):
+        if 'ids' in request.query_params:
+            return self.cached_response(
+                self.list_by_ids, request, *args, **kwargs)
+        return super().list(request, *args, **kwargs)
+
+    def list_by_ids(self, request, *args, **kwargs):
+        # `?ids=3,1,2`: the listed recipes in the requested order, without
+        # pagination. Unknown ids are skipped.
+        serializer = RecipeIdsSerializer(data={
+            'recipes': request.query_params['ids'].split(',')})
+        if not serializer.is_valid():
+            raise ValidationError({'ids': serializer.errors['recipes']})
+        ids = serializer.validated_data['recipes']
+
+        queryset = self.filter_queryset(self.get_queryset())
+        recipes = queryset.filter(id__in=ids).in_bulk()
+        serializer = self.get_serializer(
+            [recipes[pk] for pk in ids if pk in recipes], many=True)
+        return Response(serializer.data)
+
     def perform_create(self, serializer):
-        serializer.save(author=self.request.user)
+        serializer.save(author=get_user_instance(self.request.user))
+
+    def get_validators(self, recipe):
+        resolver = get_subscription_resolver(self.request)
+        etag = make_etag(
+            recipe.id,
+            recipe.updated.isoformat(),
+            recipe.author.updated.isoformat(),
+            self.request.user.id,
+            recipe.is_favorited,
+            recipe.is_in_shopping_cart,
+            resolver.is_subscribed(recipe.author),
+            *get_versions([Ingredient])
+        )
+        return etag, max(recipe.updated, recipe.author.updated)
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        with deferred_counters(), shopping_totals.deferred_totals():
+            instance.delete()
 
     @action(
         detail=True,
@@ -136,22 +307,39 @@ class RecipeViewSet(ModelViewSet):
     def shopping_cart(self, request, pk):
         user = request.user
         recipe = self.get_object()
-        shopcart = user.shopping_cart.filter(recipe=recipe)
 
         if request.method == "POST":
-            if shopcart.exists():
+            # The unique constraint answers "already in the cart".
+            try:
+                # post_save adds the recipe to the shopping totals.
+                with transaction.atomic():
+                    ShoppingCart.objects.create(
+                        user_id=user.id, recipe=recipe)
+            except IntegrityError:
                 return Response(status=status.HTTP_400_BAD_REQUEST)
-            ShoppingCart.objects.create(user=user, recipe=recipe)
             return Response(
                 RecipeShortSerializer(recipe).data,
                 status=status.HTTP_201_CREATED,
             )
 
-        if not shopcart.exists():
-            return Response(status=status.HTTP_400_BAD_REQUEST)
-        shopcart.delete()
+        with transaction.atomic():
+            if not ShoppingCart.objects.filter(
+                user_id=user.id, recipe=recipe
+            ).delete()[0]:
+                return Response(status=status.HTTP_400_BAD_REQUEST)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+    @action(
+        detail=False,
+        methods=['post', 'delete'],
+        url_path='shopping_cart',
+        url_name='shopping-cart-batch',
+        permission_classes=[permissions.IsAuthenticated]
+    )
+    def shopping_cart_batch(self, request):
+        return self.change_relations(
+            request, ShoppingCart, on_add=shopping_totals.add_recipes)
+
     @action(
         detail=True,
         methods=['post', 'delete'],
@@ -160,54 +348,113 @@ class RecipeViewSet(ModelViewSet):
     def favorite(self, request, pk):
         user = request.user
         recipe = self.get_object()
-        fav = user.favorites.filter(recipe=recipe)
 
         if request.method == "POST":
-            if fav.exists():
+            try:
+                with transaction.atomic():
+                    Favorite.objects.create(user_id=user.id, recipe=recipe)
+            except IntegrityError:
                 return Response(status=status.HTTP_400_BAD_REQUEST)
-            Favorite.objects.create(user=user, recipe=recipe)
             return Response(
                 RecipeShortSerializer(recipe).data,
                 status=status.HTTP_201_CREATED,
             )
 
-        if not fav.exists():
+        if not Favorite.objects.filter(
+            user_id=user.id, recipe=recipe
+        ).delete()[0]:
             return Response(status=status.HTTP_400_BAD_REQUEST)
-        fav.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(
         detail=False,
-        methods=['get'],
+        methods=['post', 'delete'],
+        url_path='favorite',
+        url_name='favorite-batch',
         permission_classes=[permissions.IsAuthenticated]
     )
-    def download_shopping_cart(self, request):
-        ingredients = (
-            IngredientInRecipe.objects
-            .filter(recipe__in=request.user.shopping_cart.values('recipe'))
-            .values(name=F('ingredient__name'),
-                    unit=F('ingredient__measurement_unit'))
-            .annotate(amount=Sum('amount'))
-            .order_by('name')
-        )
+    def favorite_batch(self, request):
+        return self.change_relations(request, Favorite)
+
+    def change_relations(self, request, model, on_add=None):
+        # Adds or removes many recipes of a user-recipe relation with a
+        # fixed number of queries and reports the outcome per recipe id.
+        serializer = RecipeIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data['recipes']
+        user = request.user
+        adding = request.method == 'POST'
+
+        with transaction.atomic():
+            # Concurrent batches of one user queue up here, so `linked`
+            # stays exact until the transaction ends.
+            list(User.objects.select_for_update().filter(
+                pk=user.pk).values_list('pk'))
+            found = set(Recipe.objects.filter(
+                id__in=ids).values_list('id', flat=True))
+            linked = set(model.objects.filter(
+                user_id=user.id, recipe_id__in=found
+            ).values_list('recipe_id', flat=True))
+
+            if adding:
+                changed = [pk for pk in ids if pk in found - linked]
+                # bulk_create skips post_save, so counters and totals are
+                # updated here.
+                links = model.objects.bulk_create(
+                    [model(user_id=user.id, recipe_id=pk)
+                     for pk in changed],
+                    ignore_conflicts=True)
+                change_counters(model, links, 1)
+                if changed and on_add is not None:
+                    on_add(user, changed)
+            else:
+                changed = [pk for pk in ids if pk in linked]
+                if changed:
+                    with deferred_counters():
+                        with shopping_totals.deferred_totals():
+                            model.objects.filter(
+                                user_id=user.id, recipe_id__in=changed
+                            ).delete()
+
+        changed_status, unchanged_status = (
+            ('created', 'exists') if adding else ('deleted', 'absent'))
+        return Response({'results': [
+            {
+                'id': pk,
+                'status': (
+                    'not_found' if pk not in found
+                    else changed_status if pk in changed
+                    else unchanged_status
+                )
+            }
+            for pk in ids
+        ]})
 
-        buy_list = 'Список покупок:'
+    @action(
+        detail=False,
+        methods=['get'],
+        permission_classes=[permissions.IsAuthenticated],
+        renderer_classes=[PlainTextRenderer, CSVRenderer, JSONRenderer]
+    )
+    def download_shopping_cart(self, request):
+        export_format = request.accepted_renderer.format
+        etag = shopping_list_etag(request.user, export_format)
 
-        if ingredients:
-            for ingred in ingredients:
-                buy_list += (
-                    f'\n{ingred["name"]} - '
-                    f'{ingred["amount"]} ({ingred["unit"]})'
-                )
-        else:
-            buy_list += '\nПусто!'
+        not_modified = conditional_response(request, etag)
+        if not_modified is not None:
+            return not_modified
 
-        return FileResponse(
-            buy_list,
-            filename='shoplist.txt',
-            as_attachment=True,
-            content_type='text/plain'
+        response = StreamingHttpResponse(
+            stream_shopping_list(request.user, export_format, etag),
+            content_type=CONTENT_TYPES[export_format]
         )
+        response['Content-Disposition'] = (
+            f'attachment; filename="shoplist.{export_format}"')
+        response['ETag'] = etag
+        length = cache.get(content_length_key(etag))
+        if length is not None:
+            response['Content-Length'] = length
+        return response
 
     @action(methods=['get'], detail=True, url_path='get-link')
     def get_link(self, request, pk):
@@ -217,12 +464,26 @@ class RecipeViewSet(ModelViewSet):
         return Response({'short-link': url}, status=status.HTTP_200_OK)
 
 
-class IngredientViewSet(ReadOnlyModelViewSet):
+class IngredientViewSet(VersionedCacheMixin, ReadOnlyModelViewSet):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     permission_classes = (permissions.AllowAny,)
     filter_backends = (DjangoFilterBackend,)
     filterset_class = IngredientFilter
+    cache_models = (Ingredient,)
+    cache_anonymous_only = False
+
+    def list(self, request):
+        return self.cached_response(self.list_ingredients, request)
+
+    def list_ingredients(self, request):
+        name = request.query_params.get('name')
+        if name:
+            ingredients = ingredient_index.search(name)
+        else:
+            ingredients = ingredient_index.all()
+        serializer = self.get_serializer(ingredients, many=True)
+        return Response(serializer.data)
 
 
 class ShortRedirectView(RedirectView):
@@ -235,3 +496,53 @@ class ShortRedirectView(RedirectView):
             return f'/recipes/{recipe_id}'
         except (Http404, ValueError):
             return '/404'
+
+
+class MediaResizeView(APIView):
+    authentication_classes = []
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request, path):
+        width = request.query_params.get('w') or '0'
+        height = request.query_params.get('h') or '0'
+        size = f'{width}x{height}'
+        if size not in settings.MEDIA_RESIZE_SIZES:
+            raise ValidationError({'size': f'Размер {size} не разрешён.'})
+        fmt = request.query_params.get('fmt', '').lower()
+        if fmt and fmt not in FORMATS:
+            raise ValidationError({'fmt': f'Неизвестный формат {fmt}.'})
+
+        source = resolve_source(path)
+        if source is None:
+            raise NotFound('Файл не найден.')
+        try:
+            digest, image_format = source_info(source)
+        except OSError:
+            raise ValidationError('Файл не является изображением.')
+        image_format = FORMATS.get(fmt, image_format)
+
+        key = resize_key(digest, size, image_format)
+        etag = f'"{key}"'
+        response = conditional_response(request, etag)
+        if response is None:
+            file = resize_cache.fetch(
+                key, EXTENSIONS[image_format],
+                lambda: resize(source, int(width), int(height), image_format))
+            response = FileResponse(
+                file, content_type=IMAGE_CONTENT_TYPES[image_format])
+            response['ETag'] = etag
+        # The URL always maps to the same bytes: uploads get fresh names.
+        patch_cache_control(
+            response, public=True,
+            max_age=settings.MEDIA_RESIZE_MAX_AGE, immutable=True)
+        return response
+
+
+class MetricsView(APIView):
+    # Prometheus scrape endpoint; nginx keeps it off the public site.
+    authentication_classes = []
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request):
+        body, content_type = render_metrics()
+        return HttpResponse(body, content_type=content_type)
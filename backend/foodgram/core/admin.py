@@ -1,98 +1,204 @@
 from django.contrib import admin
 from django.contrib.admin import register, ModelAdmin
 from django.contrib.auth.admin import UserAdmin
+from django.core.paginator import Paginator
+from django.db import connections, transaction
+from django.db.models import Count
+from django.utils.functional import cached_property
 
+from .counters import deferred_counters
 from .models import (
     Favorite,
+    ImageJob,
     Ingredient,
     IngredientInRecipe,
+    MediaFile,
     Recipe,
     ShoppingCart,
+    ShoppingCartTotal,
     Subscription,
     User
 )
+from .shopping_cart import deferred_totals, stale_recipes
+
+# Below this many rows an exact COUNT(*) is cheap enough.
+ESTIMATED_COUNT_THRESHOLD = 10000
+
+
+class EstimatedCountPaginator(Paginator):
+    # Unfiltered changelists of big PostgreSQL tables take the planner's
+    # row estimate instead of scanning the whole table for COUNT(*).
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        connection = connections[queryset.db]
+        if connection.vendor == 'postgresql' and not queryset.query.where:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT reltuples::bigint FROM pg_class '
+                    'WHERE oid = %s::regclass',
+                    [queryset.model._meta.db_table]
+                )
+                estimate = cursor.fetchone()[0]
+            if estimate >= ESTIMATED_COUNT_THRESHOLD:
+                return estimate
+        return super().count
+
+
+class EstimatedCountMixin:
+    paginator = EstimatedCountPaginator
+    # Skips the second COUNT(*) of the unfiltered table.
+    show_full_result_count = False
+
+
+class DeferredDeleteMixin:
+    # Cascading deletes update counters and shopping totals once per
+    # delete instead of once per row.
+    def delete_model(self, request, obj):
+        with transaction.atomic(), deferred_counters(), deferred_totals():
+            super().delete_model(request, obj)
+
+    def delete_queryset(self, request, queryset):
+        with transaction.atomic(), deferred_counters(), deferred_totals():
+            super().delete_queryset(request, queryset)
 
 
 @register(User)
-class UserConfig(UserAdmin):
+class UserConfig(DeferredDeleteMixin, EstimatedCountMixin, UserAdmin):
     list_display = [
         'id',
         'email',
         'username',
         'first_name',
         'last_name',
-        'avatar'
+        'avatar',
+        'recipes_count',
+        'followers_count'
     ]
-    list_filter = ['username', 'email']
     search_fields = ['username', 'email']
 
 
 @register(Recipe)
-class RecipeConfig(ModelAdmin):
+class RecipeConfig(DeferredDeleteMixin, EstimatedCountMixin, ModelAdmin):
     list_display = [
         'id',
         'author',
-        'ingredients',
+        'ingredient_count',
         'name',
         'image',
         'text',
         'cooking_time',
-        'favorites',
+        'favorites_count',
+        'cart_count',
         'created'
     ]
-    list_filter = ['name', 'author']
+    list_select_related = ['author']
     search_fields = ['name', 'author__username']
+    # Explicit, because GROUP BY queries drop Meta.ordering.
+    ordering = ['-created', '-id']
+    autocomplete_fields = ['author']
 
-    @admin.display(description='Количество ингредиентов')
-    def ingredients(self, obj):
-        return obj.ingredients.count()
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(
+            ingredients_count=Count('ingredient_amounts')
+        )
 
-    @admin.display(description='Добвлено в избранное')
-    def favorites(self, obj):
-        return obj.users_in_favorite.count()
+    @admin.display(
+        description='Количество ингредиентов',
+        ordering='ingredients_count'
+    )
+    def ingredient_count(self, obj):
+        # Not `ingredients`: the model field of that name would win.
+        return obj.ingredients_count
 
 
 @register(IngredientInRecipe)
-class IngredientInRecipeConfig(ModelAdmin):
+class IngredientInRecipeConfig(EstimatedCountMixin, ModelAdmin):
     list_display = [
         'id',
         'recipe',
         'ingredient',
         'amount'
     ]
+    list_select_related = ['recipe', 'ingredient']
+    search_fields = ['recipe__name', 'ingredient__name']
+    autocomplete_fields = ['recipe', 'ingredient']
+
+    # Rows edited here bypass the recipe serializer: rebuild the shopping
+    # totals of every cart holding an affected recipe.
+    def save_model(self, request, obj, form, change):
+        recipe_ids = {obj.recipe_id}
+        if change and 'recipe' in form.changed_data:
+            recipe_ids.add(form.initial['recipe'])
+        with transaction.atomic():
+            super().save_model(request, obj, form, change)
+            stale_recipes(recipe_ids)
+
+    def delete_model(self, request, obj):
+        with transaction.atomic():
+            super().delete_model(request, obj)
+            stale_recipes([obj.recipe_id])
+
+    def delete_queryset(self, request, queryset):
+        recipe_ids = set(queryset.values_list('recipe_id', flat=True))
+        with transaction.atomic():
+            super().delete_queryset(request, queryset)
+            stale_recipes(recipe_ids)
 
 
 @register(ShoppingCart)
-class ShoppingCartConfig(ModelAdmin):
+class ShoppingCartConfig(DeferredDeleteMixin, EstimatedCountMixin, ModelAdmin):
     list_display = [
         'id',
         'user',
         'recipe'
     ]
+    list_select_related = ['user', 'recipe']
+    search_fields = ['user__username', 'recipe__name']
+    autocomplete_fields = ['user', 'recipe']
+
+
+@register(ShoppingCartTotal)
+class ShoppingCartTotalConfig(EstimatedCountMixin, ModelAdmin):
+    list_display = [
+        'id',
+        'user',
+        'ingredient',
+        'total_amount',
+        'recipe_count',
+        'updated'
+    ]
+    list_select_related = ['user', 'ingredient']
+    search_fields = ['user__username', 'ingredient__name']
+    autocomplete_fields = ['user', 'ingredient']
 
 
 @register(Favorite)
-class FavoriteConfig(ModelAdmin):
+class FavoriteConfig(DeferredDeleteMixin, EstimatedCountMixin, ModelAdmin):
     list_display = [
         'id',
         'user',
         'recipe'
     ]
+    list_select_related = ['user', 'recipe']
+    search_fields = ['user__username', 'recipe__name']
+    autocomplete_fields = ['user', 'recipe']
 
 
 @register(Subscription)
-class SubscriptionConfig(ModelAdmin):
+class SubscriptionConfig(DeferredDeleteMixin, EstimatedCountMixin, ModelAdmin):
     list_display = [
         'id',
         'user',
         'subscribed_to'
     ]
+    list_select_related = ['user', 'subscribed_to']
     search_fields = ['user__username', 'subscribed_to__username']
-    list_filter = ['user', 'subscribed_to']
+    autocomplete_fields = ['user', 'subscribed_to']
 
 
 @register(Ingredient)
-class IngredientConfig(ModelAdmin):
+class IngredientConfig(EstimatedCountMixin, ModelAdmin):
     list_display = [
         'id',
         'name',
@@ -100,3 +206,29 @@ class IngredientConfig(ModelAdmin):
     ]
     search_fields = ['name', 'measurement_unit']
     list_filter = ['measurement_unit']
+
+
+@register(ImageJob)
+class ImageJobConfig(EstimatedCountMixin, ModelAdmin):
+    list_display = [
+        'id',
+        'content_type',
+        'object_id',
+        'source',
+        'status',
+        'attempts',
+        'updated'
+    ]
+    list_filter = ['status', 'content_type']
+    list_select_related = ['content_type']
+    search_fields = ['source']
+
+
+@register(MediaFile)
+class MediaFileConfig(EstimatedCountMixin, ModelAdmin):
+    list_display = [
+        'id',
+        'name',
+        'refcount'
+    ]
+    search_fields = ['name']
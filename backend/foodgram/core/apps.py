@@ -1,6 +1,47 @@
 from django.apps import AppConfig
+from django.db.models.signals import (
+    post_delete,
+    post_init,
+    post_migrate,
+    post_save,
+    pre_save
+)
+
+
+def install_search_backend(sender, using, **kwargs):
+    from django.db import connections
+
+    from .search import install_search_backend
+    install_search_backend(connections[using])
 
 
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        from .counters import COUNTERS, count_created, count_deleted
+        from .images import (
+            IMAGE_FIELDS,
+            enqueue_image_variants,
+            fetch_references,
+            release_references,
+            remember_references,
+            update_references
+        )
+
+        from .models import ShoppingCart
+        from .shopping_cart import cart_created, cart_deleted
+
+        post_migrate.connect(install_search_backend, sender=self)
+        for model in IMAGE_FIELDS:
+            post_init.connect(remember_references, sender=model)
+            pre_save.connect(fetch_references, sender=model)
+            post_save.connect(update_references, sender=model)
+            post_save.connect(enqueue_image_variants, sender=model)
+            post_delete.connect(release_references, sender=model)
+        for model in COUNTERS:
+            post_save.connect(count_created, sender=model)
+            post_delete.connect(count_deleted, sender=model)
+        post_save.connect(cart_created, sender=ShoppingCart)
+        post_delete.connect(cart_deleted, sender=ShoppingCart)
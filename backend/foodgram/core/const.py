@@ -4,3 +4,13 @@ MIN_INGREDIENT_AMOUNT = 1       # Минимальное количество и
 MAX_INGREDIENT_AMOUNT = 32_000  # Максимальное количество ингредиента в рецепте
 
 SHORT_LINK_ID_BASE = 16         # N-Base для конвертации id в короткую ссылку
+
+RECIPE_IMAGE_SIZES = {          # Варианты картинки рецепта (ширина, высота)
+    'small': (320, 320),
+    'large': (960, 960),
+}
+AVATAR_SIZES = {                # Варианты аватара (ширина, высота)
+    'small': (96, 96),
+    'large': (320, 320),
+}
+IMAGE_QUALITY = 82              # Качество JPEG и WebP вариантов
@@ -0,0 +1,117 @@
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from threading import local
+
+from django.db.models import Case, Count, F, IntegerField, Value, When
+
+from .models import Favorite, Recipe, ShoppingCart, Subscription, User
+
+# Counted model -> (foreign key, model holding the counter, counter field).
+COUNTERS = {
+    Favorite: ('recipe_id', Recipe, 'favorites_count'),
+    ShoppingCart: ('recipe_id', Recipe, 'cart_count'),
+    Recipe: ('author_id', User, 'recipes_count'),
+    Subscription: ('subscribed_to_id', User, 'followers_count'),
+}
+
+_state = local()
+
+
+def apply_deltas(model, field, deltas):
+    # One UPDATE whatever the number of rows touched.
+    deltas = {pk: delta for pk, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    values = set(deltas.values())
+    if len(values) == 1:
+        delta = Value(values.pop())
+    else:
+        delta = Case(
+            *[When(pk=pk, then=Value(delta))
+              for pk, delta in deltas.items()],
+            default=Value(0),
+            output_field=IntegerField()
+        )
+    model._base_manager.filter(pk__in=deltas).update(
+        **{field: F(field) + delta})
+
+
+def change_counters(model, instances, sign):
+    fk, target, field = COUNTERS[model]
+    deltas = Counter()
+    for instance in instances:
+        deltas[getattr(instance, fk)] += sign
+
+    pending = getattr(_state, 'pending', None)
+    if pending is not None:
+        for pk, delta in deltas.items():
+            pending[target, field, pk] += delta
+        return
+    apply_deltas(target, field, deltas)
+
+
+@contextmanager
+def deferred_counters():
+    # Changes made inside are summed up and written on exit, one UPDATE
+    # per counter, instead of one per row (bulk and cascading deletes).
+    if getattr(_state, 'pending', None) is not None:
+        yield
+        return
+    _state.pending = Counter()
+    try:
+        yield
+        pending = _state.pending
+    finally:
+        _state.pending = None
+
+    grouped = defaultdict(dict)
+    for (model, field, pk), delta in pending.items():
+        grouped[model, field][pk] = delta
+    for (model, field), deltas in grouped.items():
+        apply_deltas(model, field, deltas)
+
+
+def count_created(sender, instance, created, raw=False, **kwargs):
+    # Raw fixture saves carry their own counter values.
+    if created and not raw:
+        change_counters(sender, [instance], 1)
+
+
+def count_deleted(sender, instance, **kwargs):
+    change_counters(sender, [instance], -1)
+
+
+def recount_counters(batch_size=1000, dry_run=False):
+    # Compares every counter with the actual number of rows, chunk by
+    # chunk, and repairs the drift with relative updates so that changes
+    # made meanwhile are not lost. Returns {counter label: rows fixed}.
+    drift = {}
+    for model, (fk, target, field) in COUNTERS.items():
+        label = f'{target._meta.model_name}.{field}'
+        drift[label] = 0
+        last_pk = None
+        while True:
+            rows = target._base_manager.order_by('pk')
+            if last_pk is not None:
+                rows = rows.filter(pk__gt=last_pk)
+            stored = dict(rows.values_list('pk', field)[:batch_size])
+            if not stored:
+                break
+            last_pk = max(stored)
+
+            actual = dict(
+                model._base_manager
+                .filter(**{f'{fk}__in': stored})
+                .values_list(fk)
+                .annotate(count=Count('pk'))
+                .order_by()
+            )
+            deltas = {
+                pk: actual.get(pk, 0) - value
+                for pk, value in stored.items()
+                if actual.get(pk, 0) != value
+            }
+            drift[label] += len(deltas)
+            if not dry_run:
+                apply_deltas(target, field, deltas)
+    return drift
@@ -0,0 +1,290 @@
+import os
+from collections import Counter
+from datetime import timedelta
+from io import BytesIO
+from itertools import islice
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.files.base import ContentFile
+from django.db.models import Case, F, IntegerField, Q, Value, When
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from .const import AVATAR_SIZES, IMAGE_QUALITY, RECIPE_IMAGE_SIZES
+from .models import ImageJob, MediaFile, Recipe, User
+from .signals import bulk_changed
+
+# Model -> (image field, field holding the generated variants, sizes).
+IMAGE_FIELDS = {
+    Recipe: ('image', 'image_variants', RECIPE_IMAGE_SIZES),
+    User: ('avatar', 'avatar_variants', AVATAR_SIZES),
+}
+WEBP_SUFFIX = '_webp'
+ALPHA_MODES = ('RGBA', 'LA', 'PA')
+EXTENSIONS = {'JPEG': 'jpg', 'PNG': 'png', 'WEBP': 'webp'}
+STALE_AFTER = timedelta(minutes=10)
+
+
+def variant_names(sizes):
+    for name in sizes:
+        yield name
+        yield name + WEBP_SUFFIX
+
+
+def ready_variants(instance, field):
+    # Paths of the variants built from the current image, or {} while the
+    # worker has not caught up with the latest upload.
+    _, variants_field, _ = IMAGE_FIELDS[type(instance)]
+    variants = getattr(instance, variants_field) or {}
+    if variants.get('source') != getattr(instance, field).name:
+        return {}
+    return variants.get('files', {})
+
+
+def image_references(image, variants):
+    # Stored files a row points at: the upload itself plus the variants
+    # built from it. Variants of a replaced or cleared upload are garbage.
+    name = getattr(image, 'name', image)
+    if not name:
+        return []
+    variants = variants or {}
+    if variants.get('source') != name:
+        return [name]
+    return [name, *variants.get('files', {}).values()]
+
+
+def loaded_references(instance):
+    field, variants_field, _ = IMAGE_FIELDS[type(instance)]
+    values = instance.__dict__
+    if field not in values or variants_field not in values:
+        # Deferred field: unknown without a query.
+        return None
+    return image_references(values[field], values[variants_field])
+
+
+def stored_references(model, pk):
+    field, variants_field, _ = IMAGE_FIELDS[model]
+    row = model._base_manager.filter(pk=pk).values_list(
+        field, variants_field).first()
+    return image_references(*row) if row else []
+
+
+def change_references(added=(), removed=()):
+    # Two queries whatever the number of names touched.
+    deltas = Counter(name for name in added if name)
+    deltas.subtract(name for name in removed if name)
+    deltas = {name: delta for name, delta in deltas.items() if delta}
+    if not deltas:
+        return
+
+    MediaFile.objects.bulk_create(
+        [MediaFile(name=name) for name in deltas], ignore_conflicts=True)
+    MediaFile.objects.filter(name__in=deltas).update(
+        refcount=F('refcount') + Case(
+            *[When(name=name, then=Value(delta))
+              for name, delta in deltas.items()],
+            default=Value(0),
+            output_field=IntegerField()
+        )
+    )
+
+
+def recount_references(batch_size=1000):
+    # Rebuilds every refcount from the image columns, for data written
+    # without model signals (fastload, raw SQL, restored dumps).
+    MediaFile.objects.update(refcount=0)
+    for model, (field, variants_field, _) in IMAGE_FIELDS.items():
+        rows = model._base_manager.values_list(
+            field, variants_field).iterator(chunk_size=batch_size)
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                break
+            change_references(added=[
+                name for image, variants in batch
+                for name in image_references(image, variants)
+            ])
+    MediaFile.objects.filter(refcount__lte=0).delete()
+
+
+def remember_references(sender, instance, **kwargs):
+    instance._image_references = loaded_references(instance)
+
+
+def fetch_references(sender, instance, **kwargs):
+    if instance._image_references is None and not instance._state.adding:
+        instance._image_references = stored_references(sender, instance.pk)
+
+
+def update_references(sender, instance, created, **kwargs):
+    old = [] if created else instance._image_references or []
+    new = loaded_references(instance)
+    if new is None:
+        new = stored_references(sender, instance.pk)
+    if sorted(old) != sorted(new):
+        change_references(added=new, removed=old)
+    instance._image_references = new
+
+
+def release_references(sender, instance, **kwargs):
+    references = loaded_references(instance)
+    if references is None:
+        references = instance._image_references or []
+    change_references(removed=references)
+
+
+def enqueue_image_variants(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    field, variants_field, _ = IMAGE_FIELDS[sender]
+    image = getattr(instance, field)
+    variants = getattr(instance, variants_field) or {}
+    if not image or variants.get('source') == image.name:
+        return
+    # An earlier upload coming back finds its old, finished job: reset it
+    # so the worker rebuilds variants that may have been collected since.
+    ImageJob.objects.update_or_create(
+        content_type=ContentType.objects.get_for_model(sender),
+        object_id=instance.pk,
+        field=field,
+        source=image.name,
+        defaults={'status': ImageJob.PENDING, 'attempts': 0, 'error': ''}
+    )
+
+
+def enqueue_missing(batch_size=1000):
+    # Backfills jobs for images saved before the pipeline existed or
+    # loaded with raw fixture saves.
+    queued = 0
+    for model, (field, variants_field, _) in IMAGE_FIELDS.items():
+        content_type = ContentType.objects.get_for_model(model)
+        rows = model._base_manager.exclude(**{field: ''}).values_list(
+            'pk', field, variants_field)
+        jobs = [
+            ImageJob(
+                content_type=content_type,
+                object_id=pk,
+                field=field,
+                source=name
+            )
+            for pk, name, variants in rows.iterator()
+            if (variants or {}).get('source') != name
+        ]
+        ImageJob.objects.bulk_create(
+            jobs, batch_size=batch_size, ignore_conflicts=True)
+        queued += len(jobs)
+    return queued
+
+
+def claim_jobs(limit, max_attempts):
+    # A job is taken by whichever worker flips its status first, so
+    # several workers can share the table without row locks.
+    now = timezone.now()
+    stale = now - STALE_AFTER
+    candidates = ImageJob.objects.filter(
+        Q(status=ImageJob.PENDING)
+        | Q(status=ImageJob.RUNNING, updated__lt=stale),
+        attempts__lt=max_attempts
+    ).order_by('id').values_list('id', 'status', 'updated')[:limit]
+
+    claimed = []
+    for job_id, status, updated in candidates:
+        if ImageJob.objects.filter(
+            id=job_id, status=status, updated=updated
+        ).update(
+            status=ImageJob.RUNNING,
+            attempts=F('attempts') + 1,
+            updated=now
+        ):
+            claimed.append(job_id)
+    return list(ImageJob.objects.filter(
+        id__in=claimed).select_related('content_type'))
+
+
+def open_image(file):
+    # Returns the decoded image in RGB, or RGBA when it has real
+    # transparency, with EXIF orientation applied.
+    with Image.open(file) as image:
+        image = ImageOps.exif_transpose(image)
+        image.load()
+    has_alpha = False
+    if image.mode in ALPHA_MODES or 'transparency' in image.info:
+        image = image.convert('RGBA')
+        # Fully opaque alpha channels are common in photos saved as PNG.
+        has_alpha = image.getchannel('A').getextrema() != (255, 255)
+    return image.convert('RGBA' if has_alpha else 'RGB')
+
+
+def default_format(image):
+    return 'PNG' if image.mode == 'RGBA' else 'JPEG'
+
+
+def encode_image(image, image_format):
+    if image_format == 'JPEG' and image.mode == 'RGBA':
+        image = image.convert('RGB')
+    buffer = BytesIO()
+    image.save(buffer, image_format, quality=IMAGE_QUALITY, optimize=True)
+    return buffer.getvalue()
+
+
+def render_variants(image, sizes):
+    storage = image.storage
+    stem = os.path.splitext(os.path.basename(image.name))[0]
+    directory = os.path.join(image.field.upload_to, 'variants')
+
+    with image.open('rb'):
+        original = open_image(image)
+    fallback_format = default_format(original)
+
+    files = {}
+    for name, size in sizes.items():
+        variant = original.copy()
+        variant.thumbnail(size, Image.LANCZOS)
+        for key, image_format in (
+            (name, fallback_format),
+            (name + WEBP_SUFFIX, 'WEBP'),
+        ):
+            files[key] = storage.save(
+                os.path.join(
+                    directory, f'{stem}_{name}.{EXTENSIONS[image_format]}'),
+                ContentFile(encode_image(variant, image_format)))
+    return files
+
+
+def process_job(job):
+    model = job.content_type.model_class()
+    _, variants_field, sizes = IMAGE_FIELDS[model]
+    instance = model._base_manager.filter(pk=job.object_id).first()
+    if instance is None or getattr(instance, job.field).name != job.source:
+        # The object is gone or has a newer upload with its own job.
+        return False
+
+    files = render_variants(getattr(instance, job.field), sizes)
+    updated = model._base_manager.filter(
+        pk=job.object_id, **{job.field: job.source}
+    ).update(**{
+        variants_field: {'source': job.source, 'files': files},
+        'updated': timezone.now()
+    })
+    if updated:
+        old_references = image_references(
+            job.source, getattr(instance, variants_field))
+        change_references(
+            added=[job.source, *files.values()], removed=old_references)
+        bulk_changed.send(sender=model)
+    return bool(updated)
+
+
+def run_job(job, max_attempts):
+    try:
+        process_job(job)
+    except Exception as error:
+        job.status = (
+            ImageJob.FAILED if job.attempts >= max_attempts
+            else ImageJob.PENDING)
+        job.error = f'{type(error).__name__}: {error}'
+    else:
+        job.status = ImageJob.DONE
+        job.error = ''
+    job.save(update_fields=['status', 'error', 'updated'])
+    return job.status
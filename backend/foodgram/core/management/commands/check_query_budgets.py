@@ -0,0 +1,324 @@
+import json
+import re
+from collections import Counter
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import resolve
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.urls import urlpatterns
+from core.models import (Favorite, Ingredient, IngredientInRecipe, Recipe,
+                         ShoppingCart, Subscription, User)
+from core.shopping_cart import rebuild_totals
+
+BUDGETS = settings.BASE_DIR / 'query_budgets.json'
+RECIPES_PER_AUTHOR = 3
+# (method, path, payload, anonymous), measured in this order: every
+# add is followed by its remove, the recipe is deleted last.
+SCENARIOS = (
+    ('GET', '/api/users/?limit={size}', None, False),
+    ('GET', '/api/users/{author}/', None, False),
+    ('GET', '/api/users/me/', None, False),
+    ('GET', '/api/users/subscriptions/?limit={size}', None, False),
+    ('GET', '/api/users/subscriptions/?limit={size}&recipes_limit=2',
+     None, False),
+    ('POST', '/api/users/{spare_author}/subscribe/', None, False),
+    ('DELETE', '/api/users/{spare_author}/subscribe/', None, False),
+    ('GET', '/api/recipes/?limit={size}', None, True),
+    ('GET', '/api/recipes/?limit={size}', None, False),
+    ('GET', '/api/recipes/?limit={size}&author={author}', None, False),
+    ('GET', '/api/recipes/?limit={size}&is_favorited=1', None, False),
+    ('GET', '/api/recipes/?limit={size}&is_in_shopping_cart=1',
+     None, False),
+    ('GET', '/api/recipes/?ids={ids}', None, False),
+    ('GET', '/api/recipes/{recipe}/', None, True),
+    ('GET', '/api/recipes/{recipe}/', None, False),
+    ('GET', '/api/recipes/{recipe}/get-link/', None, False),
+    ('PATCH', '/api/recipes/{recipe}/', 'ingredients', False),
+    ('POST', '/api/recipes/{spare}/favorite/', None, False),
+    ('DELETE', '/api/recipes/{spare}/favorite/', None, False),
+    ('POST', '/api/recipes/{spare}/shopping_cart/', None, False),
+    ('DELETE', '/api/recipes/{spare}/shopping_cart/', None, False),
+    ('POST', '/api/recipes/favorite/', 'recipes', False),
+    ('DELETE', '/api/recipes/favorite/', 'recipes', False),
+    ('POST', '/api/recipes/shopping_cart/', 'recipes', False),
+    ('DELETE', '/api/recipes/shopping_cart/', 'recipes', False),
+    ('GET', '/api/recipes/download_shopping_cart/', None, False),
+    ('GET', '/api/ingredients/?name=budget', None, False),
+    ('GET', '/api/ingredients/{ingredient}/', None, False),
+    ('DELETE', '/api/recipes/{recipe}/', None, False),
+)
+# Routes without a scenario: account flows built on djoser, uploads
+# that write files, and the service endpoints.
+EXEMPT = {
+    'api-root', 'login', 'logout', 'media-resize', 'metrics',
+    'jwt-create', 'jwt-refresh', 'jwt-verify',
+    'user-activation', 'user-resend-activation', 'user-reset-password',
+    'user-reset-password-confirm', 'user-reset-username',
+    'user-reset-username-confirm', 'user-set-password',
+    'user-set-username', 'user-avatar', 'user-list POST',
+    'user-detail PUT', 'user-detail PATCH', 'user-detail DELETE',
+    'recipe-list POST', 'recipe-detail PUT',
+}
+# Literals inlined into the captured SQL: queries differing only in ids
+# are the same statement.
+LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+\b")
+TRANSACTION_STATEMENTS = ('SAVEPOINT', 'RELEASE SAVEPOINT', 'ROLLBACK TO')
+HTTP_METHODS = ('get', 'post', 'put', 'patch', 'delete')
+
+
+class Rollback(Exception):
+    pass
+
+
+def scenario_key(method, path, anonymous):
+    return f'{method} {path}' + (' [anonymous]' if anonymous else '')
+
+
+def api_routes(patterns=urlpatterns, seen=None):
+    # (url name, method) of every route, the first match only: djoser's
+    # routes shadowed by UserAccountViewSet are not reachable.
+    routes = []
+    seen = set() if seen is None else seen
+    for pattern in patterns:
+        if hasattr(pattern, 'url_patterns'):
+            routes.extend(api_routes(pattern.url_patterns, seen))
+            continue
+        regex = pattern.pattern.regex
+        if 'format' in regex.groupindex or regex.pattern in seen:
+            continue
+        seen.add(regex.pattern)
+        view = pattern.callback
+        actions = getattr(view, 'actions', None)
+        if actions is None:
+            view_class = getattr(view, 'cls', None) or getattr(
+                view, 'view_class', None)
+            actions = [method for method in HTTP_METHODS
+                       if hasattr(view_class, method)]
+        # DRF adds 'head' to a viewset's actions on its first request.
+        routes.extend(
+            (pattern.name, method.upper()) for method in actions
+            if method in HTTP_METHODS)
+    return routes
+
+
+def counted(queries):
+    # Savepoints come from running inside the rollback transaction; in
+    # production the same blocks are a plain BEGIN/COMMIT.
+    return [
+        query['sql'] for query in queries
+        if not query['sql'].startswith(TRANSACTION_STATEMENTS)
+    ]
+
+
+class Command(BaseCommand):
+    help = ('Проверяет, что число SQL-запросов каждого эндпоинта API не '
+            'зависит от объёма данных и не превышает бюджет из '
+            'query_budgets.json.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', type=int, nargs=2, default=[10, 100],
+            metavar=('SMALL', 'LARGE'),
+            help='Объёмы данных: рецептов на странице, подписок, '
+                 'ингредиентов в рецепте.')
+        parser.add_argument(
+            '--budgets', default=str(BUDGETS),
+            help='Файл с бюджетами запросов.')
+        parser.add_argument(
+            '--update', action='store_true',
+            help='Записать измеренные значения в файл бюджетов.')
+
+    def handle(self, *args, **options):
+        small, large = options['sizes']
+        if not 1 <= small < large <= settings.MAX_RECIPE_IDS:
+            raise CommandError(
+                'Объёмы должны расти и не превышать MAX_RECIPE_IDS.')
+        problems = self.uncovered_routes()
+
+        with override_settings(
+            CACHES={'default': {
+                'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}},
+            ALLOWED_HOSTS=['testserver'],
+            PROFILER_ENABLED=False,
+        ):
+            counts = {size: self.measure(size) for size in (small, large)}
+
+        try:
+            with open(options['budgets'], encoding='utf-8') as budgets_file:
+                budgets = json.load(budgets_file)
+        except FileNotFoundError:
+            budgets = {}
+
+        for key, queries in counts[large].items():
+            count = len(queries)
+            small_count = len(counts[small][key])
+            budget = budgets.get(key)
+            line = f'{key}: {small_count} / {count}'
+            if budget is not None:
+                line += f', бюджет {budget}'
+            if small_count != count:
+                problems.append(
+                    f'{key}: {small_count} запросов при {small}, '
+                    f'{count} при {large}')
+            elif budget is None:
+                if not options['update']:
+                    problems.append(f'{key}: нет бюджета')
+            elif count > budget and not options['update']:
+                problems.append(f'{key}: {count} запросов, бюджет {budget}')
+            elif count < budget:
+                line += ' (можно снизить)'
+            self.stdout.write(line)
+            if small_count != count and options['verbosity'] > 1:
+                # The statements repeated per row are the usual suspects.
+                statements = Counter(
+                    LITERALS.sub('?', sql) for sql in queries)
+                for sql, repeats in statements.most_common(3):
+                    self.stdout.write(f'    {repeats} × {sql[:200]}')
+
+        # Budgets that depend on the data size are not worth recording.
+        if options['update'] and not problems:
+            budgets = {
+                key: len(queries) for key, queries in counts[large].items()}
+            with open(options['budgets'], 'w',
+                      encoding='utf-8') as budgets_file:
+                json.dump(budgets, budgets_file, indent=4, sort_keys=True,
+                          ensure_ascii=False)
+                budgets_file.write('\n')
+            self.stdout.write(f'Бюджеты записаны в {options["budgets"]}')
+
+        if problems:
+            raise CommandError(
+                'Нарушены бюджеты запросов:\n' + '\n'.join(problems))
+        self.stdout.write(self.style.SUCCESS(
+            f'Проверено сценариев: {len(counts[large])}'))
+
+    def uncovered_routes(self):
+        covered = set()
+        for method, path, _, _ in SCENARIOS:
+            match = resolve(path.split('?')[0].format(
+                size=1, author=1, spare_author=1, recipe=1, spare=1,
+                ingredient=1))
+            covered.add((match.url_name, method))
+        return [
+            f'{name} {method}: нет сценария'
+            for name, method in api_routes()
+            if (name, method) not in covered
+            and name not in EXEMPT and f'{name} {method}' not in EXEMPT
+        ]
+
+    def measure(self, size):
+        # Everything happens in one transaction that is rolled back:
+        # the seeded rows never reach the database.
+        counts = {}
+        try:
+            with transaction.atomic():
+                values, payloads, viewer = self.seed(size)
+                client = APIClient()
+                client.credentials(
+                    HTTP_AUTHORIZATION=f'Token {viewer.auth_token.key}')
+                clients = {False: client, True: APIClient()}
+
+                # Warm-up: per-process caches (content types, the
+                # ingredient index) are filled by the first request.
+                ContentType.objects.get_for_models(*apps.get_models())
+                for method, path, _, anonymous in SCENARIOS:
+                    if method == 'GET':
+                        clients[anonymous].get(path.format(**values))
+
+                for method, path, payload, anonymous in SCENARIOS:
+                    key = scenario_key(method, path, anonymous)
+                    with CaptureQueriesContext(connection) as queries:
+                        response = getattr(
+                            clients[anonymous], method.lower()
+                        )(path.format(**values), payloads.get(payload),
+                          format='json')
+                        if response.streaming:
+                            # Streamed bodies query while being read.
+                            b''.join(response.streaming_content)
+                    if response.status_code >= 400:
+                        raise CommandError(
+                            f'{key}: ответ {response.status_code} '
+                            f'{response.content[:200]!r}')
+                    counts[key] = counted(queries.captured_queries)
+                raise Rollback
+        except Rollback:
+            pass
+        return counts
+
+    def seed(self, size):
+        prefix = f'budget{size}'
+        Ingredient.objects.bulk_create(
+            Ingredient(name=f'{prefix}-{number}', measurement_unit='г')
+            for number in range(size))
+        ingredients = list(Ingredient.objects.filter(
+            name__startswith=f'{prefix}-').values_list('id', flat=True))
+
+        viewer = User.objects.create(
+            username=f'{prefix}-viewer', email=f'{prefix}-viewer@example.com')
+        Token.objects.create(user=viewer)
+        User.objects.bulk_create(
+            User(username=f'{prefix}-{number}',
+                 email=f'{prefix}-{number}@example.com')
+            for number in range(size + 1))
+        *authors, spare_author = User.objects.filter(
+            username__startswith=f'{prefix}-').exclude(
+            pk=viewer.pk).order_by('id').values_list('id', flat=True)
+
+        # Authors get RECIPES_PER_AUTHOR recipes each, the spare author
+        # (not followed) gets `size` recipes that are in no list yet.
+        owners = [viewer.id] + [
+            author for author in authors for _ in range(RECIPES_PER_AUTHOR)
+        ] + [spare_author] * size
+        Recipe.objects.bulk_create(
+            Recipe(author_id=owner, name=f'{prefix} {number}',
+                   text='Рецепт.', image='recipes/budget.png',
+                   cooking_time=10)
+            for number, owner in enumerate(owners)
+        )
+        recipes = Recipe.objects.filter(
+            name__startswith=f'{prefix} ').order_by('id')
+        recipe = recipes.get(author=viewer)
+        followed = list(recipes.filter(author_id__in=authors).values_list(
+            'id', flat=True))
+        spare = list(recipes.filter(author_id=spare_author).values_list(
+            'id', flat=True))
+        IngredientInRecipe.objects.bulk_create(
+            IngredientInRecipe(
+                recipe_id=recipe_id, ingredient_id=ingredient, amount=1)
+            for recipe_id in recipes.values_list('id', flat=True)
+            for ingredient in ingredients
+        )
+
+        Subscription.objects.bulk_create(
+            Subscription(user=viewer, subscribed_to_id=author)
+            for author in authors)
+        for model in (Favorite, ShoppingCart):
+            model.objects.bulk_create(
+                model(user=viewer, recipe_id=recipe_id)
+                for recipe_id in followed)
+        rebuild_totals([viewer.id])
+
+        values = {
+            'size': size,
+            'author': authors[0],
+            'spare_author': spare_author,
+            'recipe': recipe.id,
+            'spare': spare[0],
+            'ids': ','.join(str(pk) for pk in followed[:size]),
+            'ingredient': ingredients[0],
+        }
+        payloads = {
+            'recipes': {'recipes': spare},
+            'ingredients': {'ingredients': [
+                {'id': ingredient, 'amount': 2}
+                for ingredient in ingredients
+            ]},
+        }
+        return values, payloads, viewer
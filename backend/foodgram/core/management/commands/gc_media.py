@@ -0,0 +1,131 @@
+import os
+import time
+from itertools import islice
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.images import IMAGE_FIELDS, recount_references
+from core.models import MediaFile
+
+
+def upload_directories():
+    directories = set()
+    for model, (field, _, _) in IMAGE_FIELDS.items():
+        upload_to = model._meta.get_field(field).upload_to
+        directories.add(str(upload_to).split('/')[0])
+    return sorted(directories)
+
+
+def walk_media(root):
+    # Yields (name, path, size, mtime) lazily, one directory at a time.
+    for directory in upload_directories():
+        for current, _, files in os.walk(os.path.join(root, directory)):
+            for file_name in files:
+                if file_name.endswith('.tmp'):
+                    continue
+                path = os.path.join(current, file_name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                name = os.path.relpath(path, root).replace(os.sep, '/')
+                yield name, path, stat.st_size, stat.st_mtime
+
+
+def prune_directories(root):
+    # Shard directories emptied by the sweep.
+    for directory in upload_directories():
+        top = os.path.join(root, directory)
+        for current, _, _ in os.walk(top, topdown=False):
+            if current == top:
+                continue
+            try:
+                os.rmdir(current)
+            except OSError:
+                pass
+
+
+def column_references(names):
+    # Safety net for rows written without signals: a file still named in
+    # an image column is never removed, whatever its refcount says.
+    found = set()
+    for model, (field, _, _) in IMAGE_FIELDS.items():
+        found.update(model._base_manager.filter(
+            **{f'{field}__in': names}).values_list(field, flat=True))
+    return found
+
+
+class Command(BaseCommand):
+    help = ('Удаляет из MEDIA_ROOT файлы, на которые не ссылается '
+            'ни одна картинка рецепта или аватар.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать, что будет удалено.')
+        parser.add_argument(
+            '--recount', action='store_true',
+            help='Сначала пересчитать ссылки по данным в базе.')
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Количество файлов, проверяемых одним запросом.')
+        parser.add_argument(
+            '--min-age', type=int, default=3600,
+            help='Не трогать файлы моложе заданного числа секунд.')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('Размер пакета должен быть положительным.')
+        dry_run = options['dry_run']
+
+        if options['recount']:
+            recount_references(batch_size)
+
+        cutoff = time.time() - options['min_age']
+        scanned = removed = kept_bytes = reclaimed = 0
+        files = walk_media(settings.MEDIA_ROOT)
+        while True:
+            batch = list(islice(files, batch_size))
+            if not batch:
+                break
+            scanned += len(batch)
+
+            referenced = set(MediaFile.objects.filter(
+                name__in=[name for name, *_ in batch], refcount__gt=0
+            ).values_list('name', flat=True))
+            candidates = {
+                name for name, _, _, mtime in batch
+                if name not in referenced and mtime < cutoff
+            }
+            if candidates:
+                candidates -= column_references(list(candidates))
+
+            garbage = []
+            for name, path, size, _ in batch:
+                if name not in candidates:
+                    kept_bytes += size
+                    continue
+                garbage.append(name)
+                reclaimed += size
+                if dry_run:
+                    self.stdout.write(f'{name} ({size} Б)')
+                    continue
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            removed += len(garbage)
+            if garbage and not dry_run:
+                MediaFile.objects.filter(
+                    name__in=garbage, refcount__lte=0).delete()
+
+        if removed and not dry_run:
+            prune_directories(settings.MEDIA_ROOT)
+
+        action = 'будет удалено' if dry_run else 'удалено'
+        self.stdout.write(self.style.SUCCESS(
+            f'Проверено файлов: {scanned}, {action}: {removed}, '
+            f'освобождено: {reclaimed} Б ({reclaimed / 2 ** 20:.1f} МБ), '
+            f'используется: {kept_bytes / 2 ** 20:.1f} МБ'))
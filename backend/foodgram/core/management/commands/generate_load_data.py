@@ -0,0 +1,273 @@
+import io
+import random
+import time
+from collections import Counter
+from datetime import timedelta
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+from PIL import Image
+
+from core.images import change_references, image_references
+from core.models import (Favorite, Ingredient, IngredientInRecipe, Recipe,
+                         ShoppingCart, Subscription, User)
+from core.shopping_cart import rebuild_totals
+from core.signals import bulk_changed
+
+FIRST_NAMES = ('Анна', 'Иван', 'Мария', 'Пётр', 'Ольга', 'Сергей',
+               'Елена', 'Дмитрий', 'Наталья', 'Алексей')
+LAST_NAMES = ('Иванов', 'Смирнов', 'Кузнецов', 'Попов', 'Соколов',
+              'Лебедев', 'Козлов', 'Новиков', 'Морозов', 'Волков')
+DISHES = ('Суп', 'Салат', 'Пирог', 'Рагу', 'Каша', 'Запеканка',
+          'Котлеты', 'Блины', 'Плов', 'Омлет')
+AMOUNTS = (1, 2, 3, 5, 10, 20, 50, 100, 150, 200, 250, 300, 500, 1000)
+
+
+def zipf_weights(size, exponent):
+    # Cumulative weights for random.choices: rank r is drawn with a
+    # probability proportional to 1 / r ** exponent.
+    return list(accumulate(1 / rank ** exponent
+                           for rank in range(1, size + 1)))
+
+
+def zipf_sample(rng, population, cum_weights, size):
+    # Distinct items, the popular ones first to be picked.
+    size = min(size, len(population) // 2)
+    chosen = set()
+    while len(chosen) < size:
+        chosen.update(rng.choices(
+            population, cum_weights=cum_weights, k=size - len(chosen)))
+    return chosen
+
+
+def placeholder_image():
+    image = Image.new('RGB', (600, 400), (230, 200, 160))
+    content = io.BytesIO()
+    image.save(content, 'JPEG')
+    field = Recipe._meta.get_field('image')
+    name = field.generate_filename(None, 'load.jpg')
+    return field.storage.save(name, ContentFile(content.getvalue())), {}
+
+
+class Command(BaseCommand):
+    help = ('Создаёт пользователей, рецепты, избранное, корзины и подписки '
+            'для нагрузочного тестирования.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--users', type=int, default=1000,
+            help='Количество пользователей.')
+        parser.add_argument(
+            '--recipes', type=int, default=5000,
+            help='Количество рецептов.')
+        parser.add_argument(
+            '--min-ingredients', type=int, default=3,
+            help='Наименьшее число ингредиентов в рецепте.')
+        parser.add_argument(
+            '--max-ingredients', type=int, default=15,
+            help='Наибольшее число ингредиентов в рецепте.')
+        parser.add_argument(
+            '--favorites', type=float, default=10,
+            help='Среднее число рецептов в избранном у пользователя.')
+        parser.add_argument(
+            '--cart', type=float, default=3,
+            help='Среднее число рецептов в корзине у пользователя.')
+        parser.add_argument(
+            '--subscriptions', type=float, default=5,
+            help='Среднее число подписок у пользователя.')
+        parser.add_argument(
+            '--zipf', type=float, default=1.1,
+            help='Показатель распределения Ципфа для популярности.')
+        parser.add_argument(
+            '--days', type=int, default=365,
+            help='За сколько дней распределить даты публикации.')
+        parser.add_argument(
+            '--password', default='load-test-password',
+            help='Пароль всех созданных пользователей.')
+        parser.add_argument(
+            '--seed', type=int, default=None,
+            help='Зерно генератора случайных чисел.')
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Количество объектов в одном пакете.')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('Размер пакета должен быть положительным.')
+        if options['users'] < 1 or options['recipes'] < 0:
+            raise CommandError(
+                'Нужен хотя бы один пользователь и неотрицательное '
+                'число рецептов.')
+        if not 1 <= options['min_ingredients'] <= options['max_ingredients']:
+            raise CommandError('Неверный диапазон числа ингредиентов.')
+        ingredient_ids = list(Ingredient.objects.values_list('id', flat=True))
+        if not ingredient_ids:
+            raise CommandError(
+                'Нет ингредиентов: сначала выполните load_ingredients.')
+
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.zipf = options['zipf']
+        started = time.monotonic()
+
+        with transaction.atomic():
+            users = self.make_users(options['users'], options['password'])
+            user_ids = [user.id for user in users]
+            # Popularity ranks: prolific authors are also the most
+            # followed, popular recipes are spread over all authors.
+            authors = self.rng.sample(user_ids, len(user_ids))
+            recipes = self.make_recipes(
+                options['recipes'], authors, options['days'])
+            recipe_ids = self.rng.sample(
+                [recipe.id for recipe in recipes], len(recipes))
+            links = self.make_links(
+                recipes, self.rng.sample(ingredient_ids, len(ingredient_ids)),
+                options['min_ingredients'], options['max_ingredients'])
+
+            subscriptions = self.make_relations(
+                Subscription, 'subscribed_to_id', user_ids, authors,
+                options['subscriptions'])
+            favorites = self.make_relations(
+                Favorite, 'recipe_id', user_ids, recipe_ids,
+                options['favorites'])
+            carts = self.make_relations(
+                ShoppingCart, 'recipe_id', user_ids, recipe_ids,
+                options['cart'])
+            self.set_counters(users, recipes, subscriptions, favorites, carts)
+
+            self.insert(User, users)
+            self.insert(Recipe, recipes)
+            self.reset_sequences([User, Recipe])
+            for model, objects in (
+                (IngredientInRecipe, links),
+                (Subscription, subscriptions),
+                (Favorite, favorites),
+                (ShoppingCart, carts),
+            ):
+                self.insert(model, objects)
+
+            change_references(added=[
+                name for recipe in recipes
+                for name in image_references(
+                    recipe.image.name, recipe.image_variants)
+            ])
+            cart_users = sorted({cart.user_id for cart in carts})
+            for start in range(0, len(cart_users), self.batch_size):
+                rebuild_totals(cart_users[start:start + self.batch_size])
+
+        for model in (User, Recipe, IngredientInRecipe, Subscription,
+                      Favorite, ShoppingCart):
+            bulk_changed.send(sender=model)
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано пользователей: {len(users)}, рецептов: {len(recipes)}, '
+            f'ингредиентов в рецептах: {len(links)}, подписок: '
+            f'{len(subscriptions)}, избранного: {len(favorites)}, '
+            f'в корзинах: {len(carts)}, '
+            f'{time.monotonic() - started:.2f} с'))
+
+    def next_id(self, model):
+        return (model.objects.aggregate(last=Max('id'))['last'] or 0) + 1
+
+    def make_users(self, count, password):
+        # Hashing is slow on purpose: one hash is shared by all users.
+        password = make_password(password)
+        first_id = self.next_id(User)
+        return [
+            User(
+                id=pk, username=f'load{pk}', email=f'load{pk}@example.com',
+                first_name=self.rng.choice(FIRST_NAMES),
+                last_name=self.rng.choice(LAST_NAMES), password=password)
+            for pk in range(first_id, first_id + count)
+        ]
+
+    def make_recipes(self, count, authors, days):
+        images = list(
+            Recipe.objects.exclude(image='')
+            .values_list('image', 'image_variants')[:50])
+        if count and not images:
+            images = [placeholder_image()]
+        weights = zipf_weights(len(authors), self.zipf)
+        now = timezone.now()
+        # Ids grow with the publication date, as on a live site.
+        created = sorted(
+            now - timedelta(seconds=self.rng.uniform(0, days * 86400))
+            for _ in range(count))
+        first_id = self.next_id(Recipe)
+        recipes = []
+        for pk, published in enumerate(created, first_id):
+            image, variants = self.rng.choice(images)
+            recipes.append(Recipe(
+                id=pk,
+                author_id=self.rng.choices(authors, cum_weights=weights)[0],
+                name=f'{self.rng.choice(DISHES)} №{pk}',
+                text=f'Описание рецепта №{pk}.',
+                image=image, image_variants=variants,
+                cooking_time=self.rng.randint(5, 180),
+                created=published))
+        return recipes
+
+    def make_links(self, recipes, ingredients, low, high):
+        weights = zipf_weights(len(ingredients), self.zipf)
+        middle = (low + high) / 2
+        links = []
+        for recipe in recipes:
+            size = round(self.rng.gauss(middle, (high - low) / 4))
+            size = max(low, min(high, size))
+            for ingredient_id in zipf_sample(
+                    self.rng, ingredients, weights, size):
+                links.append(IngredientInRecipe(
+                    recipe_id=recipe.id, ingredient_id=ingredient_id,
+                    amount=self.rng.choice(AMOUNTS)))
+        return links
+
+    def make_relations(self, model, field, user_ids, ranked, mean):
+        # Per-user counts are long-tailed, targets follow Zipf's law.
+        if not ranked or mean <= 0:
+            return []
+        weights = zipf_weights(len(ranked), self.zipf)
+        relations = []
+        for user_id in user_ids:
+            size = round(self.rng.expovariate(1 / mean))
+            targets = zipf_sample(self.rng, ranked, weights, size)
+            relations.extend(
+                model(user_id=user_id, **{field: target})
+                for target in targets if target != user_id)
+        return relations
+
+    def set_counters(self, users, recipes, subscriptions, favorites, carts):
+        # The rows are all new: counters are known before the insert.
+        recipes_count = Counter(recipe.author_id for recipe in recipes)
+        followers = Counter(sub.subscribed_to_id for sub in subscriptions)
+        for user in users:
+            user.recipes_count = recipes_count[user.id]
+            user.followers_count = followers[user.id]
+        favorites_count = Counter(favorite.recipe_id for favorite in favorites)
+        cart_count = Counter(cart.recipe_id for cart in carts)
+        for recipe in recipes:
+            recipe.favorites_count = favorites_count[recipe.id]
+            recipe.cart_count = cart_count[recipe.id]
+
+    def insert(self, model, objects):
+        # Raw inserts keep the generated publication dates (bulk_create
+        # would overwrite auto_now_add fields) and skip model signals.
+        fields = [
+            field for field in model._meta.local_concrete_fields
+            if objects and (field is not model._meta.auto_field
+                            or objects[0].pk is not None)
+        ]
+        size = min(max(connection.ops.bulk_batch_size(fields, objects), 1),
+                   self.batch_size)
+        for start in range(0, len(objects), size):
+            model._base_manager._insert(
+                objects[start:start + size], fields=fields, raw=True)
+
+    def reset_sequences(self, models):
+        with connection.cursor() as cursor:
+            for line in connection.ops.sequence_reset_sql(no_style(), models):
+                cursor.execute(line)
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Max
+
+from core.models import Recipe
+from core.search import install_search_backend, reindex_batch
+
+
+class Command(BaseCommand):
+    help = 'Заполняет полнотекстовый индекс рецептов пакетами.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Количество рецептов в одном пакете.')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        install_search_backend(connection)
+
+        last_id = Recipe.objects.aggregate(last_id=Max('id'))['last_id']
+        indexed = 0
+        start = 0
+        while last_id is not None and start < last_id:
+            end = start + batch_size
+            with transaction.atomic():
+                indexed += max(reindex_batch(start, end, connection), 0)
+            start = end
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Проиндексировано рецептов: {indexed}'))
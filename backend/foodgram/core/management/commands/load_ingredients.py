@@ -0,0 +1,123 @@
+import csv
+import io
+import os
+import time
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from core.models import Ingredient
+from core.signals import bulk_changed
+from core.streaming import iter_json_array
+
+FORMATS = ('csv', 'json')
+HEADER = ('name', 'measurement_unit')
+
+STAGING_TABLE = 'core_ingredient_staging'
+CREATE_STAGING = (
+    f'CREATE TEMP TABLE IF NOT EXISTS {STAGING_TABLE} '
+    '(name varchar(128), measurement_unit varchar(64))'
+)
+MERGE_STAGING = (
+    'INSERT INTO {table} (name, measurement_unit) '
+    f'SELECT DISTINCT name, measurement_unit FROM {STAGING_TABLE} '
+    'ON CONFLICT (name, measurement_unit) DO NOTHING'
+)
+
+
+def read_csv(stream):
+    for row in csv.reader(stream):
+        if not row or tuple(row) == HEADER:
+            continue
+        yield row[0], row[1]
+
+
+def read_json(stream):
+    for item in iter_json_array(stream):
+        yield item['name'], item['measurement_unit']
+
+
+class Command(BaseCommand):
+    help = ('Загружает ингредиенты из CSV или JSON пакетами. '
+            'Повторный запуск не создаёт дубликатов.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Путь к файлу с ингредиентами.')
+        parser.add_argument(
+            '--format', choices=FORMATS,
+            help='Формат файла; по умолчанию определяется по расширению.')
+        parser.add_argument(
+            '--batch-size', type=int, default=5000,
+            help='Количество строк в одном пакете.')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or (
+            os.path.splitext(path)[1].lstrip('.').lower())
+        if file_format not in FORMATS:
+            raise CommandError(f'Неизвестный формат файла: {path}')
+        if options['batch_size'] < 1:
+            raise CommandError('Размер пакета должен быть положительным.')
+
+        reader = read_csv if file_format == 'csv' else read_json
+        write_batch = (
+            self.copy_batch if connection.vendor == 'postgresql'
+            else self.insert_batch)
+
+        before = Ingredient.objects.count()
+        started = time.monotonic()
+        read = 0
+        try:
+            with open(path, encoding='utf-8-sig', newline='') as stream:
+                rows = self.deduplicate(reader(stream))
+                while True:
+                    batch = list(islice(rows, options['batch_size']))
+                    if not batch:
+                        break
+                    with transaction.atomic():
+                        write_batch(batch)
+                    read += len(batch)
+        except OSError as error:
+            raise CommandError(f'Не удалось прочитать {path}: {error}')
+        except (KeyError, IndexError, ValueError) as error:
+            raise CommandError(
+                f'Некорректные данные после строки {read}: {error}')
+        elapsed = time.monotonic() - started
+
+        created = Ingredient.objects.count() - before
+        if created:
+            bulk_changed.send(sender=Ingredient)
+        rate = read / elapsed if elapsed else read
+        self.stdout.write(self.style.SUCCESS(
+            f'Прочитано: {read}, добавлено: {created}, '
+            f'пропущено: {read - created}, '
+            f'{elapsed:.2f} с ({rate:.0f} строк/с)'))
+
+    def deduplicate(self, rows):
+        seen = set()
+        for name, measurement_unit in rows:
+            key = (name.strip(), measurement_unit.strip())
+            if not all(key) or key in seen:
+                continue
+            seen.add(key)
+            yield key
+
+    def insert_batch(self, batch):
+        Ingredient.objects.bulk_create(
+            [Ingredient(name=name, measurement_unit=unit)
+             for name, unit in batch],
+            ignore_conflicts=True)
+
+    def copy_batch(self, batch):
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(batch)
+        buffer.seek(0)
+        with connection.cursor() as cursor:
+            cursor.execute(CREATE_STAGING)
+            cursor.execute(f'TRUNCATE {STAGING_TABLE}')
+            cursor.copy_expert(
+                f'COPY {STAGING_TABLE} (name, measurement_unit) '
+                'FROM STDIN WITH (FORMAT csv)', buffer)
+            cursor.execute(MERGE_STAGING.format(
+                table=Ingredient._meta.db_table))
@@ -0,0 +1,280 @@
+import json
+import random
+import re
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from prometheus_client.parser import text_string_to_metric_families
+from rest_framework.authtoken.models import Token
+
+from core.models import Ingredient, Recipe, User
+
+from .generate_load_data import zipf_weights
+
+COLLECTION = (settings.BASE_DIR.parent.parent / 'postman_collection'
+              / 'foodgram.postman_collection.json')
+# Writes without a body that the flow undoes itself: add, then remove.
+TOGGLES = re.compile(r'/(favorite|shopping_cart|subscribe)/')
+VARIABLE = re.compile(r'{{(\w+)}}')
+USER_VARIABLES = ('userId', 'secondUserId', 'thirdUserId')
+RECIPE_VARIABLES = ('firstRecipeId', 'secondRecipeId', 'thirdRecipeId',
+                    'fourthRecipeId', 'fifthRecipeId')
+SQL_METRIC = 'foodgram_request_sql_queries'
+
+
+def collection_flows(path):
+    # The happy-path reads and add/remove pairs of the Postman collection,
+    # in its order: registration, password, avatar and recipe writes and
+    # the *_bad_requests folders are left out.
+    with open(path, encoding='utf-8') as collection_file:
+        collection = json.load(collection_file)
+
+    flows = []
+
+    def walk(items, folders):
+        for item in items:
+            if 'item' in item:
+                walk(item['item'], folders + [item['name']])
+                continue
+            if any('bad_request' in folder or 'register' in folder
+                   for folder in folders):
+                continue
+            request = item['request']
+            url = request['url']
+            url = url['raw'] if isinstance(url, dict) else url
+            method = request['method']
+            if method != 'GET' and (
+                    request.get('body') or not TOGGLES.search(url)):
+                continue
+            flows.append({
+                'name': item['name'].replace('  ', ' ').strip(),
+                'method': method,
+                'url': url,
+                'anonymous': 'No Auth' in item['name'],
+            })
+
+    walk(collection['item'], [])
+    return flows
+
+
+def percentile(values, share):
+    # Nearest-rank percentile of sorted values.
+    if not values:
+        return 0
+    return values[min(len(values) - 1, max(0, round(share * len(values)) - 1))]
+
+
+def scrape_queries(session, base_url):
+    # {endpoint: (sum, count)} of the SQL query histogram, or None when
+    # /api/metrics is not reachable from here.
+    try:
+        response = session.get(f'{base_url}/api/metrics', timeout=10)
+    except requests.RequestException:
+        return None
+    if response.status_code != 200:
+        return None
+    totals = defaultdict(lambda: [0.0, 0.0])
+    for family in text_string_to_metric_families(response.text):
+        if family.name != SQL_METRIC:
+            continue
+        for sample in family.samples:
+            endpoint = sample.labels.get('endpoint')
+            if sample.name == SQL_METRIC + '_sum':
+                totals[endpoint][0] += sample.value
+            elif sample.name == SQL_METRIC + '_count':
+                totals[endpoint][1] += sample.value
+    return totals
+
+
+class Command(BaseCommand):
+    help = ('Воспроизводит сценарии Postman-коллекции против запущенного '
+            'сервера и выводит пропускную способность, перцентили времени '
+            'ответа и число SQL-запросов по эндпоинтам.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--base-url', default='http://127.0.0.1:8000',
+            help='Адрес сервера.')
+        parser.add_argument(
+            '--collection', default=str(COLLECTION),
+            help='Путь к Postman-коллекции.')
+        parser.add_argument(
+            '--concurrency', type=int, default=10,
+            help='Количество одновременных виртуальных пользователей.')
+        parser.add_argument(
+            '--duration', type=float, default=60,
+            help='Длительность теста в секундах.')
+        parser.add_argument(
+            '--iterations', type=int, default=None,
+            help='Проходов по коллекции на пользователя вместо '
+                 '--duration.')
+        parser.add_argument(
+            '--zipf', type=float, default=1.1,
+            help='Показатель распределения Ципфа при выборе рецептов и '
+                 'авторов.')
+        parser.add_argument(
+            '--read-only', action='store_true',
+            help='Только GET-запросы.')
+        parser.add_argument(
+            '--seed', type=int, default=None,
+            help='Зерно генератора случайных чисел.')
+
+    def handle(self, *args, **options):
+        if options['concurrency'] < 1:
+            raise CommandError('Нужен хотя бы один пользователь.')
+        try:
+            flows = collection_flows(options['collection'])
+        except (OSError, ValueError, KeyError) as error:
+            raise CommandError(f'Не удалось прочитать коллекцию: {error}')
+        if options['read_only']:
+            flows = [flow for flow in flows if flow['method'] == 'GET']
+
+        self.base_url = options['base_url'].rstrip('/')
+        self.rng = random.Random(options['seed'])
+        self.lock = threading.Lock()
+        self.prepare_data(options['concurrency'], options['zipf'])
+        self.results = defaultdict(list)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+
+        session = requests.Session()
+        before = scrape_queries(session, self.base_url)
+        deadline = None
+        if options['iterations'] is None:
+            deadline = time.monotonic() + options['duration']
+        started = time.monotonic()
+        with ThreadPoolExecutor(options['concurrency']) as executor:
+            workers = [
+                executor.submit(
+                    self.run_user, token, flows, options['iterations'],
+                    deadline, random.Random(self.rng.random()))
+                for token in self.tokens
+            ]
+            for worker in workers:
+                worker.result()
+        elapsed = time.monotonic() - started
+        after = scrape_queries(session, self.base_url)
+        self.report(flows, elapsed, before, after)
+
+    def prepare_data(self, concurrency, exponent):
+        # Zipf ranks follow the real popularity of recipes and authors.
+        self.recipe_ids = list(Recipe.objects.order_by(
+            '-favorites_count', 'id').values_list('id', flat=True))
+        self.author_ids = list(User.objects.filter(
+            recipes_count__gt=0).order_by(
+            '-followers_count', 'id').values_list('id', flat=True))
+        ingredients = list(Ingredient.objects.values_list('id', 'name'))
+        users = list(User.objects.filter(
+            is_active=True, is_superuser=False).values_list('id', flat=True))
+        if not (self.recipe_ids and ingredients
+                and len(self.author_ids) > 3 and users):
+            raise CommandError(
+                'Недостаточно данных: сначала выполните '
+                'generate_load_data.')
+        self.ingredients = ingredients
+        self.recipe_weights = zipf_weights(len(self.recipe_ids), exponent)
+        self.author_weights = zipf_weights(len(self.author_ids), exponent)
+        self.tokens = [
+            (user_id, Token.objects.get_or_create(user_id=user_id)[0].key)
+            for user_id in self.rng.sample(
+                users, min(concurrency, len(users)))
+        ]
+
+    def variables(self, rng, user_id):
+        # One binding per pass, so that a remove undoes its add.
+        authors = set()
+        while len(authors) < len(USER_VARIABLES):
+            author = rng.choices(
+                self.author_ids, cum_weights=self.author_weights)[0]
+            if author != user_id:
+                authors.add(author)
+        recipes = rng.choices(
+            self.recipe_ids, cum_weights=self.recipe_weights,
+            k=len(RECIPE_VARIABLES))
+        ingredient_id, ingredient_name = rng.choice(self.ingredients)
+        values = dict(zip(USER_VARIABLES, authors))
+        values.update(zip(RECIPE_VARIABLES, recipes))
+        values.update({
+            'baseUrl': self.base_url,
+            'firstIndredientId': ingredient_id,
+            'ingredientNameFirstLatter': ingredient_name[:1],
+        })
+        return values
+
+    def run_user(self, token, flows, iterations, deadline, rng):
+        user_id, key = token
+        session = requests.Session()
+        done = 0
+        while True:
+            if iterations is not None and done >= iterations:
+                return
+            values = self.variables(rng, user_id)
+            for flow in flows:
+                if deadline is not None and time.monotonic() >= deadline:
+                    return
+                url = VARIABLE.sub(
+                    lambda match: str(values.get(match[1], match[0])),
+                    flow['url'])
+                headers = {}
+                if not flow['anonymous']:
+                    headers['Authorization'] = f'Token {key}'
+                started = time.perf_counter()
+                try:
+                    status = session.request(
+                        flow['method'], url, headers=headers,
+                        timeout=30).status_code
+                except requests.RequestException:
+                    status = 'error'
+                latency = time.perf_counter() - started
+                with self.lock:
+                    self.results[flow['name']].append(latency)
+                    self.statuses[flow['name']][status] += 1
+            done += 1
+
+    def report(self, flows, elapsed, before, after):
+        total = sum(len(latencies) for latencies in self.results.values())
+        self.stdout.write(
+            f'{"Сценарий":<60} {"запр.":>6} {"rps":>7} {"p50":>7} '
+            f'{"p95":>7} {"p99":>7}  статусы')
+        names = list(dict.fromkeys(flow['name'] for flow in flows))
+        for name in names:
+            latencies = sorted(self.results.get(name, ()))
+            if not latencies:
+                continue
+            p50, p95, p99 = (
+                percentile(latencies, share) * 1000
+                for share in (0.5, 0.95, 0.99))
+            statuses = ', '.join(
+                f'{status}: {count}'
+                for status, count in sorted(
+                    self.statuses[name].items(), key=str))
+            self.stdout.write(
+                f'{name[:60]:<60} {len(latencies):>6} '
+                f'{len(latencies) / elapsed:>7.1f} {p50:>7.1f} '
+                f'{p95:>7.1f} {p99:>7.1f}  {statuses}')
+
+        if before is None or after is None:
+            self.stdout.write(
+                'Число SQL-запросов недоступно: /api/metrics не отвечает.')
+        else:
+            self.stdout.write(
+                f'\n{"Эндпоинт":<45} {"запр.":>6} {"SQL/запр.":>10}')
+            for endpoint in sorted(after):
+                queries = after[endpoint][0] - before.get(endpoint, (0, 0))[0]
+                count = after[endpoint][1] - before.get(endpoint, (0, 0))[1]
+                if count:
+                    self.stdout.write(
+                        f'{endpoint:<45} {count:>6.0f} '
+                        f'{queries / count:>10.1f}')
+
+        errors = sum(
+            count for statuses in self.statuses.values()
+            for status, count in statuses.items()
+            if status == 'error' or status >= 500)
+        self.stdout.write(self.style.SUCCESS(
+            f'Запросов: {total} за {elapsed:.1f} с '
+            f'({total / elapsed:.1f} rps), ошибок: {errors}'))
@@ -0,0 +1,61 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.images import claim_jobs, enqueue_missing, run_job
+from core.models import ImageJob
+
+
+class Command(BaseCommand):
+    help = ('Обработчик очереди изображений: создаёт уменьшенные копии '
+            'и WebP-варианты картинок рецептов и аватаров.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Обработать очередь и завершиться.')
+        parser.add_argument(
+            '--enqueue-missing', action='store_true',
+            help='Поставить в очередь изображения без вариантов.')
+        parser.add_argument(
+            '--batch-size', type=int, default=10,
+            help='Количество задач, забираемых за один раз.')
+        parser.add_argument(
+            '--sleep', type=float, default=5,
+            help='Пауза в секундах, когда очередь пуста.')
+        parser.add_argument(
+            '--max-attempts', type=int, default=3,
+            help='Количество попыток до пометки задачи как ошибочной.')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1 or options['max_attempts'] < 1:
+            raise CommandError(
+                'Размер пакета и число попыток должны быть положительными.')
+
+        if options['enqueue_missing']:
+            queued = enqueue_missing()
+            self.stdout.write(f'Поставлено в очередь: {queued}')
+
+        processed = {ImageJob.DONE: 0, ImageJob.PENDING: 0,
+                     ImageJob.FAILED: 0}
+        try:
+            while True:
+                jobs = claim_jobs(
+                    options['batch_size'], options['max_attempts'])
+                if not jobs:
+                    if options['once']:
+                        break
+                    time.sleep(options['sleep'])
+                    continue
+                for job in jobs:
+                    status = run_job(job, options['max_attempts'])
+                    processed[status] += 1
+                    if status != ImageJob.DONE:
+                        self.stderr.write(f'{job.source}: {job.error}')
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово: {processed[ImageJob.DONE]}, '
+            f'повторить: {processed[ImageJob.PENDING]}, '
+            f'ошибки: {processed[ImageJob.FAILED]}'))
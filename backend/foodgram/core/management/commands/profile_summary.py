@@ -0,0 +1,103 @@
+import json
+import os
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.profiling import make_header_token
+
+SORT_KEYS = {
+    'p95': lambda stats: stats['p95'],
+    'total': lambda stats: stats['total'],
+    'queries': lambda stats: stats['queries'],
+}
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+def read_reports(directory):
+    for name in sorted(os.listdir(directory)):
+        if not name.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(directory, name),
+                      encoding='utf-8') as report_file:
+                yield json.load(report_file)
+        except (OSError, ValueError):
+            # Rotated away or still being written.
+            continue
+
+
+class Command(BaseCommand):
+    help = ('Сводка по отчётам профилировщика медленных запросов: '
+            'худшие эндпоинты и повторяющиеся SQL-запросы.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limit', type=int, default=10,
+            help='Количество эндпоинтов в сводке.')
+        parser.add_argument(
+            '--sort', choices=sorted(SORT_KEYS), default='p95',
+            help='Сортировка: p95 времени ответа, суммарное время '
+                 'или среднее число SQL-запросов.')
+        parser.add_argument(
+            '--token', action='store_true',
+            help='Вывести значение заголовка, включающего профилирование '
+                 'запроса (действует сутки).')
+
+    def handle(self, *args, **options):
+        if options['token']:
+            self.stdout.write(
+                f'{settings.PROFILER_HEADER}: {make_header_token()}')
+            return
+
+        directory = settings.PROFILER_DIR
+        if not os.path.isdir(directory):
+            raise CommandError(f'Каталог отчётов не найден: {directory}')
+
+        durations = defaultdict(list)
+        queries = defaultdict(list)
+        duplicates = defaultdict(Counter)
+        profiles = defaultdict(list)
+        for report in read_reports(directory):
+            endpoint = report['endpoint']
+            durations[endpoint].append(report['duration'])
+            queries[endpoint].append(report['query_count'])
+            for item in report['duplicates']:
+                duplicates[endpoint][item['sql']] += item['count']
+            if report.get('profile'):
+                profiles[endpoint].append(report['profile'])
+
+        if not durations:
+            self.stdout.write('Отчётов нет.')
+            return
+
+        stats = [
+            {
+                'endpoint': endpoint,
+                'count': len(values),
+                'p50': percentile(values, 0.5),
+                'p95': percentile(values, 0.95),
+                'total': sum(values),
+                'queries': sum(queries[endpoint]) / len(values),
+            }
+            for endpoint, values in durations.items()
+        ]
+        stats.sort(key=SORT_KEYS[options['sort']], reverse=True)
+
+        for item in stats[:options['limit']]:
+            endpoint = item['endpoint']
+            self.stdout.write(self.style.MIGRATE_HEADING(endpoint))
+            self.stdout.write(
+                f'  отчётов: {item["count"]}, '
+                f'p50: {item["p50"] * 1000:.0f} мс, '
+                f'p95: {item["p95"] * 1000:.0f} мс, '
+                f'SQL-запросов в среднем: {item["queries"]:.1f}')
+            for sql, count in duplicates[endpoint].most_common(3):
+                self.stdout.write(f'  повторов: {count}: {sql[:200]}')
+            if profiles[endpoint]:
+                self.stdout.write(f'  профиль: {profiles[endpoint][-1]}')
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.counters import recount_counters
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает счётчики избранного, корзин, рецептов и '
+            'подписчиков и исправляет расхождения.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать количество расхождений.')
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Количество строк, проверяемых одним запросом.')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('Размер пакета должен быть положительным.')
+        drift = recount_counters(
+            options['batch_size'], dry_run=options['dry_run'])
+
+        for label, rows in drift.items():
+            self.stdout.write(f'{label}: расхождений {rows}')
+        action = 'найдено' if options['dry_run'] else 'исправлено'
+        self.stdout.write(self.style.SUCCESS(
+            f'Счётчики пересчитаны, {action} строк: {sum(drift.values())}'))
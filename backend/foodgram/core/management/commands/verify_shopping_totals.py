@@ -0,0 +1,69 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from core.shopping_cart import (
+    cart_user_ids,
+    expected_totals,
+    rebuild_totals,
+    stored_totals
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает итоги корзин покупок с нуля и сравнивает '
+        'их с сохранёнными.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fix', action='store_true',
+            help='Перезаписать итоги пользователей с расхождениями.')
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Количество пользователей в одном пакете.')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('Размер пакета должен быть положительным.')
+        user_ids = cart_user_ids()
+        broken_users = 0
+        broken_rows = 0
+
+        for start in range(0, len(user_ids), batch_size):
+            batch = user_ids[start:start + batch_size]
+            expected = expected_totals(batch)
+            stored = stored_totals(batch)
+
+            broken = []
+            for user_id in batch:
+                want, have = expected[user_id], stored[user_id]
+                diff = [
+                    (ingredient_id, have.get(ingredient_id),
+                     want.get(ingredient_id))
+                    for ingredient_id in sorted(want.keys() | have.keys())
+                    if want.get(ingredient_id) != have.get(ingredient_id)
+                ]
+                if not diff:
+                    continue
+                broken.append(user_id)
+                broken_rows += len(diff)
+                for ingredient_id, actual, correct in diff:
+                    self.stdout.write(
+                        f'user={user_id} ingredient={ingredient_id}: '
+                        f'сохранено {actual}, ожидается {correct}')
+
+            broken_users += len(broken)
+            if broken and options['fix']:
+                with transaction.atomic():
+                    rebuild_totals(broken)
+
+        message = (
+            f'Проверено пользователей: {len(user_ids)}, '
+            f'с расхождениями: {broken_users}, строк: {broken_rows}'
+        )
+        if broken_users and options['fix']:
+            message += ' (исправлено)'
+        style = self.style.WARNING if broken_users else self.style.SUCCESS
+        self.stdout.write(style(message))
@@ -0,0 +1,62 @@
+# Generated by Django 3.2.16 on 2026-10-18 19:23
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_totals(apps, schema_editor):
+    ShoppingCart = apps.get_model('core', 'ShoppingCart')
+    ShoppingCartTotal = apps.get_model('core', 'ShoppingCartTotal')
+    rows = (
+        ShoppingCart.objects
+        .filter(recipe__ingredient_amounts__isnull=False)
+        .values('user_id',
+                ingredient_id=models.F(
+                    'recipe__ingredient_amounts__ingredient_id'))
+        .annotate(
+            total_amount=models.Sum('recipe__ingredient_amounts__amount'),
+            recipe_count=models.Count('id', distinct=True)
+        )
+        .order_by()
+    )
+    ShoppingCartTotal.objects.bulk_create([
+        ShoppingCartTotal(
+            user_id=row['user_id'],
+            ingredient_id=row['ingredient_id'],
+            total_amount=row['total_amount'],
+            recipe_count=row['recipe_count']
+        )
+        for row in rows.iterator()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_recipe_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShoppingCartTotal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_amount', models.IntegerField(default=0, verbose_name='Общее количество')),
+                ('recipe_count', models.IntegerField(default=0, verbose_name='Количество рецептов')),
+                ('updated', models.DateTimeField(auto_now=True, verbose_name='Дата изменения')),
+                ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shopping_cart_totals', to='core.ingredient', verbose_name='Ингредиент')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shopping_cart_totals', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Итог корзины',
+                'verbose_name_plural': 'Итоги корзины',
+                'ordering': ('id',),
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='shoppingcarttotal',
+            constraint=models.UniqueConstraint(fields=('user', 'ingredient'), name='uq_ShoppingCartTotal'),
+        ),
+        migrations.RunPython(fill_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,91 @@
+# Generated by Django 3.2.16 on 2026-10-18 19:29
+
+from collections import defaultdict
+
+from django.db import migrations, models
+
+from core.const import MAX_INGREDIENT_AMOUNT
+
+
+def merge_duplicates(apps, schema_editor):
+    # Keeps the oldest of each (name, measurement_unit) group: recipe rows
+    # are moved onto it with their amounts summed, shopping cart totals of
+    # the group are rebuilt, then the other ingredients are removed.
+    Ingredient = apps.get_model('core', 'Ingredient')
+    IngredientInRecipe = apps.get_model('core', 'IngredientInRecipe')
+    ShoppingCart = apps.get_model('core', 'ShoppingCart')
+    ShoppingCartTotal = apps.get_model('core', 'ShoppingCartTotal')
+
+    groups = (
+        Ingredient.objects
+        .values('name', 'measurement_unit')
+        .annotate(keep=models.Min('id'), count=models.Count('id'))
+        .filter(count__gt=1)
+        .order_by()
+    )
+    for group in list(groups):
+        keep = group['keep']
+        duplicates = list(
+            Ingredient.objects
+            .filter(name=group['name'],
+                    measurement_unit=group['measurement_unit'])
+            .exclude(id=keep)
+            .values_list('id', flat=True)
+        )
+        ids = [keep] + duplicates
+
+        by_recipe = defaultdict(list)
+        for row in IngredientInRecipe.objects.filter(
+                ingredient_id__in=ids).order_by('id'):
+            by_recipe[row.recipe_id].append(row)
+        for first, *rest in by_recipe.values():
+            if not rest and first.ingredient_id == keep:
+                continue
+            IngredientInRecipe.objects.filter(
+                id__in=[row.id for row in rest]).delete()
+            first.ingredient_id = keep
+            first.amount = min(
+                first.amount + sum(row.amount for row in rest),
+                MAX_INGREDIENT_AMOUNT)
+            first.save(update_fields=['ingredient', 'amount'])
+
+        ShoppingCartTotal.objects.filter(ingredient_id__in=ids).delete()
+        totals = (
+            ShoppingCart.objects
+            .filter(recipe__ingredient_amounts__ingredient_id=keep)
+            .values('user_id')
+            .annotate(
+                total_amount=models.Sum('recipe__ingredient_amounts__amount'),
+                recipe_count=models.Count('id', distinct=True)
+            )
+            .order_by()
+        )
+        ShoppingCartTotal.objects.bulk_create([
+            ShoppingCartTotal(
+                user_id=row['user_id'], ingredient_id=keep,
+                total_amount=row['total_amount'],
+                recipe_count=row['recipe_count'])
+            for row in totals
+        ])
+
+        Ingredient.objects.filter(id__in=duplicates).delete()
+
+    if schema_editor.connection.vendor == 'postgresql':
+        # Fire the deferred foreign key checks now: PostgreSQL refuses to
+        # alter a table with pending trigger events.
+        schema_editor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_updated'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='ingredient',
+            constraint=models.UniqueConstraint(fields=('name', 'measurement_unit'), name='uq_Ingredient'),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 3.2.16 on 2026-10-18 19:40
+
+from collections import Counter
+
+from django.db import migrations, models
+
+IMAGE_FIELDS = (
+    ('Recipe', 'image', 'image_variants'),
+    ('User', 'avatar', 'avatar_variants'),
+)
+
+
+def count_references(apps, schema_editor):
+    MediaFile = apps.get_model('core', 'MediaFile')
+    refcounts = Counter()
+    for model_name, field, variants_field in IMAGE_FIELDS:
+        model = apps.get_model('core', model_name)
+        rows = model.objects.values_list(field, variants_field)
+        for image, variants in rows.iterator():
+            if not image:
+                continue
+            refcounts[image] += 1
+            variants = variants or {}
+            if variants.get('source') == image:
+                refcounts.update(variants.get('files', {}).values())
+    MediaFile.objects.bulk_create([
+        MediaFile(name=name, refcount=refcount)
+        for name, refcount in refcounts.items()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_image_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaFile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True, verbose_name='Файл')),
+                ('refcount', models.IntegerField(default=0, verbose_name='Количество ссылок')),
+            ],
+            options={
+                'verbose_name': 'Медиафайл',
+                'verbose_name_plural': 'Медиафайлы',
+                'ordering': ('id',),
+            },
+        ),
+        migrations.RunPython(count_references, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,8 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser
+from django.contrib.contenttypes.models import ContentType
+from django.utils import timezone
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import (
     RegexValidator,
     MinValueValidator,
@@ -14,7 +17,30 @@ from core.const import (
 )
 
 
-class User(AbstractUser):
+class CounterFieldsMixin:
+    # Counter columns change only through F() updates (see core.counters),
+    # so a plain save() of an instance loaded earlier must not write back
+    # the stale values.
+    counter_fields = ()
+
+    def save(self, *args, **kwargs):
+        if (
+            not self._state.adding
+            and not args
+            and kwargs.get('update_fields') is None
+            and not kwargs.get('force_insert')
+        ):
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.counter_fields
+                and field.attname not in deferred
+            ]
+        super().save(*args, **kwargs)
+
+
+class User(CounterFieldsMixin, AbstractUser):
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['first_name', 'last_name', 'username']
 
@@ -53,6 +79,28 @@ class User(AbstractUser):
         upload_to='users',
         blank=True
     )
+    avatar_variants = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        verbose_name='Варианты аватара'
+    )
+    updated = models.DateTimeField(
+        default=timezone.now,
+        verbose_name='Дата изменения'
+    )
+    recipes_count = models.IntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Количество рецептов'
+    )
+    followers_count = models.IntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Количество подписчиков'
+    )
+
+    counter_fields = ('recipes_count', 'followers_count')
 
     class Meta:
         verbose_name = 'Пользователь'
@@ -62,6 +110,10 @@ class User(AbstractUser):
     def __str__(self):
         return self.username
 
+    def save(self, *args, **kwargs):
+        self.updated = timezone.now()
+        super().save(*args, **kwargs)
+
 
 class Subscription(models.Model):
     user = models.ForeignKey(
@@ -97,6 +149,12 @@ class Ingredient(models.Model):
     )
 
     class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['name', 'measurement_unit'], name='uq_Ingredient'
+            )
+        ]
+
         verbose_name = 'Ингредиент'
         verbose_name_plural = 'Ингредиенты'
         ordering = ('id',)
@@ -105,7 +163,7 @@ class Ingredient(models.Model):
         return self.name
 
 
-class Recipe(models.Model):
+class Recipe(CounterFieldsMixin, models.Model):
     author = models.ForeignKey(
         User, on_delete=models.CASCADE, related_name='recipes',
         verbose_name='Пользователь'
@@ -123,6 +181,12 @@ class Recipe(models.Model):
         verbose_name='Картинка',
         upload_to='recipes'
     )
+    image_variants = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        verbose_name='Варианты картинки'
+    )
     text = models.TextField(
         verbose_name='Описание'
     )
@@ -149,15 +213,45 @@ class Recipe(models.Model):
         auto_now_add=True,
         verbose_name='Дата публикации'
     )
+    updated = models.DateTimeField(
+        default=timezone.now,
+        verbose_name='Дата изменения'
+    )
+    search_vector = SearchVectorField(
+        null=True,
+        editable=False,
+        verbose_name='Поисковый вектор'
+    )
+    favorites_count = models.IntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Добавлено в избранное'
+    )
+    cart_count = models.IntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Добавлено в корзину'
+    )
+
+    counter_fields = ('favorites_count', 'cart_count')
 
     class Meta:
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
-        ordering = ('-created',)
+        ordering = ('-created', '-id')
+        indexes = [
+            models.Index(
+                fields=['-created', '-id'], name='recipe_created_id_idx'
+            )
+        ]
 
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        self.updated = timezone.now()
+        super().save(*args, **kwargs)
+
 
 class IngredientInRecipe(models.Model):
     recipe = models.ForeignKey(
@@ -239,3 +333,125 @@ class ShoppingCart(models.Model):
 
     def __str__(self):
         return self.user.username + ' > ' + self.recipe.name
+
+
+class ShoppingCartTotal(models.Model):
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name='shopping_cart_totals',
+        verbose_name='Пользователь')
+    ingredient = models.ForeignKey(
+        Ingredient, on_delete=models.CASCADE,
+        related_name='shopping_cart_totals', verbose_name='Ингредиент')
+    total_amount = models.IntegerField(
+        default=0,
+        verbose_name='Общее количество'
+    )
+    recipe_count = models.IntegerField(
+        default=0,
+        verbose_name='Количество рецептов'
+    )
+    updated = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата изменения'
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'ingredient'], name='uq_ShoppingCartTotal'
+            )
+        ]
+
+        verbose_name = 'Итог корзины'
+        verbose_name_plural = 'Итоги корзины'
+        ordering = ('id',)
+
+    def __str__(self):
+        return self.user.username + ' > ' + self.ingredient.name
+
+
+class ImageJob(models.Model):
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = [
+        (PENDING, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Готово'),
+        (FAILED, 'Ошибка')
+    ]
+
+    content_type = models.ForeignKey(
+        ContentType, on_delete=models.CASCADE, verbose_name='Тип объекта')
+    object_id = models.PositiveBigIntegerField(
+        verbose_name='ID объекта'
+    )
+    field = models.CharField(
+        verbose_name='Поле',
+        max_length=64
+    )
+    source = models.CharField(
+        verbose_name='Исходный файл',
+        max_length=255
+    )
+    status = models.CharField(
+        verbose_name='Статус',
+        max_length=16,
+        choices=STATUSES,
+        default=PENDING
+    )
+    attempts = models.PositiveSmallIntegerField(
+        default=0,
+        verbose_name='Попытки'
+    )
+    error = models.TextField(
+        blank=True,
+        verbose_name='Ошибка'
+    )
+    created = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Дата создания'
+    )
+    updated = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата изменения'
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['content_type', 'object_id', 'field', 'source'],
+                name='uq_ImageJob'
+            )
+        ]
+        indexes = [
+            models.Index(fields=['status', 'id'], name='imagejob_status_idx')
+        ]
+
+        verbose_name = 'Обработка изображения'
+        verbose_name_plural = 'Обработка изображений'
+        ordering = ('id',)
+
+    def __str__(self):
+        return f'{self.source} ({self.get_status_display()})'
+
+
+class MediaFile(models.Model):
+    name = models.CharField(
+        verbose_name='Файл',
+        max_length=255,
+        unique=True
+    )
+    refcount = models.IntegerField(
+        default=0,
+        verbose_name='Количество ссылок'
+    )
+
+    class Meta:
+        verbose_name = 'Медиафайл'
+        verbose_name_plural = 'Медиафайлы'
+        ordering = ('id',)
+
+    def __str__(self):
+        return f'{self.name} ({self.refcount})'
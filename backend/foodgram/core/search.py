@@ -0,0 +1,112 @@
+from django.db import connection as default_connection
+
+SEARCH_CONFIG = 'russian'
+
+POSTGRES_VECTOR = (
+    "setweight(to_tsvector('{config}', coalesce({row}name, '')), 'A') || "
+    "setweight(to_tsvector('{config}', coalesce({row}text, '')), 'B')"
+)
+
+POSTGRES_INSTALL = [
+    'CREATE INDEX IF NOT EXISTS recipe_search_vector_idx '
+    'ON core_recipe USING gin (search_vector)',
+    'CREATE OR REPLACE FUNCTION core_recipe_search_vector_update() '
+    'RETURNS trigger AS $$ BEGIN '
+    'NEW.search_vector := {vector}; '
+    'RETURN NEW; '
+    'END $$ LANGUAGE plpgsql'.format(
+        vector=POSTGRES_VECTOR.format(config=SEARCH_CONFIG, row='NEW.')),
+    'DROP TRIGGER IF EXISTS core_recipe_search_vector_trigger '
+    'ON core_recipe',
+    # Counter updates touch other columns and must not rebuild the vector.
+    'CREATE TRIGGER core_recipe_search_vector_trigger '
+    'BEFORE INSERT OR UPDATE OF name, text ON core_recipe '
+    'FOR EACH ROW EXECUTE FUNCTION core_recipe_search_vector_update()',
+]
+
+POSTGRES_UNINSTALL = [
+    'DROP TRIGGER IF EXISTS core_recipe_search_vector_trigger '
+    'ON core_recipe',
+    'DROP FUNCTION IF EXISTS core_recipe_search_vector_update()',
+    'DROP INDEX IF EXISTS recipe_search_vector_idx',
+]
+
+POSTGRES_BACKFILL = (
+    'UPDATE core_recipe SET search_vector = {vector} '
+    'WHERE id > %s AND id <= %s'.format(
+        vector=POSTGRES_VECTOR.format(config=SEARCH_CONFIG, row=''))
+)
+
+SQLITE_INSTALL = [
+    'CREATE VIRTUAL TABLE IF NOT EXISTS core_recipe_fts USING fts5('
+    "name, text, tokenize='unicode61 remove_diacritics 2')",
+    'CREATE TRIGGER IF NOT EXISTS core_recipe_fts_insert '
+    'AFTER INSERT ON core_recipe BEGIN '
+    'INSERT INTO core_recipe_fts(rowid, name, text) '
+    'VALUES (new.id, new.name, new.text); '
+    'END',
+    'CREATE TRIGGER IF NOT EXISTS core_recipe_fts_delete '
+    'AFTER DELETE ON core_recipe BEGIN '
+    'DELETE FROM core_recipe_fts WHERE rowid = old.id; '
+    'END',
+    # Recreated rather than kept: databases installed before the trigger
+    # was limited to name and text get the new definition on migrate.
+    'DROP TRIGGER IF EXISTS core_recipe_fts_update',
+    'CREATE TRIGGER core_recipe_fts_update '
+    'AFTER UPDATE OF name, text ON core_recipe BEGIN '
+    'DELETE FROM core_recipe_fts WHERE rowid = old.id; '
+    'INSERT INTO core_recipe_fts(rowid, name, text) '
+    'VALUES (new.id, new.name, new.text); '
+    'END',
+]
+
+SQLITE_UNINSTALL = [
+    'DROP TRIGGER IF EXISTS core_recipe_fts_insert',
+    'DROP TRIGGER IF EXISTS core_recipe_fts_delete',
+    'DROP TRIGGER IF EXISTS core_recipe_fts_update',
+    'DROP TABLE IF EXISTS core_recipe_fts',
+]
+
+SQLITE_BACKFILL = (
+    'INSERT INTO core_recipe_fts(rowid, name, text) '
+    'SELECT id, name, text FROM core_recipe WHERE id > %s AND id <= %s'
+)
+
+STATEMENTS = {
+    'postgresql': (POSTGRES_INSTALL, POSTGRES_UNINSTALL),
+    'sqlite': (SQLITE_INSTALL, SQLITE_UNINSTALL),
+}
+
+
+def install_search_backend(connection=default_connection):
+    # Idempotent: SQLite drops table triggers whenever a migration
+    # rebuilds core_recipe, so this also runs after every migrate.
+    statements = STATEMENTS.get(connection.vendor)
+    if statements is None:
+        return
+    with connection.cursor() as cursor:
+        for sql in statements[0]:
+            cursor.execute(sql)
+
+
+def uninstall_search_backend(connection=default_connection):
+    statements = STATEMENTS.get(connection.vendor)
+    if statements is None:
+        return
+    with connection.cursor() as cursor:
+        for sql in statements[1]:
+            cursor.execute(sql)
+
+
+def reindex_batch(start, end, connection=default_connection):
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(POSTGRES_BACKFILL, (start, end))
+        elif connection.vendor == 'sqlite':
+            cursor.execute(
+                'DELETE FROM core_recipe_fts WHERE rowid > %s AND rowid <= %s',
+                (start, end))
+            cursor.execute(SQLITE_BACKFILL, (start, end))
+        else:
+            return 0
+        return cursor.rowcount
@@ -0,0 +1,172 @@
+from collections import defaultdict
+from contextlib import contextmanager
+from threading import local
+
+from django.db.models import Case, Count, F, IntegerField, Sum, Value, When
+from django.db.models.functions import Now
+
+from core.models import IngredientInRecipe, ShoppingCart, ShoppingCartTotal
+
+_state = local()
+
+
+def apply_deltas(user_ids, deltas):
+    # deltas: {ingredient_id: (amount_delta, recipe_count_delta)}.
+    # Three queries no matter how many users or ingredients are touched.
+    user_ids = list(user_ids)
+    deltas = {
+        ingredient_id: delta for ingredient_id, delta in deltas.items()
+        if delta != (0, 0)
+    }
+    if not user_ids or not deltas:
+        return
+
+    ShoppingCartTotal.objects.bulk_create([
+        ShoppingCartTotal(user_id=user_id, ingredient_id=ingredient_id)
+        for user_id in user_ids
+        for ingredient_id, (_, recipes) in deltas.items()
+        if recipes > 0
+    ], ignore_conflicts=True)
+
+    def case(index):
+        return Case(
+            *[
+                When(ingredient_id=ingredient_id, then=Value(delta[index]))
+                for ingredient_id, delta in deltas.items()
+            ],
+            default=Value(0),
+            output_field=IntegerField()
+        )
+
+    totals = ShoppingCartTotal.objects.filter(
+        user_id__in=user_ids, ingredient_id__in=deltas)
+    totals.update(
+        total_amount=F('total_amount') + case(0),
+        recipe_count=F('recipe_count') + case(1),
+        updated=Now()
+    )
+    totals.filter(recipe_count__lte=0).delete()
+
+
+def recipes_deltas(recipe_ids):
+    # {ingredient_id: (amount, recipe_count)} for a set of recipes.
+    rows = (
+        IngredientInRecipe.objects
+        .filter(recipe_id__in=recipe_ids)
+        .values_list('ingredient_id')
+        .annotate(amount=Sum('amount'),
+                  recipes=Count('recipe_id', distinct=True))
+        .order_by()
+    )
+    return {
+        ingredient_id: (amount, recipes)
+        for ingredient_id, amount, recipes in rows
+    }
+
+
+def add_recipes(user, recipe_ids):
+    apply_deltas([user.id], recipes_deltas(recipe_ids))
+
+
+def change_recipe(recipe, old_amounts, new_amounts):
+    deltas = {}
+    for ingredient_id in old_amounts.keys() | new_amounts.keys():
+        old = old_amounts.get(ingredient_id)
+        new = new_amounts.get(ingredient_id)
+        deltas[ingredient_id] = (
+            (new or 0) - (old or 0),
+            (new is not None) - (old is not None)
+        )
+    user_ids = recipe.users_in_shopcart.values_list('user_id', flat=True)
+    apply_deltas(user_ids, deltas)
+
+
+def expected_totals(user_ids):
+    totals = defaultdict(dict)
+    rows = (
+        ShoppingCart.objects
+        .filter(user_id__in=user_ids,
+                recipe__ingredient_amounts__isnull=False)
+        .values('user_id',
+                ingredient_id=F('recipe__ingredient_amounts__ingredient_id'))
+        .annotate(total_amount=Sum('recipe__ingredient_amounts__amount'),
+                  recipe_count=Count('id', distinct=True))
+        .order_by()
+    )
+    for row in rows:
+        totals[row['user_id']][row['ingredient_id']] = (
+            row['total_amount'], row['recipe_count'])
+    return totals
+
+
+def stored_totals(user_ids):
+    totals = defaultdict(dict)
+    rows = ShoppingCartTotal.objects.filter(user_id__in=user_ids).values_list(
+        'user_id', 'ingredient_id', 'total_amount', 'recipe_count')
+    for user_id, ingredient_id, total_amount, recipe_count in rows:
+        totals[user_id][ingredient_id] = (total_amount, recipe_count)
+    return totals
+
+
+def rebuild_totals(user_ids):
+    ShoppingCartTotal.objects.filter(user_id__in=user_ids).delete()
+    ShoppingCartTotal.objects.bulk_create([
+        ShoppingCartTotal(
+            user_id=user_id, ingredient_id=ingredient_id,
+            total_amount=total_amount, recipe_count=recipe_count)
+        for user_id, ingredients in expected_totals(user_ids).items()
+        for ingredient_id, (total_amount, recipe_count) in ingredients.items()
+    ])
+
+
+def cart_user_ids():
+    carts = ShoppingCart.objects.values_list('user_id', flat=True)
+    totals = ShoppingCartTotal.objects.values_list('user_id', flat=True)
+    return sorted(set(carts.order_by().union(totals.order_by())))
+
+
+def stale_users(user_ids):
+    pending = getattr(_state, 'pending', None)
+    if pending is not None:
+        pending.update(user_ids)
+        return
+    rebuild_totals(user_ids)
+
+
+def stale_recipes(recipe_ids):
+    stale_users(
+        ShoppingCart.objects.filter(recipe_id__in=recipe_ids)
+        .values_list('user_id', flat=True).distinct().order_by())
+
+
+@contextmanager
+def deferred_totals():
+    # Cart rows deleted inside (cascades from recipes and users included)
+    # only mark their owners; each owner is rebuilt once on exit.
+    if getattr(_state, 'pending', None) is not None:
+        yield
+        return
+    _state.pending = set()
+    try:
+        yield
+        pending = _state.pending
+    finally:
+        _state.pending = None
+    if pending:
+        rebuild_totals(sorted(pending))
+
+
+def cart_created(sender, instance, created, raw=False, **kwargs):
+    # Raw fixture saves are followed by verify_shopping_totals --fix.
+    if not created or raw:
+        return
+    if getattr(_state, 'pending', None) is not None:
+        _state.pending.add(instance.user_id)
+        return
+    apply_deltas([instance.user_id], recipes_deltas([instance.recipe_id]))
+
+
+def cart_deleted(sender, instance, **kwargs):
+    # The recipe may be going away in the same delete, so its amounts
+    # are not reliable here: rebuild the owner from the remaining cart.
+    stale_users([instance.user_id])
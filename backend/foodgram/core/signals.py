@@ -0,0 +1,5 @@
+from django.dispatch import Signal
+
+# Sent with the model class as sender after bulk writes that bypass
+# post_save/post_delete.
+bulk_changed = Signal()
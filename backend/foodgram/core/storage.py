@@ -0,0 +1,62 @@
+import hashlib
+import os
+import posixpath
+import uuid
+
+from django.core.files.storage import FileSystemStorage
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    # Files are named after the sha256 of their content and sharded into
+    # two directory levels: identical uploads share one file and a name
+    # never points at different bytes. Unused files are removed by the
+    # gc_media command, never on overwrite.
+    def get_available_name(self, name, max_length=None):
+        # The final name is only known once the content is hashed.
+        return name
+
+    def hashed_name(self, name, content):
+        sha256 = hashlib.sha256()
+        for chunk in content.chunks():
+            sha256.update(chunk)
+        digest = sha256.hexdigest()
+        directory, basename = posixpath.split(name.replace('\\', '/'))
+        ext = os.path.splitext(basename)[1].lower()
+        return posixpath.join(directory, digest[:2], digest[2:4], digest + ext)
+
+    def _save(self, name, content):
+        name = self.hashed_name(name, content)
+        full_path = self.path(name)
+        try:
+            # Same bytes uploaded again: a fresh mtime keeps the file inside
+            # the gc_media grace period until the row referencing it is saved.
+            os.utime(full_path)
+            return name
+        except FileNotFoundError:
+            pass
+
+        directory = os.path.dirname(full_path)
+        if self.directory_permissions_mode is not None:
+            old_umask = os.umask(0)
+            try:
+                os.makedirs(
+                    directory, self.directory_permissions_mode, exist_ok=True)
+            finally:
+                os.umask(old_umask)
+        else:
+            os.makedirs(directory, exist_ok=True)
+
+        # Written aside and renamed, so a concurrent upload of the same
+        # bytes never sees a partial file.
+        temp_path = f'{full_path}.{uuid.uuid4().hex}.tmp'
+        try:
+            with open(temp_path, 'wb') as file:
+                for chunk in content.chunks():
+                    file.write(chunk)
+            if self.file_permissions_mode is not None:
+                os.chmod(temp_path, self.file_permissions_mode)
+            os.replace(temp_path, full_path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        return name
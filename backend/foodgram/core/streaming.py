@@ -0,0 +1,41 @@
+import json
+import re
+
+CHUNK_SIZE = 64 * 1024
+SEPARATORS = re.compile(r'[\s,]*')
+
+
+def iter_json_array(stream, chunk_size=CHUNK_SIZE):
+    # Yields the elements of a top-level JSON array one by one while
+    # holding at most one chunk plus one element in memory.
+    decoder = json.JSONDecoder()
+    buffer, position = '', 0
+    started, eof = False, False
+
+    while True:
+        position = SEPARATORS.match(buffer, position).end()
+        if position < len(buffer):
+            if not started:
+                if buffer[position] != '[':
+                    raise ValueError('Ожидался JSON-массив.')
+                started = True
+                position += 1
+                continue
+            if buffer[position] == ']':
+                return
+            try:
+                element, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            else:
+                if end < len(buffer) or eof:
+                    position = end
+                    yield element
+                    continue
+
+        if eof:
+            raise ValueError('Неожиданный конец JSON-массива.')
+        chunk = stream.read(chunk_size)
+        eof = not chunk
+        buffer, position = buffer[position:] + chunk, 0
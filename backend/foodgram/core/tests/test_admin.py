@@ -0,0 +1,67 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from core.models import (Favorite, Ingredient, IngredientInRecipe, Recipe,
+                         ShoppingCart, Subscription, User)
+
+CHANGELISTS = [
+    'user',
+    'recipe',
+    'ingredientinrecipe',
+    'shoppingcart',
+    'shoppingcarttotal',
+    'favorite',
+    'subscription',
+    'ingredient',
+    'imagejob',
+    'mediafile',
+]
+
+
+class ChangelistQueriesTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='x')
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def add_rows(self, start, count):
+        for number in range(start, start + count):
+            user = User.objects.create(
+                username=f'user{number}', email=f'user{number}@example.com')
+            ingredient = Ingredient.objects.create(
+                name=f'ingredient {number}', measurement_unit='г')
+            recipe = Recipe.objects.create(
+                author=user, name=f'Рецепт {number}', text='.',
+                image=f'recipes/{number}.png', cooking_time=1)
+            IngredientInRecipe.objects.create(
+                recipe=recipe, ingredient=ingredient, amount=1)
+            # Image jobs, media files and shopping totals come from the
+            # recipe and cart signals.
+            Favorite.objects.create(user=user, recipe=recipe)
+            ShoppingCart.objects.create(user=user, recipe=recipe)
+            Subscription.objects.create(user=self.admin, subscribed_to=user)
+
+    def changelist_queries(self):
+        counts = {}
+        for name in CHANGELISTS:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(f'/admin/core/{name}/')
+            self.assertEqual(response.status_code, 200, name)
+            counts[name] = len(queries)
+        return counts
+
+    def test_recipe_ingredient_count_column(self):
+        self.add_rows(0, 1)
+        response = self.client.get('/admin/core/recipe/')
+        self.assertContains(
+            response, '<td class="field-ingredient_count">1</td>', html=True)
+
+    def test_query_count_does_not_grow_with_rows(self):
+        self.add_rows(0, 2)
+        small = self.changelist_queries()
+        self.add_rows(2, 20)
+        self.assertEqual(self.changelist_queries(), small)
@@ -0,0 +1,59 @@
+import json
+import os
+import tempfile
+from datetime import datetime, timezone
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from core.models import Ingredient, IngredientInRecipe, Recipe, User
+
+CREATED = datetime(2024, 5, 1, 12, 30, tzinfo=timezone.utc)
+FIXTURE = [
+    # Children before their parents: the command sorts models itself.
+    {'model': 'core.ingredientinrecipe', 'pk': 1,
+     'fields': {'recipe': 1, 'ingredient': 1, 'amount': 3}},
+    {'model': 'core.recipe', 'pk': 1,
+     'fields': {'author': 1, 'name': 'Каша', 'image': 'recipes/a.png',
+                'text': 'Сварить.', 'cooking_time': 20,
+                'created': CREATED.isoformat()}},
+    {'model': 'core.ingredient', 'pk': 1,
+     'fields': {'name': 'крупа', 'measurement_unit': 'г'}},
+    {'model': 'core.user', 'pk': 1,
+     'fields': {'username': 'cook', 'email': 'cook@example.com',
+                'first_name': 'Иван', 'last_name': 'Иванов',
+                'password': '!'}},
+]
+
+
+class FastloadTest(TestCase):
+    def load(self, items):
+        with tempfile.NamedTemporaryFile(
+                'w', suffix='.json', delete=False,
+                encoding='utf-8') as fixture:
+            json.dump(items, fixture)
+        self.addCleanup(os.remove, fixture.name)
+        call_command('fastload', fixture.name, stdout=StringIO())
+
+    def test_loads_in_dependency_order(self):
+        self.load(FIXTURE)
+        self.assertEqual(User.objects.get().username, 'cook')
+        self.assertEqual(Ingredient.objects.get().name, 'крупа')
+        row = IngredientInRecipe.objects.get()
+        self.assertEqual((row.recipe_id, row.amount), (1, 3))
+
+    def test_keeps_fixture_dates(self):
+        self.load(FIXTURE)
+        self.assertEqual(Recipe.objects.get().created, CREATED)
+
+    def test_second_load_updates_rows(self):
+        self.load(FIXTURE)
+        changed = json.loads(json.dumps(FIXTURE))
+        changed[0]['fields']['amount'] = 7
+        self.load(changed)
+        self.assertEqual(IngredientInRecipe.objects.get().amount, 7)
+
+    def test_unknown_model(self):
+        with self.assertRaises(CommandError):
+            self.load([{'model': 'core.nothing', 'pk': 1, 'fields': {}}])
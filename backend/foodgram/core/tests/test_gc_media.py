@@ -0,0 +1,79 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+
+from core.models import MediaFile, Recipe, User
+
+OLD = 0
+
+
+class GcMediaTest(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp(prefix='foodgram-media-')
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings = override_settings(MEDIA_ROOT=media_root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        author = User.objects.create(
+            username='author', email='author@example.com')
+        self.used = self.save(b'used image')
+        Recipe.objects.create(
+            author=author, name='Рецепт', text='.', image=self.used,
+            cooking_time=1)
+        self.garbage = self.save(b'garbage')
+        for name in (self.used, self.garbage):
+            os.utime(default_storage.path(name), (OLD, OLD))
+
+    def save(self, content):
+        return default_storage.save('recipes/image.png', ContentFile(content))
+
+    def gc(self, *args):
+        out = StringIO()
+        call_command('gc_media', *args, stdout=out)
+        return out.getvalue()
+
+    def test_dry_run(self):
+        output = self.gc('--dry-run')
+        self.assertIn(f'{self.garbage} (7 Б)', output)
+        self.assertIn('будет удалено: 1, освобождено: 7 Б', output)
+        self.assertTrue(default_storage.exists(self.garbage))
+
+    def test_removes_unreferenced_files(self):
+        MediaFile.objects.create(name=self.garbage)
+        output = self.gc('--batch-size', '1')
+        self.assertIn(
+            'Проверено файлов: 2, удалено: 1, освобождено: 7 Б', output)
+        self.assertTrue(default_storage.exists(self.used))
+        self.assertFalse(default_storage.exists(self.garbage))
+        self.assertFalse(MediaFile.objects.filter(name=self.garbage).exists())
+        # Emptied shard directories go as well.
+        self.assertFalse(os.path.exists(
+            os.path.dirname(default_storage.path(self.garbage))))
+
+    def test_keeps_column_references_without_refcount(self):
+        MediaFile.objects.all().delete()
+        self.gc()
+        self.assertTrue(default_storage.exists(self.used))
+        self.assertFalse(default_storage.exists(self.garbage))
+
+    def test_grace_period(self):
+        self.assertIn('удалено: 1', self.gc('--dry-run'))
+        os.utime(default_storage.path(self.garbage))
+        self.assertIn('удалено: 0', self.gc())
+        self.assertIn('удалено: 1', self.gc('--min-age', '-60'))
+
+    def test_upload_of_existing_bytes_refreshes_the_grace_period(self):
+        self.assertEqual(self.save(b'garbage'), self.garbage)
+        self.gc()
+        self.assertTrue(default_storage.exists(self.garbage))
+
+    def test_rejects_non_positive_batch_size(self):
+        with self.assertRaises(CommandError):
+            self.gc('--batch-size', '0')
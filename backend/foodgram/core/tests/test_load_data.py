@@ -0,0 +1,119 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+
+from core import shopping_cart as shopping_totals
+from core.counters import recount_counters
+from core.management.commands.load_test import (COLLECTION, collection_flows,
+                                                percentile)
+from core.models import Ingredient, MediaFile, Recipe, ShoppingCart, User
+
+
+class GenerateLoadDataTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.media_root = tempfile.mkdtemp(prefix='foodgram-media-')
+        cls.media_settings = override_settings(MEDIA_ROOT=cls.media_root)
+        cls.media_settings.enable()
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls.media_settings.disable()
+        shutil.rmtree(cls.media_root, ignore_errors=True)
+
+    def generate(self, *args):
+        call_command(
+            'generate_load_data', '--users', '20', '--recipes', '40',
+            '--seed', '1', '--batch-size', '7', *args, stdout=StringIO())
+
+    def test_generated_data_is_consistent(self):
+        Ingredient.objects.bulk_create(
+            Ingredient(name=f'ingredient {number}', measurement_unit='г')
+            for number in range(30))
+        self.generate()
+        self.assertEqual(User.objects.count(), 20)
+        self.assertEqual(Recipe.objects.count(), 40)
+        self.assertTrue(ShoppingCart.objects.exists())
+
+        self.assertEqual(sum(recount_counters(dry_run=True).values()), 0)
+        user_ids = shopping_totals.cart_user_ids()
+        self.assertEqual(
+            shopping_totals.stored_totals(user_ids),
+            shopping_totals.expected_totals(user_ids))
+        image, = Recipe.objects.values_list(
+            'image', flat=True).order_by().distinct()
+        self.assertEqual(MediaFile.objects.get(name=image).refcount, 40)
+
+        # A second run adds rows after the existing ones.
+        self.generate()
+        self.assertEqual(User.objects.count(), 40)
+        self.assertEqual(sum(recount_counters(dry_run=True).values()), 0)
+
+    def test_needs_ingredients(self):
+        with self.assertRaises(CommandError):
+            self.generate()
+
+
+class LoadTestHelpersTest(TestCase):
+    def test_collection_flows(self):
+        collection = {'item': [
+            {'name': 'users', 'item': [
+                {'name': 'get_users // No Auth', 'request': {
+                    'method': 'GET',
+                    'url': {'raw': '{{baseUrl}}/api/users/'}}},
+                {'name': 'create_user', 'request': {
+                    'method': 'POST', 'url': '{{baseUrl}}/api/users/',
+                    'body': {'raw': '{}'}}},
+            ]},
+            {'name': 'users_register', 'item': [
+                {'name': 'get_me', 'request': {
+                    'method': 'GET', 'url': '{{baseUrl}}/api/users/me/'}},
+            ]},
+            {'name': 'recipes_bad_requests', 'item': [
+                {'name': 'get_missing', 'request': {
+                    'method': 'GET', 'url': '{{baseUrl}}/api/recipes/0/'}},
+            ]},
+            {'name': 'add_favorite', 'request': {
+                'method': 'POST',
+                'url': '{{baseUrl}}/api/recipes/{{firstRecipeId}}/favorite/'}},
+            {'name': 'delete_recipe', 'request': {
+                'method': 'DELETE',
+                'url': '{{baseUrl}}/api/recipes/{{firstRecipeId}}/'}},
+        ]}
+        with tempfile.NamedTemporaryFile(
+                'w', suffix='.json', delete=False,
+                encoding='utf-8') as collection_file:
+            json.dump(collection, collection_file)
+        self.addCleanup(os.remove, collection_file.name)
+
+        flows = collection_flows(collection_file.name)
+        self.assertEqual(
+            [(flow['method'], flow['anonymous']) for flow in flows],
+            [('GET', True), ('POST', False)])
+        self.assertEqual(flows[0]['url'], '{{baseUrl}}/api/users/')
+
+    def test_shipped_collection_has_flows(self):
+        if not COLLECTION.exists():
+            self.skipTest('Коллекция Postman не найдена.')
+        flows = collection_flows(COLLECTION)
+        self.assertTrue(flows)
+        self.assertTrue(all(
+            flow['method'] == 'GET' or '/favorite/' in flow['url']
+            or '/shopping_cart/' in flow['url']
+            or '/subscribe/' in flow['url']
+            for flow in flows))
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 0.5), 50)
+        self.assertEqual(percentile(values, 0.95), 95)
+        self.assertEqual(percentile(values, 1), 100)
+        self.assertEqual(percentile([7], 0.99), 7)
+        self.assertEqual(percentile([], 0.5), 0)
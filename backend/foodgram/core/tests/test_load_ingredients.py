@@ -0,0 +1,102 @@
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest import skipUnless
+
+from django.conf import settings
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from core.models import Ingredient
+
+DATA_DIR = settings.BASE_DIR.parent.parent / 'data'
+ROWS = [
+    {'name': 'абрикос', 'measurement_unit': 'г'},
+    {'name': 'молоко', 'measurement_unit': 'мл'},
+    {'name': 'соль, крупная', 'measurement_unit': 'г'},
+    # Same ingredient again, with stray spaces.
+    {'name': ' абрикос ', 'measurement_unit': 'г '},
+    # Same name with another unit is a different ingredient.
+    {'name': 'молоко', 'measurement_unit': 'стакан'},
+    # Rows without a name or a unit are skipped.
+    {'name': '', 'measurement_unit': 'г'},
+]
+EXPECTED = {
+    ('абрикос', 'г'),
+    ('молоко', 'мл'),
+    ('соль, крупная', 'г'),
+    ('молоко', 'стакан'),
+}
+
+
+class LoadIngredientsTest(TestCase):
+    def write(self, suffix, content):
+        with tempfile.NamedTemporaryFile(
+                'w', suffix=suffix, delete=False, encoding='utf-8',
+                newline='') as data:
+            data.write(content)
+        self.addCleanup(os.remove, data.name)
+        return data.name
+
+    def write_csv(self, rows=ROWS):
+        # BOM, header and a blank line, as spreadsheets save them.
+        lines = ['\ufeffname,measurement_unit', '']
+        lines += [
+            '"{name}",{measurement_unit}'.format(**row) for row in rows]
+        return self.write('.csv', '\n'.join(lines) + '\n')
+
+    def write_json(self, rows=ROWS):
+        return self.write('.json', json.dumps(rows, ensure_ascii=False))
+
+    def load(self, path, *args):
+        out = StringIO()
+        call_command('load_ingredients', path, *args, stdout=out)
+        return out.getvalue()
+
+    def loaded(self):
+        return set(Ingredient.objects.values_list('name', 'measurement_unit'))
+
+    def test_csv(self):
+        output = self.load(self.write_csv())
+        self.assertEqual(self.loaded(), EXPECTED)
+        self.assertIn('Прочитано: 4, добавлено: 4, пропущено: 0', output)
+
+    def test_json(self):
+        self.load(self.write_json())
+        self.assertEqual(self.loaded(), EXPECTED)
+
+    def test_duplicates_across_batches(self):
+        self.load(self.write_csv(ROWS + ROWS), '--batch-size', '1')
+        self.assertEqual(self.loaded(), EXPECTED)
+
+    def test_rerun_adds_nothing(self):
+        self.load(self.write_csv())
+        output = self.load(self.write_json())
+        self.assertEqual(self.loaded(), EXPECTED)
+        self.assertIn('Прочитано: 4, добавлено: 0, пропущено: 4', output)
+
+    def test_format_option(self):
+        path = self.write('.txt', json.dumps(ROWS))
+        with self.assertRaises(CommandError):
+            self.load(path)
+        self.load(path, '--format', 'json')
+        self.assertEqual(self.loaded(), EXPECTED)
+
+    def test_invalid_input(self):
+        with self.assertRaises(CommandError):
+            self.load(self.write_csv(), '--batch-size', '0')
+        with self.assertRaises(CommandError):
+            self.load(self.write_json([{'name': 'соль'}]))
+        with self.assertRaises(CommandError):
+            self.load(os.path.join(tempfile.gettempdir(), 'missing.csv'))
+        self.assertFalse(Ingredient.objects.exists())
+
+    @skipUnless((DATA_DIR / 'ingredients.csv').exists(),
+                'Нет файлов data/ingredients.*')
+    def test_bundled_files(self):
+        output = self.load(str(DATA_DIR / 'ingredients.csv'))
+        self.assertIn('добавлено: 2186', output)
+        output = self.load(str(DATA_DIR / 'ingredients.json'))
+        self.assertIn('добавлено: 0', output)
+        self.assertEqual(Ingredient.objects.count(), 2186)
@@ -0,0 +1,70 @@
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TransactionTestCase
+
+from core.search import install_search_backend
+
+BEFORE = [('core', '0005_updated')]
+AFTER = [('core', '0006_ingredient_unique')]
+
+
+class MergeDuplicateIngredientsTest(TransactionTestCase):
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+        # Table rebuilds drop the SQLite search triggers; migrate puts
+        # them back from post_migrate, the executor alone does not.
+        install_search_backend(connection)
+
+    def test_duplicates_are_merged_before_the_constraint(self):
+        apps = self.migrate(BEFORE)
+        User = apps.get_model('core', 'User')
+        Ingredient = apps.get_model('core', 'Ingredient')
+        Recipe = apps.get_model('core', 'Recipe')
+        IngredientInRecipe = apps.get_model('core', 'IngredientInRecipe')
+        ShoppingCart = apps.get_model('core', 'ShoppingCart')
+        ShoppingCartTotal = apps.get_model('core', 'ShoppingCartTotal')
+
+        user = User.objects.create(username='cook', email='cook@example.com')
+        salt, copy, other_copy = (
+            Ingredient.objects.create(name='соль', measurement_unit='г')
+            for _ in range(3))
+        both = Recipe.objects.create(
+            author=user, name='Оба', text='.', image='a.png', cooking_time=1)
+        single = Recipe.objects.create(
+            author=user, name='Один', text='.', image='b.png',
+            cooking_time=1)
+        IngredientInRecipe.objects.create(
+            recipe=both, ingredient=salt, amount=5)
+        IngredientInRecipe.objects.create(
+            recipe=both, ingredient=copy, amount=7)
+        IngredientInRecipe.objects.create(
+            recipe=single, ingredient=other_copy, amount=3)
+        for recipe in (both, single):
+            ShoppingCart.objects.create(user=user, recipe=recipe)
+        for ingredient, amount in ((salt, 5), (copy, 7), (other_copy, 3)):
+            ShoppingCartTotal.objects.create(
+                user=user, ingredient=ingredient, total_amount=amount,
+                recipe_count=1)
+
+        apps = self.migrate(AFTER)
+        Ingredient = apps.get_model('core', 'Ingredient')
+        IngredientInRecipe = apps.get_model('core', 'IngredientInRecipe')
+        ShoppingCartTotal = apps.get_model('core', 'ShoppingCartTotal')
+
+        self.assertEqual(
+            list(Ingredient.objects.values_list('id', flat=True)), [salt.id])
+        self.assertCountEqual(
+            IngredientInRecipe.objects.values_list(
+                'recipe_id', 'ingredient_id', 'amount'),
+            [(both.id, salt.id, 12), (single.id, salt.id, 3)])
+        self.assertCountEqual(
+            ShoppingCartTotal.objects.values_list(
+                'ingredient_id', 'total_amount', 'recipe_count'),
+            [(salt.id, 15, 2)])
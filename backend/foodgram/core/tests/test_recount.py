@@ -0,0 +1,62 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from core.counters import deferred_counters, recount_counters
+from core.models import Favorite, Recipe, Subscription, User
+
+
+class RecountTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(
+            username='author', email='author@example.com')
+        cls.readers = [
+            User.objects.create(
+                username=f'reader{number}',
+                email=f'reader{number}@example.com')
+            for number in range(3)
+        ]
+        cls.recipe = Recipe.objects.create(
+            author=cls.author, name='Рецепт', text='.',
+            image='recipes/test.png', cooking_time=1)
+        for reader in cls.readers:
+            Favorite.objects.create(user=reader, recipe=cls.recipe)
+            Subscription.objects.create(user=reader, subscribed_to=cls.author)
+
+    def test_signals_keep_counters_exact(self):
+        self.assertEqual(recount_counters(dry_run=True), {
+            'recipe.favorites_count': 0, 'recipe.cart_count': 0,
+            'user.recipes_count': 0, 'user.followers_count': 0})
+
+    def test_deferred_counters_write_once(self):
+        with CaptureQueriesContext(connection) as queries:
+            with deferred_counters():
+                for favorite in Favorite.objects.all():
+                    favorite.delete()
+        updates = [
+            query['sql'] for query in queries
+            if query['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(
+            Recipe.objects.get(pk=self.recipe.pk).favorites_count, 0)
+
+    def test_recount_repairs_drift(self):
+        Recipe.objects.update(favorites_count=10)
+        User.objects.filter(pk=self.author.pk).update(followers_count=0)
+
+        output = StringIO()
+        call_command('recount', '--dry-run', stdout=output)
+        self.assertIn('найдено строк: 2', output.getvalue())
+        self.assertEqual(
+            Recipe.objects.get(pk=self.recipe.pk).favorites_count, 10)
+
+        call_command('recount', '--batch-size', '1', stdout=StringIO())
+        self.assertEqual(
+            Recipe.objects.get(pk=self.recipe.pk).favorites_count, 3)
+        self.assertEqual(
+            User.objects.get(pk=self.author.pk).followers_count, 3)
+        self.assertEqual(sum(recount_counters(dry_run=True).values()), 0)
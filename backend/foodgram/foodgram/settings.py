@@ -1,3 +1,4 @@
+from datetime import timedelta
 from pathlib import Path
 from dotenv import load_dotenv
 import os
@@ -37,6 +38,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.metrics.MetricsMiddleware',
+    'api.profiling.ProfilerMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -85,6 +88,18 @@ else:
         }
     }
 
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'DJANGO_CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('DJANGO_CACHE_LOCATION', 'foodgram'),
+    }
+}
+
+RESPONSE_CACHE_TIMEOUT = int(os.getenv('RESPONSE_CACHE_TIMEOUT', 300))
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -115,6 +130,7 @@ STATIC_ROOT = BASE_DIR / "static/"
 
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media/"
+DEFAULT_FILE_STORAGE = 'core.storage.ContentAddressedStorage'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -131,6 +147,28 @@ REST_FRAMEWORK = {
     ],
 }
 
+# Opt-in JWT login on api/auth/jwt/. "Bearer" access tokens are checked
+# without touching the database; "Token" headers keep working.
+JWT_AUTH_ENABLED = (
+    os.getenv('JWT_AUTH_ENABLED', 'False').lower() in ['true', '1', 'yes'])
+
+SIMPLE_JWT = {
+    'ACCESS_TOKEN_LIFETIME': timedelta(
+        minutes=int(os.getenv('JWT_ACCESS_TOKEN_MINUTES', 5))),
+    'REFRESH_TOKEN_LIFETIME': timedelta(
+        days=int(os.getenv('JWT_REFRESH_TOKEN_DAYS', 7))),
+    'ROTATE_REFRESH_TOKENS': True,
+    'BLACKLIST_AFTER_ROTATION': True,
+    'AUTH_HEADER_TYPES': ('Bearer',),
+    'TOKEN_USER_CLASS': 'api.authentication.ClaimsUser',
+}
+
+if JWT_AUTH_ENABLED:
+    INSTALLED_APPS.append('rest_framework_simplejwt.token_blacklist')
+    REST_FRAMEWORK['DEFAULT_AUTHENTICATION_CLASSES'].insert(
+        0, 'rest_framework_simplejwt.authentication.'
+           'JWTTokenUserAuthentication')
+
 DJOSER = {
     'SERIALIZERS': {
         'user': 'api.serializers.UserAccountSerializer',
@@ -148,3 +186,28 @@ DJOSER = {
 }
 
 AUTH_USER_MODEL = 'core.User'
+
+INGREDIENT_INDEX_TTL = int(os.getenv('INGREDIENT_INDEX_TTL', 300))
+
+MAX_RECIPE_IDS = int(os.getenv('MAX_RECIPE_IDS', 100))
+
+MEDIA_RESIZE_SIZES = os.getenv(
+    'MEDIA_RESIZE_SIZES',
+    '96x96 160x160 320x320 640x640 960x960 1280x1280 320x0 640x0 1280x0'
+).split()
+MEDIA_RESIZE_CACHE_DIR = os.getenv(
+    'MEDIA_RESIZE_CACHE_DIR', BASE_DIR / 'cache' / 'resize')
+MEDIA_RESIZE_CACHE_SIZE = int(
+    os.getenv('MEDIA_RESIZE_CACHE_SIZE', 512 * 1024 * 1024))
+MEDIA_RESIZE_MAX_AGE = int(
+    os.getenv('MEDIA_RESIZE_MAX_AGE', 365 * 24 * 60 * 60))
+
+PROFILER_ENABLED = (
+    os.getenv('PROFILER_ENABLED', 'False').lower() in ['true', '1', 'yes'])
+PROFILER_SAMPLE_RATE = float(os.getenv('PROFILER_SAMPLE_RATE', 0))
+PROFILER_SLOW_MS = int(os.getenv('PROFILER_SLOW_MS', 1000))
+PROFILER_CPROFILE = (
+    os.getenv('PROFILER_CPROFILE', 'False').lower() in ['true', '1', 'yes'])
+PROFILER_HEADER = os.getenv('PROFILER_HEADER', 'X-Profile')
+PROFILER_DIR = os.getenv('PROFILER_DIR', BASE_DIR / 'cache' / 'profiles')
+PROFILER_MAX_FILES = int(os.getenv('PROFILER_MAX_FILES', 500))
@@ -0,0 +1,19 @@
+import os
+import shutil
+
+# Metrics of every worker are kept in PROMETHEUS_MULTIPROC_DIR (see
+# api/metrics.py); files of a previous run would be merged into the new
+# one, and those of exited workers have to be marked as dead.
+MULTIPROC_DIR = os.getenv('PROMETHEUS_MULTIPROC_DIR')
+
+
+def on_starting(server):
+    if MULTIPROC_DIR:
+        shutil.rmtree(MULTIPROC_DIR, ignore_errors=True)
+        os.makedirs(MULTIPROC_DIR, exist_ok=True)
+
+
+def child_exit(server, worker):
+    if MULTIPROC_DIR:
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid, MULTIPROC_DIR)
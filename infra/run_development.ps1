@@ -48,6 +48,7 @@ Copy-Item $MediaVolume $MediaBackend -Recurse -ErrorAction Ignore
 
 Write-Host "** Importing fixture data **"
 py $ManagePy loaddata $Initdata
+py $ManagePy recount | Out-Null
 
 Write-Host "** Collecting static **"
 py $ManagePy collectstatic --noinput | Out-Null
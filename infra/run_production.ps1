@@ -23,6 +23,10 @@ docker cp $MediaVolume/. foodgram-backend:/app/foodgram/media
 
 Write-Host "** Importing fixture data **"
 docker compose exec backend python foodgram/manage.py loaddata data/initial_data.json | Out-Null
+docker compose exec backend python foodgram/manage.py recount | Out-Null
+
+Write-Host "** Queueing image variants **"
+docker compose exec backend python foodgram/manage.py process_images --once --enqueue-missing | Out-Null
 
 Write-Host "** Collecting static **"
 docker compose exec backend python foodgram/manage.py collectstatic --noinput | Out-Null